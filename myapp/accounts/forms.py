@@ -10,6 +10,7 @@ This module defines:
 
 from django import forms
 from django.core.exceptions import ValidationError
+from chatbot.title_resolver import canonical_job_title
 from .models import CURRENCY_CHOICES
 
 # Authoritative list of job titles used for datalist suggestions and validation.
@@ -166,6 +167,10 @@ class SignupForm(forms.Form):
             raise ValidationError("Passwords do not match.")
         return b
 
+    def clean_job_title(self):
+        """Map common variants ("backend dev") to the matching JOB_TITLE_CHOICES entry."""
+        return canonical_job_title(self.cleaned_data.get('job_title'))
+
     def clean_skills(self):
         """
         Validate skills field.
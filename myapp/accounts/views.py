@@ -32,6 +32,8 @@ except Exception:
     pass
 
 from .forms import SignupForm, JOB_TITLE_CHOICES, validate_password_strength
+from chatbot.offline import CHATBOT_OFFLINE, StubSupabaseClient
+from chatbot.title_resolver import canonical_job_title
 from .models import Profile, WorkExperience, CURRENCY_CHOICES
 from supabase import create_client, Client
 
@@ -53,7 +55,11 @@ def get_supabase_client(require_service_role: bool = False) -> Client:
     Note:
         Service role key bypasses RLS (Row Level Security) policies, which is necessary
         for server-side operations. Anon keys may be blocked by RLS policies.
+        In the offline profile (CHATBOT_OFFLINE=1) an in-memory stub is returned.
     """
+    if CHATBOT_OFFLINE:
+        return StubSupabaseClient()
+
     url = os.environ.get('SUPABASE_URL', '')
     service_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', '')
     anon_key = os.environ.get('SUPABASE_KEY', '')
@@ -240,7 +246,7 @@ def profile_view(request):
     if request.method == 'POST':
         # Extract and validate form data
         email = request.POST.get('email', '').strip()
-        job_title = request.POST.get('job_title', '').strip()
+        job_title = canonical_job_title(request.POST.get('job_title', ''))
         skills_raw = request.POST.get('skills', '')
         median_salary_raw = request.POST.get('median_salary', '')
         years_experience_raw = request.POST.get('years_experience', '')
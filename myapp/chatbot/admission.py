@@ -0,0 +1,240 @@
+"""
+Admission control + in-flight coalescing for the chatbot API
+- AdmissionController bounds concurrent agent runs per worker process. Extra
+  requests wait in a bounded queue for up to CHATBOT_ADMISSION_QUEUE_TIMEOUT
+  seconds; when the queue is full or the wait times out the request is
+  rejected with Overloaded (the view answers 429 + Retry-After).
+- InflightCoalescer lets identical questions that arrive while the same
+  answer is being computed await the leader's result instead of starting
+  their own agent run. Personal questions ("my", "me") only coalesce with
+  the same user's. Streamed answers (InflightCoalescer.stream) lead or
+  follow under the same keys: followers get the leader's final event.
+
+Both work across event loops (Django runs async views on a fresh loop per
+request under WSGI), so they use thread-safe primitives rather than
+asyncio.Semaphore.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+
+from .cypher_cache import normalize_question
+
+# Admission limits (tunable from the environment)
+CHATBOT_MAX_CONCURRENT_RUNS = int(os.getenv("CHATBOT_MAX_CONCURRENT_RUNS", "8"))
+CHATBOT_ADMISSION_MAX_QUEUE = int(os.getenv("CHATBOT_ADMISSION_MAX_QUEUE", "32"))
+CHATBOT_ADMISSION_QUEUE_TIMEOUT = float(os.getenv("CHATBOT_ADMISSION_QUEUE_TIMEOUT", "2"))
+CHATBOT_RETRY_AFTER = int(os.getenv("CHATBOT_RETRY_AFTER", "5"))  # Seconds suggested to rejected clients
+CHATBOT_COALESCING = os.getenv("CHATBOT_COALESCING", "1").lower() in ("1", "true", "yes")
+
+
+class Overloaded(Exception):
+    """No agent slot became free in time (or the queue is full)."""
+
+    def __init__(self, reason: str, retry_after: int = CHATBOT_RETRY_AFTER):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False  # Set under the controller lock when a slot is handed over
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class AdmissionController:
+    """Counting semaphore with a bounded FIFO queue and a queue timeout."""
+
+    def __init__(self, limit: int = CHATBOT_MAX_CONCURRENT_RUNS, max_queue: int = CHATBOT_ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = CHATBOT_ADMISSION_QUEUE_TIMEOUT, retry_after: int = CHATBOT_RETRY_AFTER):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._counts = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    async def acquire(self):
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self._counts["admitted"] += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._counts["rejected_queue_full"] += 1
+                raise Overloaded("admission queue is full", self.retry_after)
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+            self._counts["queued"] += 1
+
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Client went away while queued: give back a slot we may have been handed
+            with self._lock:
+                if waiter.granted:
+                    self._release_locked()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+
+        with self._lock:
+            if waiter.granted:
+                self._counts["admitted"] += 1
+                return
+            self._waiters.remove(waiter)
+            self._counts["rejected_timeout"] += 1
+        raise Overloaded(f"no agent slot free within {self.queue_timeout:g}s", self.retry_after)
+
+    def _release_locked(self):
+        """Hand the slot to the next live waiter, or free it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            try:
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            except RuntimeError:  # The waiter's event loop is already closed
+                continue
+            waiter.granted = True
+            return
+        self._active -= 1
+
+    def release(self):
+        with self._lock:
+            self._release_locked()
+
+    def saturated(self) -> bool:
+        """True when acquire() would be rejected right away (every slot busy and the queue full)."""
+        with self._lock:
+            return self._active >= self.limit and len(self._waiters) >= self.max_queue
+
+    @asynccontextmanager
+    async def slot(self):
+        """`async with controller.slot():` → run while holding an agent slot."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "active": self._active, "queued_now": len(self._waiters), **self._counts}
+
+
+class InflightCoalescer:
+    """Share one in-progress computation between identical concurrent requests."""
+
+    def __init__(self, enabled: bool = CHATBOT_COALESCING):
+        self.enabled = enabled
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._counts = {"leaders": 0, "followers": 0}
+
+    @staticmethod
+    def key(text: str, user_id=None, personal: bool = False) -> str:
+        """Normalised question; personal questions (see is_personal_query) are scoped to their user."""
+        question = normalize_question(text)
+        return f"user:{user_id}:{question}" if personal else question
+
+    def in_flight(self, key: str) -> bool:
+        """True when a run()/stream() call would follow an identical in-flight one."""
+        with self._lock:
+            return self.enabled and key in self._inflight
+
+    async def run(self, key: str, factory):
+        """
+        Await factory() (a coroutine function), or the result of an identical
+        in-flight call. Returns (result, coalesced). Followers also receive the
+        leader's exception.
+        """
+        if not self.enabled:
+            return await factory(), False
+
+        with self._lock:
+            shared = self._inflight.get(key)
+            leader = shared is None
+            if leader:
+                # concurrent.futures.Future can be awaited from any event loop via wrap_future
+                shared = self._inflight[key] = concurrent.futures.Future()
+                self._counts["leaders"] += 1
+            else:
+                self._counts["followers"] += 1
+
+        if not leader:
+            # Shielded: a follower timing out must not cancel the leader's result
+            return await asyncio.shield(asyncio.wrap_future(shared)), True
+
+        try:
+            result = await factory()
+        except BaseException as e:
+            # Cancellation of the leader's request surfaces to followers as an ordinary error
+            shared.set_exception(e if isinstance(e, Exception) else RuntimeError("coalesced request was cancelled"))
+            raise
+        else:
+            shared.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def stream(self, key: str, events):
+        """
+        Async-iterate events() (astream_career_agent-shaped dicts), sharing the
+        "final" result with identical run()/stream() calls made meanwhile. A
+        follower yields only the leader's final event.
+        """
+        if not self.enabled:
+            async for item in events():
+                yield item
+            return
+
+        with self._lock:
+            shared = self._inflight.get(key)
+            leader = shared is None
+            if leader:
+                shared = self._inflight[key] = concurrent.futures.Future()
+                self._counts["leaders"] += 1
+            else:
+                self._counts["followers"] += 1
+
+        if not leader:
+            yield {"event": "final", "result": await asyncio.shield(asyncio.wrap_future(shared)), "coalesced": True}
+            return
+
+        try:
+            async for item in events():
+                if item["event"] == "final" and not shared.done():
+                    shared.set_result(item["result"])
+                yield item
+            if not shared.done():
+                shared.set_exception(RuntimeError("stream ended without a final answer"))
+        except BaseException as e:
+            if not shared.done():
+                shared.set_exception(e if isinstance(e, Exception) else RuntimeError("coalesced request was cancelled"))
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is shared:
+                    del self._inflight[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._inflight), **self._counts}
+
+
+# Shared per worker process
+admission = AdmissionController()
+coalescer = InflightCoalescer()
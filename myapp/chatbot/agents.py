@@ -1,253 +1,112 @@
 """
 Career RAG Agent for Django
-Uses simple regex-based job title normalization with overlap handling
+Normalizes job titles with the precompiled resolver in title_resolver.py
 This module orchestrates the Career Graph, Vector Search, and Personalized Recommendation tools.
 """
+import asyncio
+import contextlib
+import contextvars
 import os
-import re
 from dotenv import load_dotenv
-from langchain.agents import AgentExecutor, Tool, create_openai_functions_agent
-from langchain_openai import ChatOpenAI
+from langchain.agents import AgentExecutor, Tool, create_openai_tools_agent
+from langchain_core.agents import AgentAction
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 # Load environment variables (model names, API keys, etc.)
 load_dotenv()
 CAREER_AGENT_MODEL = os.getenv("CAREER_AGENT_MODEL")
+# Give tools native coroutines (set to 0 to fall back to the thread executor, e.g. for benchmarking)
+ASYNC_TOOLS = os.getenv("CHATBOT_ASYNC_TOOLS", "1").lower() in ("1", "true", "yes")
+# Max tool calls from one agent turn that run at the same time (per request)
+CHATBOT_TOOL_CONCURRENCY = int(os.getenv("CHATBOT_TOOL_CONCURRENCY", "3"))
 
 # Import pre-defined chains (Cypher generator + course retriever)
 from .chains import career_cypher_chain, qa_chain
+from .chains import generate_cypher, run_cypher, answer_from_rows
+
+# Cypher/result cache for repeated CareerGraph questions
+from .cypher_cache import cypher_cache
+from .data_version import graph_data_version
+
+# Local intent router (skips the tool-selection LLM call when confident)
+from .router import get_router, ROUTER_ENABLED, AGENT
 
 # Helper functions for fetching user profile + formatting recommendations
-from .recommendation_helper import (
-    fetch_user_profile,
-    format_recommendation_output
-)
+from .recommendation_helper import fetch_user_profile, fetch_user_profile_async, format_job_courses
+
+# Personalised recommendation pipeline (no LLM calls, cached per profile version)
+from .personalized import profile_problem, recommend, arecommend, remember_recommendation
+
+# Per-session profile snapshot + last recommendations (answers "#2"-style follow-ups)
+from .session_memory import find_reference, is_course_followup, recall, remember
 
-# Import vector store (used inside recommendation formatter)
-from .chains import supabase_vector_store
+# Pooled Neo4j drivers (parameterised read queries with timeouts + metrics)
+from .neo4j_client import GRAPH_UNAVAILABLE
+
+# Shared LLM client layer; breaker/timeout errors get a degraded answer
+from .llm_gateway import get_chat_model, CircuitOpenError, LLMTimeoutError, DEGRADED_ANSWER, LLM_MIN_BUDGET
+LLM_UNAVAILABLE = (CircuitOpenError, LLMTimeoutError)
+
+# Request deadline + in-memory career graph for answers when Neo4j is slow / out of budget
+from .context import has_budget, timed, timed_stage
+from .local_graph import get_local_graph
+
+# Appended to answers built on a cheaper path because the request budget ran low
+QUICK_ANSWER_NOTICE = (
+    "\n\n_Quick answer: the full answer was taking too long, so this was built "
+    "from a local copy of the career data._"
+)
 
 
-# --- Job title synonyms dictionary ---
+# --- Job title synonyms (see title_resolver.py) ---
 # Used to normalize user queries such as "backend dev" → "Developer, back-end"
-SYNONYMS = {
-    # Backend
-    "backend dev": "Developer, back-end",
-    "backend developer": "Developer, back-end",
-    "back-end dev": "Developer, back-end",
-    "back-end developer": "Developer, back-end",
-    "backend engineer": "Developer, back-end",
-    "be developer": "Developer, back-end",
-    
-    # Frontend
-    "frontend dev": "Developer, front-end",
-    "frontend developer": "Developer, front-end",
-    "front-end dev": "Developer, front-end",
-    "front-end developer": "Developer, front-end",
-    "frontend engineer": "Developer, front-end",
-    "fe developer": "Developer, front-end",
-    
-    # Full-stack
-    "fullstack": "Developer, full-stack",
-    "full stack": "Developer, full-stack",
-    "fullstack developer": "Developer, full-stack",
-    "full-stack dev": "Developer, full-stack",
-    "full stack developer": "Developer, full-stack",
-    "fs developer": "Developer, full-stack",
-    
-    # Data roles
-    "data analyst": "Data or business analyst",
-    "business analyst": "Data or business analyst",
-    "analyst": "Data or business analyst",
-    "ba": "Data or business analyst",
-    "data scientist": "Data scientist",
-    "ds": "Data scientist",
-    "scientist": "Data scientist",
-    "data engineer": "Data engineer",
-    "de": "Data engineer",
-    
-    # AI/ML roles
-    "ml engineer": "AI/ML engineer",
-    "machine learning engineer": "AI/ML engineer",
-    "ai engineer": "AI/ML engineer",
-    "artificial intelligence engineer": "AI/ML engineer",
-    "ai developer": "Developer, AI apps or physical AI",
-    "ai app developer": "Developer, AI apps or physical AI",
-    "physical ai developer": "Developer, AI apps or physical AI",
-    "applied scientist": "Applied scientist",
-    
-    # Cloud/Infrastructure
-    "cloud engineer": "Cloud infrastructure engineer",
-    "cloud infrastructure": "Cloud infrastructure engineer",
-    "infrastructure engineer": "Cloud infrastructure engineer",
-    "sysadmin": "System administrator",
-    "sys admin": "System administrator",
-    "system admin": "System administrator",
-    "devops": "DevOps engineer or professional",
-    "devops engineer": "DevOps engineer or professional",
-    "devops professional": "DevOps engineer or professional",
-    
-    # Database
-    "database admin": "Database administrator or engineer",
-    "dba": "Database administrator or engineer",
-    "db admin": "Database administrator or engineer",
-    "database administrator": "Database administrator or engineer",
-    "database engineer": "Database administrator or engineer",
-    
-    # QA/Testing
-    "qa": "Developer, QA or test",
-    "qa engineer": "Developer, QA or test",
-    "tester": "Developer, QA or test",
-    "test engineer": "Developer, QA or test",
-    "quality assurance": "Developer, QA or test",
-    "qa developer": "Developer, QA or test",
-    
-    # Management
-    "project manager": "Project manager",
-    "pm": "Product manager",
-    "product manager": "Product manager",
-    "engineering manager": "Engineering manager",
-    "eng manager": "Engineering manager",
-    "em": "Engineering manager",
-    
-    # Security
-    "security": "Cybersecurity or InfoSec professional",
-    "cybersecurity": "Cybersecurity or InfoSec professional",
-    "infosec": "Cybersecurity or InfoSec professional",
-    "security engineer": "Cybersecurity or InfoSec professional",
-    "security professional": "Cybersecurity or InfoSec professional",
-    
-    # Support
-    "support engineer": "Support engineer or analyst",
-    "support analyst": "Support engineer or analyst",
-    "customer support": "Support engineer or analyst",
-    
-    # Design
-    "ux": "UX, Research Ops or UI design professional",
-    "ui": "UX, Research Ops or UI design professional",
-    "ux designer": "UX, Research Ops or UI design professional",
-    "ui designer": "UX, Research Ops or UI design professional",
-    "designer": "UX, Research Ops or UI design professional",
-    "ux researcher": "UX, Research Ops or UI design professional",
-    
-    # Executive/Leadership
-    "cto": "Senior executive (C-suite, VP, etc.)",
-    "ceo": "Senior executive (C-suite, VP, etc.)",
-    "vp": "Senior executive (C-suite, VP, etc.)",
-    "executive": "Senior executive (C-suite, VP, etc.)",
-    "c-suite": "Senior executive (C-suite, VP, etc.)",
-    "founder": "Founder, technology or otherwise",
-    "co-founder": "Founder, technology or otherwise",
-    
-    # Specialized developers
-    "researcher": "Academic researcher",
-    "academic": "Academic researcher",
-    "academic researcher": "Academic researcher",
-    "mobile dev": "Developer, mobile",
-    "mobile developer": "Developer, mobile",
-    "mobile engineer": "Developer, mobile",
-    "ios developer": "Developer, mobile",
-    "android developer": "Developer, mobile",
-    "game dev": "Developer, game or graphics",
-    "game developer": "Developer, game or graphics",
-    "graphics developer": "Developer, game or graphics",
-    "desktop dev": "Developer, desktop or enterprise applications",
-    "desktop developer": "Developer, desktop or enterprise applications",
-    "enterprise developer": "Developer, desktop or enterprise applications",
-    "embedded developer": "Developer, embedded applications or devices",
-    "embedded engineer": "Developer, embedded applications or devices",
-    "iot developer": "Developer, embedded applications or devices",
-    
-    # Architecture
-    "architect": "Architect, software or solutions",
-    "software architect": "Architect, software or solutions",
-    "solutions architect": "Architect, software or solutions",
-    "solution architect": "Architect, software or solutions",
-    
-    # Finance
-    "financial analyst": "Financial analyst or engineer",
-    "financial engineer": "Financial analyst or engineer",
-    "quant": "Financial analyst or engineer",
-}
+from .title_resolver import SYNONYMS, normalize_job_titles
 
 # --- User context for personalized recommendations ---
-_current_user_id = None # Stores the logged-in user ID globally for this module
+# The user ID lives in a contextvar (see context.py), so concurrent requests
+# in the same worker each see their own caller.
+from .context import get_user_id, set_user_id as _set_context_user_id
 
 def set_user_id(user_id: str):
-    """Store current user ID so the personalized tool knows who is calling."""
-    global _current_user_id
-    _current_user_id = user_id
+    """Store current user ID (for this request only) so the personalized tool knows who is calling."""
+    token = _set_context_user_id(user_id)
     print(f"👤 User ID set: {user_id}")
+    return token
+
+def _user_profile(user_id):
+    """The user's saved profile (job title + skills), remembered for the session."""
+    profile = recall("profile")
+    if profile is None and user_id:
+        profile = fetch_user_profile(user_id)
+        if profile:
+            remember(profile=profile)
+    return profile
+
+
+async def _auser_profile(user_id):
+    profile = recall("profile")
+    if profile is None and user_id:
+        profile = await fetch_user_profile_async(user_id)
+        if profile:
+            remember(profile=profile)
+    return profile
 
-def get_user_id() -> str:
-    """Return the active user ID (None if user not logged in)."""
-    return _current_user_id
 
 def personalized_recommendation_wrapper(query: str) -> str:
     """
     Main handler for personalized recommendations.
-    Pulls the user profile → queries Neo4j directly → formats results with courses.
+    Pulls the user profile → related jobs + missing skills + courses (personalized.py).
     """
     try:
         user_id = get_user_id()
+        profile = _user_profile(user_id)
+        problem = profile_problem(user_id, profile)
+        if problem:
+            return problem
         
-        # Ensure user is logged in before accessing profile
-        if not user_id:
-            return "I need you to be logged in to generate personalized recommendations."
-        
-        # Fetch the user's saved profile (job title + skills)
-        profile = fetch_user_profile(user_id)
-        
-        if not profile:
-            return "I couldn't find your profile. Please make sure you've filled out your job title and skills in your profile."
-        
-        user_job = profile.get('job_title')
-        user_skills = profile.get('skills', [])
-        
-        if not user_job:
-            return "Please add your current job title to your profile first."
-        
-        print(f"👤 Generating recommendations for: {user_job}")
-        print(f"📚 User skills: {user_skills}")
-    
-        
-        # Query Neo4j graph directly instead of multi-step LangChain chain
-        from .chains import graph
-        
-        # pre-defined function that aligns with skill graph recommendation method
-        cypher_query = f"""
-        MATCH (current:Job {{name: '{user_job}'}})-[r:RELATED_TO]->(related:Job)
-        RETURN related.name AS job_name,
-               related.top_language AS language,
-               related.top_database AS database, 
-               related.top_platform AS platform,
-               related.top_webframe AS framework,
-               related.median_comp AS salary,
-               related.median_workexp AS experience,
-               r.weight AS similarity
-        ORDER BY r.weight ASC
-        LIMIT 3
-        """
-        
-        print(f"🔍 Executing Cypher query...")
-        neo4j_results = graph.query(cypher_query)
-        
-        # Handle case where user job isn't in the graph
-        if not neo4j_results:
-            return f"I couldn't find any career recommendations for {user_job}. This might be because the job title isn't in our database."
-        
-        print(f"✅ Found {len(neo4j_results)} recommendations")
-        
-        # Format the output with courses using our own custom function in the recommendation_helper file
-        formatted_output = format_recommendation_output(
-            user_job=user_job,
-            recommendations=neo4j_results,
-            user_skills=user_skills,
-            vector_store=supabase_vector_store # Pass vector DB for course enrichment
-        )
-        
-        print(f"📝 Formatted output length: {len(formatted_output)} characters")
-        
-        return formatted_output # Final personalized recommendation answer to user
+        recommendation = recommend(user_id, profile)
+        print(f"📝 Recommendation for {recommendation['user_job']} (cached: {recommendation['cached']})")
+        return remember_recommendation(profile, recommendation)
         
     except Exception as e:
         # Catch errors so agent does not crash
@@ -256,6 +115,31 @@ def personalized_recommendation_wrapper(query: str) -> str:
         traceback.print_exc()
         return f"I encountered an error generating your recommendations: {str(e)}"
 
+
+async def apersonalized_recommendation_wrapper(query: str) -> str:
+    """
+    Async version of personalized_recommendation_wrapper.
+    Profile lookup runs on the bounded DB pool and the graph query on the async
+    Neo4j driver, so the request never ties up the event loop or LangChain's
+    default thread executor.
+    """
+    try:
+        user_id = get_user_id()
+        profile = await _auser_profile(user_id)
+        problem = profile_problem(user_id, profile)
+        if problem:
+            return problem
+        
+        recommendation = await arecommend(user_id, profile)
+        print(f"📝 Recommendation for {recommendation['user_job']} (cached: {recommendation['cached']})")
+        return remember_recommendation(profile, recommendation)
+        
+    except Exception as e:
+        print(f"❌ Error in apersonalized_recommendation_wrapper: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return f"I encountered an error generating your recommendations: {str(e)}"
+
 # --- Agent prompt ---
 career_agent_prompt = ChatPromptTemplate.from_messages([
     ("system", """You are a career advisor assistant with access to three tools:
@@ -283,14 +167,15 @@ Use **CourseRecommendations** for learning materials:
 
 CRITICAL: Always pass the COMPLETE user query to the tool.
 
+If a question has several independent parts (e.g. similar jobs AND courses), call every
+tool it needs in the SAME turn: the calls run in parallel and you answer once with all results.
+
 """),
     ("human", "{input}"),
     MessagesPlaceholder(variable_name="agent_scratchpad"),
 ])
 
 
-import re
-
 def normalize_job_title_in_query(query: str) -> str:
     """
     Normalize user-written job titles (slang, abbreviations, fuzzy descriptions)
@@ -302,89 +187,113 @@ def normalize_job_title_in_query(query: str) -> str:
 
     This ensures the Cypher generator always receives valid job titles.
     """
+    return normalize_job_titles(query)[0]
 
-    # Create a set of all normalized values to avoid re-normalizing
-    normalized_values = set(SYNONYMS.values())
-    
-    # If the whole query is exactly a normalized title, return as-is
-    if query.strip() in normalized_values:
-        return query.strip()
-    
-    # Sort keys longest→shortest to avoid partial matches breaking phrases
-    sorted_synonyms = sorted(SYNONYMS.items(), key=lambda x: len(x[0]), reverse=True)
-    
-    # Track replacements to avoid overlaps
-    replacements = []
-    
-    for title, normalized_title in sorted_synonyms:
-        # Skip if we're trying to normalize to the same thing
-        if title == normalized_title:
-            continue
-            
-        # Escape special regex characters
-        escaped_title = re.escape(title)
-        
-        # Word-boundary logic that works even with dashes/slashes/commas
-        pattern = r'(?<![a-zA-Z0-9])' + escaped_title + r'(?![a-zA-Z0-9])'
-        
-        # Find all occurrences case-insensitively
-        for match in re.finditer(pattern, query, flags=re.IGNORECASE):
-            start, end = match.start(), match.end()
-            
-            # Avoid replacing inside already-replaced segments
-            overlap = False
-            for rep_start, rep_end, _ in replacements:
-                if not (end <= rep_start or start >= rep_end):
-                    overlap = True
-                    break
-            
-            if not overlap:
-                # Avoid replacing inside an already-normalized job title
-                context_start = max(0, start - 50)
-                context_end = min(len(query), end + 50)
-                context = query[context_start:context_end]
-                
-                # Skip if this match is within a normalized value
-                is_within_normalized = False
-                for norm_value in normalized_values:
-                    if norm_value in context and title in norm_value:
-                        is_within_normalized = True
-                        break
-                
-                if not is_within_normalized:
-                    replacements.append((start, end, normalized_title))
-    
-    # Apply replacements from back-to-front so indices don't shift
-    replacements.sort(key=lambda x: x[0], reverse=True)
-    
-    # Apply replacements
-    result = query
-    for start, end, normalized_title in replacements:
-        result = result[:start] + normalized_title + result[end:]
-    
-    return result
 
+def resolved_job_titles(normalized_query: str) -> list:
+    """Return the canonical job titles mentioned in an already-normalized query."""
+    return normalize_job_titles(normalized_query)[1]
 
 
 def graph_chain_wrapper(query: str) -> str:
     """
     Wrapper for career graph queries:
     1. Normalize job titles in user query
-    2. Pass normalized query to Cypher chain
+    2. Look up cached Cypher (else generate it with the LLM)
+    3. Look up cached Neo4j rows (else run the query)
+    4. Format the rows into an answer
+    Cheaper paths when the request budget runs low or a dependency is unavailable:
+    no budget for the Cypher LLM / Neo4j → job properties from the local graph;
+    no budget for the answer LLM → deterministic formatting of the rows.
     """
     try:
         # Normalize any job titles in the query
         normalized_query = normalize_job_title_in_query(query)
         
-        # Pass the full normalized query to Cypher generation
-        result = career_cypher_chain.invoke({"query": normalized_query})
-        return result.get("result", str(result))
+        # Cache key: normalized question + synonym-resolved titles + graph version
+        data_version = graph_data_version()
+        cache_key = cypher_cache.question_key(
+            normalized_query, resolved_job_titles(normalized_query), data_version
+        )
+        
+        cypher = cypher_cache.get_cypher(cache_key)
+        if cypher is None:
+            # Cache miss: Cypher generation + answer formatting both need the LLM
+            if not has_budget(2 * LLM_MIN_BUDGET):
+                return _local_graph_answer(normalized_query, "not enough time left for the Cypher LLM")
+            cypher = generate_cypher(normalized_query)
+        else:
+            print("⚡ Cypher cache hit")
+        
+        rows = cypher_cache.get_rows(cypher, None, data_version)
+        if rows is None:
+            try:
+                rows = run_cypher(cypher)
+            except GRAPH_UNAVAILABLE as e:
+                return _local_graph_answer(normalized_query, e)
+            cypher_cache.put_rows(cypher, None, data_version, rows)
+        else:
+            print("⚡ Graph result cache hit")
+        
+        # Only cache Cypher that was generated, validated and executed successfully
+        cypher_cache.put_cypher(cache_key, cypher)
+        
+        if not has_budget(LLM_MIN_BUDGET):
+            print("⏱️ Request budget low, formatting rows without the answer LLM")
+            return _rows_as_text(rows)
+        try:
+            return answer_from_rows(normalized_query, rows)
+        except LLM_UNAVAILABLE as e:
+            # Degraded: the rows are already here, show them without the formatting LLM
+            print(f"⚠️ Answer LLM unavailable, returning raw rows: {e}")
+            return _rows_as_text(rows)
+    
+    except LLM_UNAVAILABLE as e:
+        return _local_graph_answer(normalized_query, e)
     
     except Exception as e:
         print(f"❌ Error in graph_chain_wrapper: {str(e)}")
         return f"I encountered an error querying the career database: {str(e)}"
 
 
+def _rows_as_text(rows: list) -> str:
+    """Plain listing of Neo4j rows (used when the answer LLM is unavailable)."""
+    if not rows:
+        return "I couldn't find matching data in the career database."
+    lines = ["Here is what I found in the career database:\n"]
+    for i, row in enumerate(rows, 1):
+        lines.append(f"{i}. " + ", ".join(f"{key}: {value}" for key, value in row.items()))
+    return "\n".join(lines)
+
+
+def is_degraded_output(output: str) -> bool:
+    """True for answers built on a fallback path (these must not be cached)."""
+    return QUICK_ANSWER_NOTICE in output or DEGRADED_ANSWER in output
+
+
+def _local_graph_answer(normalized_query: str, reason) -> str:
+    """Properties of the jobs named in the query, from the in-memory career graph."""
+    print(f"⚠️ Answering from the local career graph ({reason})")
+    rows = get_local_graph().job_rows(resolved_job_titles(normalized_query))
+    if not rows:
+        return DEGRADED_ANSWER
+    return _rows_as_text(rows) + QUICK_ANSWER_NOTICE
+
+
+def _format_courses(docs: list) -> str:
+    """Numbered course list with the REAL metadata URLs."""
+    if not docs:
+        return "I couldn't find any relevant courses. Try different keywords."
+    
+    # Build numbered list with clickable URLs
+    response = "Here are some recommended courses:\n\n"
+    for i, doc in enumerate(docs, 1):
+        title = doc.metadata.get('title', 'Unknown Course')
+        url = doc.metadata.get('course_url', '#')
+        response += f"{i}. [{title}]({url})\n"
+    return response
+
+
 def course_chain_wrapper(query: str) -> str:
     """
     Wrapper for course recommendation:
@@ -394,27 +303,29 @@ def course_chain_wrapper(query: str) -> str:
     try:
         print(f"Received query: {query}")
         
+        if not has_budget(LLM_MIN_BUDGET):
+            # The answer is built from the retrieved documents anyway, so skip the LLM
+            print("⏱️ Request budget low, returning retrieved courses without the LLM")
+            return _format_courses(qa_chain.retriever.invoke(query))
+        
         result = qa_chain.invoke({"query": query})
         
         # If the chain returned retrieved documents, format manually
         if isinstance(result, dict) and "source_documents" in result:
-            docs = result["source_documents"]
-
-            if not docs:
-                return "I couldn't find any relevant courses. Try different keywords."
-            
-            # Build numbered list with clickable URLs
-            response = "Here are some recommended courses:\n\n"
-            for i, doc in enumerate(docs, 1):
-                title = doc.metadata.get('title', 'Unknown Course')
-                url = doc.metadata.get('course_url', '#')
-                response += f"{i}. [{title}]({url})\n"
-            
-            return response
+            return _format_courses(result["source_documents"])
         
         # Otherwise fallback to chain output
         return result.get("result", str(result))
     
+    except LLM_UNAVAILABLE as e:
+        # Degraded: the answer only lists retrieved courses, so skip the LLM
+        print(f"⚠️ Course LLM unavailable, returning retrieved courses: {e}")
+        try:
+            return _format_courses(qa_chain.retriever.invoke(query))
+        except Exception as retrieval_error:
+            print(f"❌ Course retrieval failed: {retrieval_error}")
+            return DEGRADED_ANSWER
+    
     except Exception as e:
         print(f"❌ Error in course_chain_wrapper: {str(e)}")
         return f"I encountered an error searching for courses: {str(e)}"
@@ -435,6 +346,7 @@ tools = [
     Tool(
         name="PersonalizedCareerRecommendation",
         func=personalized_recommendation_wrapper,
+        coroutine=apersonalized_recommendation_wrapper if ASYNC_TOOLS else None,
         description=(
             "Use ONLY when user asks for PERSONALIZED career recommendations like: "
             "'Generate my career recommendation', 'What career paths for me', 'Recommend careers for me'. "
@@ -453,16 +365,53 @@ tools = [
         ),
     ),
 ]
+# Tool slots of the current request: an asyncio.Semaphore created on the request's
+# event loop (a module-level one would be bound to whichever loop used it first)
+_tool_slots = contextvars.ContextVar("chatbot_tool_slots", default=None)
+
+
+@contextlib.contextmanager
+def _tool_concurrency(limit: int = None):
+    """Let at most `limit` (CHATBOT_TOOL_CONCURRENCY) tool calls of this request run at once (inside the event loop)."""
+    token = _tool_slots.set(asyncio.Semaphore(limit or CHATBOT_TOOL_CONCURRENCY))
+    try:
+        yield
+    finally:
+        _tool_slots.reset(token)
+
+
+def _bounded(func, coroutine):
+    """
+    Async entry point for a tool: waits for one of the request's tool slots, then
+    awaits the tool's coroutine (or runs its sync function in a thread). The
+    AgentExecutor gathers all tool calls of one model turn, so independent calls run
+    concurrently and a multi-part question costs about max(tool) rather than sum(tool).
+    """
+    async def run(*args, **kwargs):
+        async with _tool_slots.get() or contextlib.nullcontext():
+            if coroutine is not None:
+                return await coroutine(*args, **kwargs)
+            return await asyncio.to_thread(func, *args, **kwargs)
+    return run
+
+
+for tool in tools:
+    # Time every tool run as a stage of the request (recorded with the chat history)
+    tool.func = timed(f"tool.{tool.name}", tool.func)
+    tool.coroutine = _bounded(tool.func, timed(f"tool.{tool.name}", tool.coroutine))
+
 
 # --- Initialize the LLM used by the agent ---
-chat_model = ChatOpenAI(
-    model=CAREER_AGENT_MODEL, # Model name loaded from .env
-    temperature=0, # Deterministic actions (important for tools)
+chat_model = get_chat_model(
+    "agent",
+    CAREER_AGENT_MODEL, # Model name loaded from .env (temperature 0: deterministic tool choice)
+    tags=["agent_answer"], # Lets the streaming endpoint pick out final-answer tokens
 )
 
 
 # --- Agent prompt: instructs how the agent chooses tools ---
-career_rag_agent = create_openai_functions_agent(
+# Tools agent: the model may request several tool calls in one turn (run in parallel below)
+career_rag_agent = create_openai_tools_agent(
     llm=chat_model,
     prompt=career_agent_prompt,
     tools=tools,
@@ -478,4 +427,199 @@ career_rag_agent_executor = AgentExecutor(
 )
 
 
+# Lookup used by the intent router to dispatch straight to a tool
+tools_by_name = {tool.name: tool for tool in tools}
+
+
+def _routed_result(decision: dict, text: str, output: str) -> dict:
+    """Shape a directly-dispatched tool output like an AgentExecutor result."""
+    action = AgentAction(
+        tool=decision["tool"],
+        tool_input=text,
+        log=f"Routed locally ({decision['method']}, confidence {decision['confidence']:.2f})",
+    )
+    return {
+        "input": text,
+        "output": output,
+        "intermediate_steps": [(action, output)],
+        "routing": decision,
+    }
+
+
+async def arun_career_agent(text: str) -> dict:
+    """
+    Answer a query asynchronously:
+    - Confident router decision → call the tool directly (no tool-selection LLM call)
+    - Otherwise → delegate to the full agent
+    """
+    followup, text = _resolve_followup(text)
+    if followup:
+        return followup
+    
+    with timed_stage("route"):
+        decision = get_router().route(text) if ROUTER_ENABLED else None
+    
+    if decision and decision["tool"] != AGENT:
+        print(f"🧭 Routed to {decision['tool']} without the agent")
+        output = await tools_by_name[decision["tool"]].ainvoke(text)
+        return _routed_result(decision, text, output)
+    
+    # The agent needs at least two LLM calls (tool choice + answer)
+    if not has_budget(2 * LLM_MIN_BUDGET):
+        return _degraded_result(text, decision)
+    try:
+        with _tool_concurrency():
+            result = await career_rag_agent_executor.ainvoke({"input": text})
+    except LLM_UNAVAILABLE as e:
+        print(f"⚠️ Agent LLM unavailable: {e}")
+        return _degraded_result(text, decision)
+    if decision:
+        result["routing"] = decision
+    return result
+
+
+# Tool name reported for follow-ups answered from the session working memory
+SESSION_MEMORY = "SessionMemory"
+
+
+def _resolve_followup(text: str):
+    """
+    Follow-ups that point at this session's last recommendations ("#2", "the second one"):
+    - course questions are answered from the remembered missing skills + courses
+    - anything else gets the job title substituted, so the usual tools can answer it
+    Returns (result or None, text to answer).
+    """
+    remembered = recall("recommendation")
+    reference = find_reference(text, len(remembered["jobs"])) if remembered else None
+    if reference is None:
+        return None, text
+    
+    phrase, index = reference
+    job = remembered["jobs"][index]
+    if is_course_followup(text):
+        print(f"🧠 Answered from session memory: courses for {job['job_name']}")
+        decision = {"tool": SESSION_MEMORY, "method": "session_memory", "confidence": 1.0}
+        return _routed_result(decision, text, format_job_courses(index + 1, job)), text
+    
+    print(f"🧠 Follow-up resolved: {phrase!r} → {job['job_name']}")
+    return None, text.replace(phrase, job["job_name"], 1)
+
+
+def _degraded_result(text: str, decision: dict = None, output: str = DEGRADED_ANSWER) -> dict:
+    """AgentExecutor-shaped result for when the agent LLM is unavailable (or out of time)."""
+    result = {"input": text, "output": output, "intermediate_steps": [], "degraded": True}
+    if decision:
+        result["routing"] = decision
+    return result
+
+
+def _step_summary(output, limit: int = 200) -> str:
+    """Short one-line summary of a tool output for streaming progress events."""
+    text = " ".join(str(output).split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+async def astream_career_agent(text: str):
+    """
+    Streaming counterpart of arun_career_agent.
+    Yields dicts as the run progresses:
+    - {"event": "tool", "data": {...}}    tool selected
+    - {"event": "step", "data": {...}}    tool finished (short summary)
+    - {"event": "token", "data": {...}}   final-answer token
+    - {"event": "final", "result": {...}} AgentExecutor-shaped result
+    Events reach the browser as they are yielded only when the app is served
+    over ASGI (uvicorn myapp.asgi:application); WSGI buffers the whole stream.
+    """
+    followup, text = _resolve_followup(text)
+    if followup:
+        yield {"event": "final", "result": followup}
+        return
+    
+    with timed_stage("route"):
+        decision = get_router().route(text) if ROUTER_ENABLED else None
+    routed = bool(decision and decision["tool"] != AGENT)
+    
+    if routed:
+        # Direct tool call: only the CareerGraph QA LLM produces answer tokens
+        yield {"event": "tool", "data": {"tool": decision["tool"], "routed": True}}
+        stream = tools_by_name[decision["tool"]].astream_events(text, version="v2")
+        token_tags = {"graph_answer"}
+    elif not has_budget(2 * LLM_MIN_BUDGET):
+        yield {"event": "final", "result": _degraded_result(text, decision)}
+        return
+    else:
+        # Full agent: stream the agent LLM's final answer, not the sub-chain LLMs
+        stream = career_rag_agent_executor.astream_events({"input": text}, version="v2")
+        token_tags = {"agent_answer"}
+    
+    output = None
+    intermediate_steps = []
+    
+    with _tool_concurrency():  # Parallel tool calls of one agent turn share the request's slots
+        async for event in stream:
+            kind = event["event"]
+            name = event.get("name")
+
+            if kind == "on_tool_start" and name in tools_by_name and not routed:
+                yield {"event": "tool", "data": {"tool": name, "routed": False}}
+
+            elif kind == "on_tool_end" and name in tools_by_name:
+                tool_output = event["data"].get("output", "")
+                tool_output = getattr(tool_output, "content", tool_output)  # ToolMessage → str
+                action = AgentAction(tool=name, tool_input=text, log="streamed")
+                intermediate_steps.append((action, tool_output))
+                yield {"event": "step", "data": {"tool": name, "summary": _step_summary(tool_output)}}
+                if routed:
+                    output = tool_output
+
+            elif kind == "on_chat_model_stream" and token_tags & set(event.get("tags", [])):
+                content = event["data"]["chunk"].content
+                if content:
+                    yield {"event": "token", "data": {"text": content}}
+
+            elif kind == "on_chain_end" and not routed and not event.get("parent_ids"):
+                # Root AgentExecutor run finished (covers return_direct tools too)
+                output = (event["data"].get("output") or {}).get("output", output)
+    
+    result = {
+        "input": text,
+        "output": output or "No response generated",
+        "intermediate_steps": intermediate_steps,
+    }
+    if decision:
+        result["routing"] = decision
+    yield {"event": "final", "result": result}
+
+
+def run_career_agent(text: str) -> dict:
+    """
+    Synchronous counterpart of arun_career_agent (used by the sync fallback view).
+    Tool calls of one agent turn run one after another here (AgentExecutor.invoke
+    has no tool slots); only the async entry points run them concurrently. It
+    stays fully synchronous on purpose: the sync view is the fallback for
+    deployments where async views misbehave.
+    """
+    followup, text = _resolve_followup(text)
+    if followup:
+        return followup
+    
+    with timed_stage("route"):
+        decision = get_router().route(text) if ROUTER_ENABLED else None
+    
+    if decision and decision["tool"] != AGENT:
+        output = tools_by_name[decision["tool"]].invoke(text)
+        return _routed_result(decision, text, output)
+    
+    if not has_budget(2 * LLM_MIN_BUDGET):
+        return _degraded_result(text, decision)
+    try:
+        result = career_rag_agent_executor.invoke({"input": text})
+    except LLM_UNAVAILABLE as e:
+        print(f"⚠️ Agent LLM unavailable: {e}")
+        return _degraded_result(text, decision)
+    if decision:
+        result["routing"] = decision
+    return result
+
+
 print("✅ Career RAG Agent initialized successfully")
\ No newline at end of file
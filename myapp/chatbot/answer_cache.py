@@ -0,0 +1,225 @@
+"""
+Semantic answer cache for the chatbot API
+Two tiers in front of the full agent run:
+1. Exact match on the normalized question text
+2. Nearest-neighbour match on the question embedding above a similarity threshold,
+   among cached questions naming the same job titles and technologies (so
+   "skills for a data scientist" never answers "...for a data engineer")
+Only answers produced by non-personalised tools are stored, and every entry is
+keyed on the graph + course data version, with a TTL and LRU size bound.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .cypher_cache import normalize_question
+from .data_version import on_graph_version_change
+from .session_memory import has_reference
+
+# Cache configuration (tunable from the environment)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1").lower() in ("1", "true", "yes")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+
+# Tools whose answers do not depend on who is asking
+CACHEABLE_TOOLS = {"CareerGraph", "CourseRecommendations"}
+
+# Questions about "me"/"my" may be personalised even if phrased like a general question
+_PERSONAL_PATTERN = re.compile(r"\b(i|me|my|mine|myself)\b", re.IGNORECASE)
+
+
+def is_personal_query(text: str) -> bool:
+    """Return True if the question refers to the asking user (or to an earlier answer, like "#2")."""
+    return bool(_PERSONAL_PATTERN.search(text)) or has_reference(text)
+
+
+def question_entities(text: str) -> frozenset:
+    """Job titles (title_resolver) + technologies (skill_matcher) a question names."""
+    from .skill_matcher import get_skill_matcher
+    from .title_resolver import normalize_job_titles
+
+    titles = normalize_job_titles(text)[1]
+    return frozenset([("job", title) for title in titles] +
+                     [("tech", skill) for skill in get_skill_matcher().mentions(text)])
+
+
+def tools_used(result: dict) -> list:
+    """Extract the tool names used by an agent run from its intermediate steps."""
+    if "tools" in result:  # Result serialized by an agent worker (see job_queue.py)
+        return list(result["tools"])
+    names = []
+    for step in result.get("intermediate_steps", []) or []:
+        action = step[0] if isinstance(step, (list, tuple)) and step else None
+        tool = getattr(action, "tool", None)
+        if tool:
+            names.append(tool)
+    return names
+
+
+class AnswerCache:
+    """
+    Exact + semantic answer cache.
+    Entries: normalized text → {answer, tools, version, created_at, embedding, entities}
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 threshold=ANSWER_CACHE_SIMILARITY, embed_fn=None, entities_fn=question_entities):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embed_fn = embed_fn  # Callable[[str], List[float]] or None (semantic tier off)
+        self.entities_fn = entities_fn  # Callable[[str], frozenset] or None (no entity check)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def embed(self, text: str):
+        """Embed a question (normalized to unit length), or None if embeddings are unavailable."""
+        if self.embed_fn is None:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️ Answer cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expired(self, entry, now) -> bool:
+        return now - entry["created_at"] > self.ttl
+
+    def _exact(self, key, data_version, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["version"] == data_version and not self._expired(entry, now):
+            self._entries.move_to_end(key)
+            return entry
+        del self._entries[key]  # Stale version or expired
+        return None
+
+    def entities(self, text: str):
+        """Entities a semantic hit must share with the question (None when unchecked)."""
+        if self.entities_fn is None:
+            return None
+        try:
+            return self.entities_fn(text)
+        except Exception as e:
+            print(f"⚠️ Answer cache entity extraction failed: {e}")
+            return False  # Matches no entry: unsure questions skip the semantic tier
+
+    def _nearest(self, embedding, entities, data_version, now):
+        if entities is False:
+            return None
+        candidates = [
+            (k, e) for k, e in self._entries.items()
+            if e["embedding"] is not None
+            and e["version"] == data_version
+            and e.get("entities") == entities
+            and not self._expired(e, now)
+        ]
+        if not candidates:
+            return None
+        matrix = np.stack([e["embedding"] for _, e in candidates])
+        scores = matrix @ embedding  # Cosine similarity (unit vectors)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        best_key, best_entry = candidates[best]
+        self._entries.move_to_end(best_key)
+        return dict(best_entry, similarity=float(scores[best]))
+
+    def lookup(self, text: str, data_version: str):
+        """
+        Return (entry, tier, embedding).
+        tier is "exact", "semantic" or None on a miss. The question embedding is
+        only computed after an exact miss and is returned so store() can reuse it.
+        """
+        key = normalize_question(text)
+        now = time.time()
+
+        # Tier 1: exact normalized-text match
+        with self._lock:
+            entry = self._exact(key, data_version, now)
+            if entry is not None:
+                self._stats["exact_hits"] += 1
+                return entry, "exact", None
+
+        # Tier 2: nearest neighbour over the cached question embeddings naming the same entities
+        embedding = self.embed(text)
+        entities = self.entities(text) if embedding is not None else None
+        with self._lock:
+            if embedding is not None:
+                entry = self._nearest(embedding, entities, data_version, now)
+                if entry is not None:
+                    self._stats["semantic_hits"] += 1
+                    return entry, "semantic", embedding
+            self._stats["misses"] += 1
+        return None, None, embedding
+
+    def store(self, text: str, answer: str, tools, data_version: str, embedding=None):
+        """Cache an answer if every tool that produced it is non-personalised."""
+        tools = list(tools or [])
+        if not tools or not set(tools) <= CACHEABLE_TOOLS:
+            return False
+        if is_personal_query(text) or answer.startswith("I encountered an error"):
+            return False
+
+        key = normalize_question(text)
+        entities = self.entities(text) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "tools": tools,
+                "version": data_version,
+                "created_at": time.time(),
+                "embedding": embedding,
+                "entities": entities,
+            }
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # Evict least recently used
+                self._stats["evictions"] += 1
+        return True
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        stats["semantic_enabled"] = self.embed_fn is not None
+        stats["threshold"] = self.threshold
+        return stats
+
+
+def _build_answer_cache() -> AnswerCache:
+    """
+    Create the shared cache, reusing the sentence embeddings from chains.py if loaded.
+    Web workers in agent queue mode don't load chains.py, so they keep the exact tier only.
+    """
+    from .job_queue import runs_agent_in_process
+    if not runs_agent_in_process():
+        return AnswerCache(embed_fn=None)
+    from .chains import embeddings
+
+    embed_fn = embeddings.embed_query if embeddings is not None else None
+    return AnswerCache(embed_fn=embed_fn)
+
+
+# Shared cache instance used by query_chatbot_api
+answer_cache = _build_answer_cache()
+
+# Drop all answers as soon as a graph reload is detected
+on_graph_version_change(answer_cache.invalidate)
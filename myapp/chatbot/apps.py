@@ -14,4 +14,8 @@ class ChatbotConfig(AppConfig):
     name = 'chatbot'
 
     # Human-readable name shown in Django Admin
-    verbose_name = 'Career Chatbot'
\ No newline at end of file
+    verbose_name = 'Career Chatbot'
+
+    def ready(self):
+        # Connects the Profile signals that reset the session working memory
+        from . import session_memory  # noqa: F401
\ No newline at end of file
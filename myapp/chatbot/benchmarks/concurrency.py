@@ -0,0 +1,147 @@
+"""
+Concurrency benchmark for the chatbot query API
+Fires batches of simultaneous requests at /askai/api/query/ on a running
+server and reports throughput and latency at each concurrency level, plus the
+highest level one worker sustains within the latency target.
+
+Compare the async tool path with the thread-executor path by starting the
+server twice (one ASGI worker each time), with every layer that would answer a
+repeated question without running the tool turned off:
+    export CHATBOT_COALESCING=0 ANSWER_CACHE=0 RECOMMENDATION_CACHE_SIZE=0
+    CHATBOT_ASYNC_TOOLS=0 uvicorn myapp.asgi:application --workers 1   # before
+    CHATBOT_ASYNC_TOOLS=1 uvicorn myapp.asgi:application --workers 1   # after
+Otherwise one user's repeated "Generate my career recommendation" is shared
+between in-flight requests and then served from the RecommendationCache, and
+the run measures cache hits rather than the tool path.
+
+Usage (from this folder, with logged-in users' session cookies; requests are
+spread round-robin over them):
+    python concurrency.py --sessionid <cookie> [<cookie> ...] --levels 1 4 16 32 64
+    python concurrency.py --sessionid <cookie> --query "Which jobs use Python?"
+
+The default query is routed straight to PersonalizedCareerRecommendation
+(no LLM call, never answer-cached), so with the caches off it exercises the
+profile + graph path. Responses the server marks as cached or coalesced are
+counted and reported; a non-zero count means the caches are still on.
+"""
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+
+import httpx
+
+DEFAULT_QUERY = "Generate my career recommendation"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def one_request(session, url, query):
+    """POST one question; returns (latency, ok, reused) where reused = served from a cache or a shared run."""
+    client, csrftoken = session
+    started = time.perf_counter()
+    reused = False
+    try:
+        response = await client.post(
+            url,
+            json={"text": query},
+            headers={"X-CSRFToken": csrftoken, "Referer": str(client.base_url)},
+        )
+        data = response.json()
+        ok = response.status_code == 200 and data.get("success", False)
+        reused = bool(data.get("cached") or data.get("coalesced"))
+    except (httpx.HTTPError, ValueError):
+        ok = False
+    return time.perf_counter() - started, ok, reused
+
+
+async def run_level(sessions, url, query, concurrency, rounds):
+    """Send `rounds` waves of `concurrency` simultaneous requests, round-robin over the users."""
+    latencies, failures, reused = [], 0, 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        results = await asyncio.gather(*[
+            one_request(sessions[i % len(sessions)], url, query) for i in range(concurrency)
+        ])
+        for latency, ok, shared in results:
+            latencies.append(latency)
+            failures += not ok
+            reused += shared
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "failures": failures,
+        "reused": reused,
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 95),
+    }
+
+
+async def open_session(stack, args, sessionid):
+    """One client per user; fetch the chat page once to receive a CSRF cookie for the POSTs."""
+    client = await stack.enter_async_context(httpx.AsyncClient(
+        base_url=args.base_url, cookies={"sessionid": sessionid}, timeout=httpx.Timeout(args.timeout),
+        limits=httpx.Limits(max_connections=max(args.levels)),
+    ))
+    await client.get("/askai/")
+    csrftoken = client.cookies.get("csrftoken", "")
+    if not csrftoken:
+        print("⚠️ No csrftoken cookie received; requests will likely be rejected (403)")
+    return client, csrftoken
+
+
+async def main_async(args):
+    async with contextlib.AsyncExitStack() as stack:
+        sessions = [await open_session(stack, args, sessionid) for sessionid in args.sessionid]
+
+        url = "/askai/api/query/"
+        for session in sessions:
+            await one_request(session, url, args.query)  # Warm-up (lazy drivers, router)
+
+        rows = []
+        for level in args.levels:
+            row = await run_level(sessions, url, args.query, level, args.rounds)
+            rows.append(row)
+            print(f"  concurrency {level:>4}: {row['throughput']:6.1f} req/s  "
+                  f"p50 {row['p50'] * 1000:7.0f} ms  p95 {row['p95'] * 1000:7.0f} ms  "
+                  f"failures {row['failures']}  cached/coalesced {row['reused']}")
+
+    # Highest level whose p95 stays within the target and has no failures
+    baseline = rows[0]["p50"]
+    target = args.max_p95 or baseline * 2
+    sustained = [r["concurrency"] for r in rows if r["p95"] <= target and not r["failures"]]
+    print("\n📊 CONCURRENCY SUMMARY")
+    print(f"  Query:            {args.query}")
+    print(f"  Users:            {len(sessions)}")
+    print(f"  p95 target:       {target * 1000:.0f} ms")
+    print(f"  Sustained level:  {max(sustained) if sustained else 'none'}")
+    print(f"  Peak throughput:  {max(r['throughput'] for r in rows):.1f} req/s")
+    if any(r["reused"] for r in rows):
+        print("⚠️ Some answers were cached or coalesced: restart the server with "
+              "CHATBOT_COALESCING=0 ANSWER_CACHE=0 RECOMMENDATION_CACHE_SIZE=0 to measure the tool path")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessionid", required=True, nargs="+",
+                        help="sessionid cookies of users with a profile (requests are spread over them)")
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--rounds", type=int, default=3, help="Waves of requests per level")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--max-p95", type=float, help="p95 target in seconds (default: 2x single-request p50)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
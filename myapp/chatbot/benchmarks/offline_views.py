@@ -0,0 +1,131 @@
+"""
+In-process benchmark of every view on the offline profile
+Loads the whole webapp with CHATBOT_OFFLINE=1 (local graph, local course
+index, stub Supabase, fake LLM; see chatbot/offline.py), logs in the demo user
+created by `manage.py seed_offline` and times each page and chatbot endpoint
+through Django's test client, so no server, network or credentials are needed.
+--llm-latency sets the fake LLM's simulated seconds per call.
+
+Usage (from this folder):
+    CHATBOT_OFFLINE=1 python ../../manage.py seed_offline
+    python offline_views.py
+    python offline_views.py --repeat 50 --llm-latency 0.2 --output results/views.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, "..", "..")))
+
+from concurrency import percentile  # noqa: E402
+
+PAGES = ["/", "/dashboard/", "/dashboard/landscape/", "/skillgraph/", "/accounts/profile/",
+         "/accounts/settings/", "/askai/", "/askai/api/health/live/", "/askai/api/health/ready/"]
+QUERIES = [
+    "What is the median salary for a Data scientist?",
+    "Which jobs use React?",
+    "What jobs are similar to Developer, back-end?",
+    "Recommend courses to learn Docker",
+]
+
+
+def _setup(llm_latency: float):
+    """Offline profile env, set before Django (and the chatbot modules) read it."""
+    os.environ["CHATBOT_OFFLINE"] = "1"
+    os.environ["LLM_FAKE_LATENCY"] = str(llm_latency)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myapp.settings")
+    import django
+    django.setup()
+
+
+def _timed(samples: dict, name: str, call) -> bool:
+    started = time.perf_counter()
+    response = call()
+    if getattr(response, "streaming", False):
+        b"".join(response.streaming_content)
+    samples.setdefault(name, []).append(time.perf_counter() - started)
+    return response.status_code == 200
+
+
+def run(client, repeat: int) -> tuple:
+    samples, failures = {}, {}
+    for _ in range(repeat):
+        for page in PAGES:
+            if not _timed(samples, f"GET {page}", lambda: client.get(page)):
+                failures[f"GET {page}"] = failures.get(f"GET {page}", 0) + 1
+        for query in QUERIES:
+            name = f"POST /askai/api/query/ {query[:32]}"
+            if not _timed(samples, name, lambda: client.post(
+                    "/askai/api/query/", json.dumps({"text": query}), content_type="application/json")):
+                failures[name] = failures.get(name, 0) + 1
+        name = "POST /askai/api/recommendation/"
+        if not _timed(samples, name, lambda: client.post(name.split()[1], "{}", content_type="application/json")):
+            failures[name] = failures.get(name, 0) + 1
+    return samples, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Measured requests per view")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured rounds first (chain + index loading)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--email", default="demo@example.com", help="Demo user (see seed_offline)")
+    parser.add_argument("--password", default="offline-demo")
+    parser.add_argument("--output", help="JSON results path (default results/views_<timestamp>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the views' own log lines")
+    args = parser.parse_args()
+
+    _setup(args.llm_latency)
+    from django.conf import settings
+    from django.test import Client
+
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+    client = Client()
+    if not client.login(username=args.email, password=args.password):
+        print("Demo user not found: run `CHATBOT_OFFLINE=1 python manage.py seed_offline` first")
+        return
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        if args.warmup:
+            run(client, args.warmup)
+        samples, failures = run(client, args.repeat)
+
+    table = {
+        name: {
+            "n": len(values),
+            "failed": failures.get(name, 0),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "mean_ms": round(statistics.mean(values) * 1000, 3),
+        }
+        for name, values in samples.items()
+    }
+    print(f"\n{'VIEW':<56} {'n':>5} {'failed':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    print("-" * 98)
+    for name, row in table.items():
+        print(f"{name:<56} {row['n']:>5} {row['failed']:>6} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+              f"{row['p99_ms']:>9.3f}")
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {"repeat": args.repeat, "warmup": args.warmup, "llm_latency_s": args.llm_latency},
+        "views": table,
+    }
+    output = args.output or os.path.join("results", f"views_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Offline latency + retrieval benchmark for the chatbot pipelines
+Runs every labelled question of ../evaluation/test_dataset.py through the
+chatbot's stages against local stand-ins (no OpenAI, Neo4j or Supabase):
+- routing: IntentRouter (keyword rules + centroids over HashingEmbeddings)
+- cypher_generation: the dynamic Cypher prompt + a fake LLM that replies with
+  the question's reference Cypher (the `cypher` label)
+- graph_query: that Cypher on the in-memory career graph built from
+  data/processed_devtype_skills_salaries_exp.csv (local_cypher.py)
+- retrieval: HashingEmbeddings + a LocalCourseIndex of fixtures/courses.json
+- formatting: the answer LLM (fake) over the rows / courses
+LLM stages go through GatewayChatModel, so the gateway's own overhead is
+measured; --llm-latency adds simulated model time per call.
+
+Reports p50/p95/p99 per stage, routing accuracy and retrieval recall@k / MRR
+(graph rows against the `expected` label, courses against
+`relevant_keywords`), and writes everything as JSON.
+
+Usage (from this folder):
+    python pipeline.py
+    python pipeline.py --repeat 50 --k 1 3 5
+    python pipeline.py --llm-latency 0.3 --output results/pipeline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Make the chatbot package + the evaluation labels importable from this folder
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, "..", "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, "..", "evaluation")))
+
+# The skill vocabulary loads through recommendation_helper → accounts.models (no queries are made)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myapp.settings")
+os.environ.setdefault("SUPABASE_POOLER_URL", "sqlite://:memory:")
+import django  # noqa: E402
+
+django.setup()
+
+from langchain_community.chains.graph_qa.cypher import extract_cypher
+from langchain_core.documents import Document
+
+from chatbot.cypher_prompt import CypherPromptBuilder
+from chatbot.llm_gateway import FakeChatModel, GatewayChatModel
+from chatbot.local_cypher import GRAPH_SCHEMA, run_local_cypher
+from chatbot.local_index import HashingEmbeddings, LocalCourseIndex, publish_index
+from chatbot.router import CAREER_GRAPH, COURSES, IntentRouter
+from chatbot.skill_matcher import get_skill_matcher
+from concurrency import percentile
+from test_dataset import COURSE_RECOMMENDATION_TEST_SET, CAREER_GRAPH_TEST_SET
+
+COURSES_FIXTURE = os.path.join(HERE, "fixtures", "courses.json")
+STAGES = ["routing", "cypher_generation", "graph_query", "retrieval", "formatting"]
+
+
+def _last_message(messages) -> str:
+    return messages[-1].content if messages else ""
+
+
+def _answer_from_context(messages) -> str:
+    """Fake answer LLM: a numbered list of whatever the prompt's context holds."""
+    context = _last_message(messages).split("Context:\n", 1)[-1]
+    lines = [line for line in context.splitlines() if line.strip()]
+    return "\n".join(f"{i}. {line}" for i, line in enumerate(lines, 1)) or "No results."
+
+
+class Pipelines:
+    """The local stand-ins, built once per benchmark run."""
+
+    def __init__(self, index_dir: str, llm_latency: float):
+        self.embeddings = HashingEmbeddings()
+        self.router = IntentRouter(self.embeddings.embed_query, self.embeddings.embed_documents, log_path=None)
+        self.prompt_builder = CypherPromptBuilder(
+            embed_fn=self.embeddings.embed_query,
+            embed_documents_fn=self.embeddings.embed_documents,
+            skill_mentions=get_skill_matcher().mentions,
+        )
+
+        # Canned Cypher per question (the prompt ends with "User Query: <question>")
+        canned = {case["question"]: case["cypher"] for case in CAREER_GRAPH_TEST_SET}
+
+        def cypher_reply(messages):
+            question = _last_message(messages).rsplit("User Query:", 1)[-1].strip()
+            return canned.get(question, "")
+
+        self.cypher_llm = GatewayChatModel(
+            inner=FakeChatModel(respond=cypher_reply, latency=llm_latency), role="cypher", timeout=30)
+        self.answer_llm = GatewayChatModel(
+            inner=FakeChatModel(respond=_answer_from_context, latency=llm_latency), role="graph_answer", timeout=30)
+
+        with open(COURSES_FIXTURE, encoding="utf-8") as f:
+            self.courses = [Document(**course) for course in json.load(f)]
+        vectors = self.embeddings.embed_documents([_course_text(doc) for doc in self.courses])
+        publish_index(self.courses, vectors, index_dir=index_dir, version="fixtures")
+        self.index = LocalCourseIndex(index_dir=index_dir)
+
+    def graph(self, question: str, timings: dict) -> list:
+        started = time.perf_counter()
+        prompt, _ = self.prompt_builder.build(question, GRAPH_SCHEMA)
+        cypher = extract_cypher(self.cypher_llm.invoke(prompt).content)
+        timings["cypher_generation"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rows = run_local_cypher(cypher)
+        timings["graph_query"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        context = "\n".join(json.dumps(row) for row in rows)
+        self.answer_llm.invoke(f"Question: {question}\nContext:\n{context}")
+        timings["formatting"] = time.perf_counter() - started
+        return rows
+
+    def courses_for(self, question: str, k: int, timings: dict) -> list:
+        started = time.perf_counter()
+        docs = [doc for doc, _ in self.index.search(self.embeddings.embed_query(question), k)]
+        timings["retrieval"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        context = "\n".join(f"{doc.metadata['title']} ({doc.metadata['course_url']})" for doc in docs)
+        self.answer_llm.invoke(f"Question: {question}\nContext:\n{context}")
+        timings["formatting"] = time.perf_counter() - started
+        return docs
+
+
+def _course_text(doc: Document) -> str:
+    return f"{doc.metadata.get('title', '')}. {doc.page_content}"
+
+
+def _matches(expected: str, value) -> bool:
+    """Numbers compare numerically ("8" == 8.0), text case-insensitively by substring."""
+    try:
+        return float(expected) == float(value)
+    except (TypeError, ValueError):
+        return expected.lower() in str(value).lower()
+
+
+def ranking_metrics(relevance: list, relevant_total: int, ks: list, found_at=None) -> dict:
+    """
+    recall@k + reciprocal rank for one ranked list.
+    relevance: per position, True if the item is relevant; found_at(k) → relevant items
+    found in the top k (defaults to counting relevant positions).
+    """
+    found_at = found_at or (lambda k: sum(relevance[:k]))
+    metrics = {f"recall@{k}": found_at(k) / relevant_total for k in ks}
+    metrics["reciprocal_rank"] = next((1 / rank for rank, hit in enumerate(relevance, 1) if hit), 0.0)
+    return metrics
+
+
+def graph_metrics(rows: list, expected: list, ks: list) -> dict:
+    def found_at(k):
+        return sum(any(_matches(e, v) for row in rows[:k] for v in row.values()) for e in expected)
+
+    relevance = [any(_matches(e, v) for e in expected for v in row.values()) for row in rows]
+    return ranking_metrics(relevance, len(expected), ks, found_at)
+
+
+def course_metrics(docs: list, catalogue: list, keywords: list, ks: list) -> dict:
+    def relevant(doc):
+        text = _course_text(doc).lower()
+        return any(keyword in text for keyword in keywords)
+
+    relevant_total = sum(relevant(doc) for doc in catalogue)
+    return ranking_metrics([relevant(doc) for doc in docs], relevant_total, ks)
+
+
+def latency_table(samples: dict) -> dict:
+    table = {}
+    for stage, values in samples.items():
+        if values:
+            table[stage] = {
+                "n": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "mean_ms": round(statistics.mean(values) * 1000, 3),
+                "max_ms": round(max(values) * 1000, 3),
+            }
+    return table
+
+
+def _mean(records: list, key: str) -> float:
+    return round(statistics.mean(r[key] for r in records), 4) if records else None
+
+
+def run(pipelines: Pipelines, repeat: int, ks: list) -> dict:
+    samples = {stage: [] for stage in STAGES + ["graph_pipeline", "course_pipeline"]}
+    questions = []
+    labelled = ([(case, CAREER_GRAPH) for case in CAREER_GRAPH_TEST_SET]
+                + [(case, COURSES) for case in COURSE_RECOMMENDATION_TEST_SET])
+
+    for case, expected_tool in labelled:
+        question = case["question"]
+        for _ in range(repeat):
+            timings = {}
+            started = time.perf_counter()
+            decision = pipelines.router.classify(question)
+            timings["routing"] = time.perf_counter() - started
+            if expected_tool == CAREER_GRAPH:
+                results = pipelines.graph(question, timings)
+            else:
+                results = pipelines.courses_for(question, max(ks), timings)
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+            pipeline = "graph_pipeline" if expected_tool == CAREER_GRAPH else "course_pipeline"
+            samples[pipeline].append(sum(timings.values()))
+
+        # Retrieval quality is deterministic, so it is scored on the last repetition
+        record = {"suite": "career_graph" if expected_tool == CAREER_GRAPH else "courses", "question": question,
+                  "expected_tool": expected_tool, "predicted_tool": decision["predicted_tool"],
+                  "routed_tool": decision["tool"], "results": len(results)}
+        if expected_tool == CAREER_GRAPH and case.get("expected"):
+            record.update(graph_metrics(results, case["expected"], ks))
+        elif expected_tool == COURSES and case.get("relevant_keywords"):
+            record.update(course_metrics(results, pipelines.courses, case["relevant_keywords"], ks))
+        questions.append(record)
+
+    retrieval = {}
+    for suite in ("career_graph", "courses"):
+        scored = [q for q in questions if q["suite"] == suite and "reciprocal_rank" in q]
+        retrieval[suite] = {"questions": len(scored), "mrr": _mean(scored, "reciprocal_rank"),
+                            **{f"recall@{k}": _mean(scored, f"recall@{k}") for k in ks}}
+
+    correct = sum(q["predicted_tool"] == q["expected_tool"] for q in questions)
+    dispatched = sum(q["routed_tool"] == q["expected_tool"] for q in questions)
+    return {
+        "stages": latency_table(samples),
+        "routing": {"questions": len(questions), "accuracy": round(correct / len(questions), 4),
+                    "dispatched_correctly": round(dispatched / len(questions), 4)},
+        "retrieval": retrieval,
+        "questions": questions,
+    }
+
+
+def print_report(report: dict, ks: list):
+    print(f"\n{'STAGE LATENCY (ms)':<20} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'mean':>9} {'max':>9}")
+    print("-" * 76)
+    for stage, row in report["stages"].items():
+        print(f"{stage:<20} {row['n']:>6} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+              f"{row['p99_ms']:>9.3f} {row['mean_ms']:>9.3f} {row['max_ms']:>9.3f}")
+
+    recall_headers = "".join(f"{f'recall@{k}':>11}" for k in ks)
+    print(f"\n{'RETRIEVAL':<20} {'questions':>9}{recall_headers} {'MRR':>7}")
+    print("-" * (38 + 11 * len(ks)))
+    for suite, row in report["retrieval"].items():
+        recalls = "".join(f"{row[f'recall@{k}'] if row[f'recall@{k}'] is not None else float('nan'):>11.3f}"
+                          for k in ks)
+        mrr = row["mrr"] if row["mrr"] is not None else float("nan")
+        print(f"{suite:<20} {row['questions']:>9}{recalls} {mrr:>7.3f}")
+
+    routing = report["routing"]
+    print(f"\n🧭 Routing: {routing['accuracy']:.1%} predicted correctly, "
+          f"{routing['dispatched_correctly']:.1%} dispatched without the agent ({routing['questions']} questions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Measured runs per question")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured runs per question first")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5], help="Cut-offs for recall@k")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--output", help="JSON results path (default results/pipeline_<timestamp>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's own log lines")
+    args = parser.parse_args()
+    ks = sorted(set(args.k))
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        # Stage logs (prompt sizes, index loads) would drown the tables
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            pipelines = Pipelines(index_dir, args.llm_latency)
+            if args.warmup:
+                run(pipelines, args.warmup, ks)
+            report = run(pipelines, args.repeat, ks)
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {"repeat": args.repeat, "warmup": args.warmup, "k": ks, "llm_latency_s": args.llm_latency,
+                     "courses": COURSES_FIXTURE},
+        **report,
+    }
+    print_report(report, ks)
+
+    output = args.output or os.path.join("results", f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,9 @@ This module initializes all LLM pipelines used by the chatbot.
 import os
 from dotenv import load_dotenv
 from langchain.chains import GraphCypherQAChain, RetrievalQA
+from langchain_community.chains.graph_qa.cypher import extract_cypher
 from langchain_community.graphs import Neo4jGraph
 from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_openai import ChatOpenAI
 from langchain_postgres.vectorstores import PGVector
 from langchain_core.prompts import PromptTemplate
 from langchain.prompts import (
@@ -17,6 +17,25 @@ from langchain.prompts import (
     ChatPromptTemplate,
 )
 
+# Pooled Neo4j driver used for executing generated Cypher
+from .neo4j_client import read_query
+
+# Per-query Cypher prompt (nearest examples within a token budget)
+from .cypher_prompt import CYPHER_PROMPT_MODE, get_cypher_prompt_builder
+
+# Trims retrieved course documents before they reach the course prompt
+from .course_compression import compressed_course_retriever
+
+# Memory-mapped local copy of the course collection (PGVector stays the fallback)
+from .local_index import LocalCourseRetriever, get_course_index
+
+# Shared LLM client layer (pooled connections, deadlines, hedging, circuit breaker)
+from .llm_gateway import get_chat_model
+
+# Local stand-ins for Neo4j / PGVector / OpenAI (CHATBOT_OFFLINE=1)
+from .offline import CHATBOT_OFFLINE, ensure_course_index, get_offline_embeddings
+from .local_cypher import LocalGraphStore
+
 # Load environment variables
 load_dotenv()
 
@@ -25,21 +44,26 @@ CAREER_QA_MODEL = os.getenv("CAREER_AGENT_MODEL")
 CAREER_CYPHER_MODEL = os.getenv("CAREER_AGENT_MODEL")
 SUPABASE_CONNECTION_STRING = os.getenv("SUPABASE_POOLER_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+COURSE_RETRIEVER = "local" if CHATBOT_OFFLINE else os.getenv("COURSE_RETRIEVER", "pgvector").lower()  # "pgvector" or "local"
 
 
 # ============================================
 # CAREER GRAPH CHAIN (Neo4j)
 # ============================================
 
-# Create a Neo4j driver instance for querying the Career Graph
-graph = Neo4jGraph(
-    url=os.getenv("NEO4J_URI"),
-    username=os.getenv("NEO4J_USERNAME"),
-    password=os.getenv("NEO4J_PASSWORD"),
-)
+if CHATBOT_OFFLINE:
+    # In-memory career graph from the repo's CSV (no Neo4j connection)
+    graph = LocalGraphStore()
+else:
+    # Create a Neo4j driver instance for querying the Career Graph
+    graph = Neo4jGraph(
+        url=os.getenv("NEO4J_URI"),
+        username=os.getenv("NEO4J_USERNAME"),
+        password=os.getenv("NEO4J_PASSWORD"),
+    )
 
-# Load the schema from Neo4j so the LLM can use node labels + property names
-graph.refresh_schema()
+    # Load the schema from Neo4j so the LLM can use node labels + property names
+    graph.refresh_schema()
 
 
 # Prompt used for Cypher query generation from natural language
@@ -297,9 +321,13 @@ NOW FORMAT THE RESULTS ABOVE - INCLUDE EVERY SINGLE ITEM:
 
 
 # Build the LangChain GraphCypherQAChain (LLM → Cypher → Neo4j → LLM formatting)
+# LLM that writes Cypher (shared by the chain and the dynamic prompt path in generate_cypher)
+cypher_llm = get_chat_model("cypher", CAREER_CYPHER_MODEL)
+
 career_cypher_chain = GraphCypherQAChain.from_llm(
-    cypher_llm=ChatOpenAI(model=CAREER_CYPHER_MODEL, temperature=0),
-    qa_llm=ChatOpenAI(model=CAREER_QA_MODEL, temperature=0),
+    cypher_llm=cypher_llm,
+    # Tagged so the streaming endpoint can forward only answer tokens (not Cypher tokens)
+    qa_llm=get_chat_model("graph_answer", CAREER_QA_MODEL, tags=["graph_answer"]),
     graph=graph,
     verbose=True,  # Print steps to console for debugging
     qa_prompt=qa_generation_prompt, # Format answers using custom rules
@@ -307,14 +335,82 @@ career_cypher_chain = GraphCypherQAChain.from_llm(
     validate_cypher=True,  # Ensures queries follow proper syntax
     allow_dangerous_requests=True, # Allows LLM to generate complex queries
     top_k=50, # Limit returned results
+    exclude_types=["GraphMeta"], # Hide the data-version stamp node from the LLM
 )
 
 print("✅ Career Skill Graph QA Chain initialized successfully.")
 
 
+def _chain_text(result) -> str:
+    """Return the text output of a sub-chain (LLMChain returns a dict, LCEL a str)."""
+    if isinstance(result, dict):
+        return result.get("text", "")
+    return str(result)
+
+
+_full_prompt_token_count = None
+
+
+def _full_prompt_tokens() -> int:
+    """Token count of the static prompt (without the query), for comparison in the logs."""
+    global _full_prompt_token_count
+    if _full_prompt_token_count is None:
+        full_prompt = cypher_generation_prompt.format(schema=career_cypher_chain.graph_schema, query="")
+        _full_prompt_token_count = get_cypher_prompt_builder().count_tokens(full_prompt)
+    return _full_prompt_token_count
+
+
+def generate_cypher(query: str) -> str:
+    """
+    Stage 1 of the career graph pipeline: natural language → validated Cypher.
+    Uses the dynamic few-shot prompt (CYPHER_PROMPT_MODE=dynamic, default) or the
+    static prompt of career_cypher_chain ("full"), then the chain's query corrector.
+    """
+    if CYPHER_PROMPT_MODE == "dynamic":
+        # Compact prompt: nearest examples + mentioned technologies within the token budget
+        prompt, _ = get_cypher_prompt_builder().build(
+            query, career_cypher_chain.graph_schema, full_prompt_tokens=_full_prompt_tokens()
+        )
+        generated = cypher_llm.invoke(prompt).content
+    else:
+        generated = _chain_text(career_cypher_chain.cypher_generation_chain.invoke({
+            "query": query,
+            "question": query,
+            "schema": career_cypher_chain.graph_schema,
+        }))
+    cypher = extract_cypher(generated)
+
+    # Fix relationship directions against the schema (validate_cypher=True)
+    if career_cypher_chain.cypher_query_corrector:
+        cypher = career_cypher_chain.cypher_query_corrector(cypher)
+    return cypher
+
+
+def run_cypher(cypher: str, params: dict = None) -> list:
+    """
+    Stage 2: execute Cypher against Neo4j, truncated to the chain's top_k.
+    Runs in a read transaction on the pooled driver, so generated Cypher can
+    never write to the graph and is bounded by NEO4J_QUERY_TIMEOUT.
+    """
+    if not cypher:
+        return []
+    return read_query(cypher, params, name="career_graph")[: career_cypher_chain.top_k]
+
+
+def answer_from_rows(question: str, rows: list) -> str:
+    """Stage 3: format the Neo4j rows into a natural language answer with the QA LLM."""
+    result = career_cypher_chain.qa_chain.invoke({"question": question, "context": rows})
+    if isinstance(result, dict):
+        return result.get(getattr(career_cypher_chain.qa_chain, "output_key", "text"), "")
+    return str(result)
+
+
 # ============================================
 # COURSE RECOMMENDATION CHAIN (Supabase)
 # ============================================
+# Shared sentence embeddings (also used by the semantic answer cache); None when disabled
+embeddings = None
+
 # Optionally disable the course recommender for local/dev environments 
 if os.getenv("DISABLE_COURSE_RECOMMENDER", "0").lower() in ("1", "true", "yes"):
     print("Course recommender disabled by DISABLE_COURSE_RECOMMENDER environment variable.")
@@ -323,16 +419,22 @@ if os.getenv("DISABLE_COURSE_RECOMMENDER", "0").lower() in ("1", "true", "yes"):
 else:
     # Try initializing PGVector + embeddings
     try:
-        # SentenceTransformer embeddings for vector search
-        embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-
-        # Vector store that connects to Supabase Postgres with pgvector
-        print("Connecting to PGVector store...")
-        supabase_vector_store = PGVector(
-            connection=SUPABASE_CONNECTION_STRING,
-            embeddings=embeddings,
-            collection_name="course_embeddings", # Table name in Supabase
-        )
+        if CHATBOT_OFFLINE:
+            # Hashing embeddings + the seeded local course index only (no model download, no Postgres)
+            embeddings = get_offline_embeddings()
+            supabase_vector_store = None
+            ensure_course_index()
+        else:
+            # SentenceTransformer embeddings for vector search
+            embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+
+            # Vector store that connects to Supabase Postgres with pgvector
+            print("Connecting to PGVector store...")
+            supabase_vector_store = PGVector(
+                connection=SUPABASE_CONNECTION_STRING,
+                embeddings=embeddings,
+                collection_name="course_embeddings", # Table name in Supabase
+            )
 
         # Prompt template used for course recommendation formatting
         course_template = """You are a helpful course recommender system for an online learning platform.
@@ -369,13 +471,20 @@ else:
         # Combine system + user prompt
         review_prompt = ChatPromptTemplate.from_messages([system_prompt, human_prompt])
 
+        # Course search: PGVector directly, or the local index with PGVector as fallback
+        course_retriever = supabase_vector_store.as_retriever(search_kwargs={"k": 5}) if supabase_vector_store else None
+        if COURSE_RETRIEVER == "local":
+            course_retriever = LocalCourseRetriever(
+                index=get_course_index(), embeddings=embeddings, k=5, fallback=course_retriever,
+            )
+            print(f"📦 Course retriever: local index ({get_course_index().status()['published_version']})")
+
         # Build RetrievalQA chain (LLM + vector search)
         qa_chain = RetrievalQA.from_chain_type(
-            llm=ChatOpenAI(model=CAREER_QA_MODEL, temperature=0),
+            llm=get_chat_model("course", CAREER_QA_MODEL),
             chain_type="stuff",
-            retriever=supabase_vector_store.as_retriever(
-                search_kwargs={"k": 5}  # Retrieve top 5 most relevant courses
-            ),
+            # Top 5 courses, trimmed to title/URL/provider/level + a relevant snippet
+            retriever=compressed_course_retriever(course_retriever, embeddings=embeddings),
             return_source_documents=True,  # Include course URLs in output
         )
         # Override chain prompt with our custom template
@@ -0,0 +1,203 @@
+"""
+Per-request context for the chatbot agent
+Request-scoped values (the calling user's ID and chat session, the request
+deadline and the per-stage timings) live
+in contextvars instead of module globals, so concurrent requests served by one
+worker never see each other's state:
+- asyncio: every task gets its own copy of the context
+- thread pools: LangChain's run_in_executor and asyncio.to_thread copy the
+  caller's context into the worker thread
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# ID of the logged-in user for the current request (None for anonymous users)
+_current_user_id = contextvars.ContextVar("chatbot_user_id", default=None)
+
+
+def set_user_id(user_id):
+    """Store the current user ID for this request; returns a token for reset_user_id()."""
+    return _current_user_id.set(user_id)
+
+
+def get_user_id():
+    """Return the user ID of the current request (None if not logged in)."""
+    return _current_user_id.get()
+
+
+def reset_user_id(token):
+    """Restore the user ID that was active before the matching set_user_id() call."""
+    _current_user_id.reset(token)
+
+
+@contextmanager
+def user_context(user_id):
+    """Run a block with user_id as the current user, restoring the previous value after."""
+    token = set_user_id(user_id)
+    try:
+        yield
+    finally:
+        reset_user_id(token)
+
+
+# Chat session of the current request (keys the session working memory, see session_memory.py)
+_current_session_id = contextvars.ContextVar("chatbot_session_id", default="default")
+
+
+def set_session_id(session_id):
+    return _current_session_id.set(session_id or "default")
+
+
+def get_session_id():
+    return _current_session_id.get()
+
+
+@contextmanager
+def session_context(session_id):
+    """Run a block as part of chat session `session_id`."""
+    token = set_session_id(session_id)
+    try:
+        yield
+    finally:
+        _current_session_id.reset(token)
+
+
+# ============================================
+# Request deadline
+# ============================================
+# Absolute time.monotonic() by which the current request should be answered (None = no budget).
+# Stages read remaining_time() to clamp their own timeouts, and has_budget() to
+# decide whether to take the full path or a cheaper fallback.
+_deadline = contextvars.ContextVar("chatbot_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Not enough of the request budget is left to start a stage."""
+
+
+def set_deadline(seconds):
+    """Give the current request `seconds` to finish (never extends an outer deadline); returns a token."""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    return _deadline.set(deadline if current is None else min(current, deadline))
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def remaining_time():
+    """Seconds left in the request budget (None when no deadline is set; may be negative)."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def has_budget(seconds) -> bool:
+    """True when no deadline is set or at least `seconds` remain."""
+    remaining = remaining_time()
+    return remaining is None or remaining >= seconds
+
+
+def clamp_timeout(timeout, minimum=0.0):
+    """
+    The stage timeout capped at the remaining budget.
+    Raises DeadlineExceeded when less than `minimum` seconds remain.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining < max(minimum, 0.001):
+        raise DeadlineExceeded(f"request deadline: {remaining:.2f}s left, stage needs {minimum:g}s")
+    return min(timeout, remaining)
+
+
+@contextmanager
+def deadline_context(seconds):
+    """Run a block with a request deadline, restoring the previous one after."""
+    token = set_deadline(seconds)
+    try:
+        yield
+    finally:
+        reset_deadline(token)
+
+
+# ============================================
+# Stage timings
+# ============================================
+# Milliseconds spent per stage of the current request ("route", "neo4j", "llm.cypher",
+# "tool.CareerGraph", ...), summed when a stage runs more than once. The collector is
+# shared by reference, so stages running in executor threads (which get a copy of the
+# context) add to the same totals.
+_stage_timings = contextvars.ContextVar("chatbot_stage_timings", default=None)
+
+
+class StageTimings:
+    """Thread-safe stage → total milliseconds."""
+
+    def __init__(self):
+        self._ms = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._ms[stage] = self._ms.get(stage, 0) + seconds * 1000
+
+    def merge(self, timings: dict):
+        """Add millisecond totals measured elsewhere (e.g. by an agent worker process)."""
+        with self._lock:
+            for stage, ms in (timings or {}).items():
+                self._ms[stage] = self._ms.get(stage, 0) + ms
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {stage: round(ms, 1) for stage, ms in self._ms.items()}
+
+
+def record_stage(stage: str, seconds: float):
+    """Add a measured duration to the current request's timings (no-op outside stage_timings())."""
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Time a block as `stage` of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def timed(stage: str, func):
+    """Wrap a sync or async function so each call is timed as `stage`."""
+    if func is None:
+        return None
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def run_async(*args, **kwargs):
+            with timed_stage(stage):
+                return await func(*args, **kwargs)
+        return run_async
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with timed_stage(stage):
+            return func(*args, **kwargs)
+    return run
+
+
+@contextmanager
+def stage_timings():
+    """Collect stage timings for a block; yields the StageTimings."""
+    timings = StageTimings()
+    token = _stage_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_timings.reset(token)
@@ -0,0 +1,128 @@
+"""
+Context compression for course retrieval
+The course prompt only needs each course's title and URL (plus a hint of what
+it covers), but the "stuff" chain sends the full text of every retrieved
+document. CourseDocumentCompressor sits between the PGVector retriever and the
+prompt and rewrites each document as:
+    title / course_url / provider / level + the most query-relevant sentence(s)
+Sentences are ranked by embedding similarity to the query (all documents in
+one embedding batch), or by word overlap when no embeddings are configured.
+Retrievals already under COURSE_COMPRESSION_MIN_CHARS pass through untouched,
+and documents with no more sentences than the snippet keeps are not embedded.
+"""
+import os
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain.retrievers import ContextualCompressionRetriever
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.embeddings import Embeddings
+from pydantic import ConfigDict
+
+# Compression defaults (tunable from the environment, overridable per chain)
+COURSE_CONTEXT_COMPRESSION = os.getenv("COURSE_CONTEXT_COMPRESSION", "1").lower() in ("1", "true", "yes")
+COURSE_SNIPPET_SENTENCES = int(os.getenv("COURSE_SNIPPET_SENTENCES", "1"))
+COURSE_SNIPPET_MAX_CHARS = int(os.getenv("COURSE_SNIPPET_MAX_CHARS", "240"))
+COURSE_COMPRESSION_MIN_CHARS = int(os.getenv("COURSE_COMPRESSION_MIN_CHARS", "1500"))  # Smaller contexts are sent as is
+
+# Metadata kept in the compressed text, in this order
+COURSE_FIELDS = ("title", "course_url", "provider", "level")
+
+_sentence_split = re.compile(r"(?<=[.!?])\s+|\n+")
+_word = re.compile(r"[a-z0-9+#]+")
+
+
+def split_sentences(text: str, limit: int = 12) -> List[str]:
+    """Sentences of a document (first `limit`, to bound embedding cost on long descriptions)."""
+    sentences = [s.strip() for s in _sentence_split.split(text or "") if len(s.strip()) > 20]
+    return sentences[:limit]
+
+
+def _overlap_score(query_words: set, sentence: str) -> float:
+    words = set(_word.findall(sentence.lower()))
+    return len(query_words & words) / (len(words) ** 0.5) if words else 0.0
+
+
+class CourseDocumentCompressor(BaseDocumentCompressor):
+    """Trim course documents to their key metadata plus the most relevant snippet."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    embeddings: Optional[Embeddings] = None
+    fields: Sequence[str] = COURSE_FIELDS
+    snippet_sentences: int = COURSE_SNIPPET_SENTENCES
+    max_snippet_chars: int = COURSE_SNIPPET_MAX_CHARS
+    min_chars: int = COURSE_COMPRESSION_MIN_CHARS
+
+    def _rank_sentences(self, query: str, per_doc: List[List[str]]) -> List[List[str]]:
+        """Top sentences per document, most relevant first."""
+        if self.snippet_sentences <= 0:
+            return [[] for _ in per_doc]
+        # Only documents with more sentences than the snippet keeps need ranking
+        to_rank = [sentences if len(sentences) > self.snippet_sentences else [] for sentences in per_doc]
+        flat = [sentence for sentences in to_rank for sentence in sentences]
+        if not flat:
+            return per_doc
+
+        scores = None
+        if self.embeddings is not None:
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents([query] + flat), dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9
+                scores = vectors[1:] @ vectors[0]
+            except Exception as e:
+                print(f"⚠️ Snippet embedding failed, using word overlap: {e}")
+        if scores is None:
+            query_words = set(_word.findall(query.lower()))
+            scores = [_overlap_score(query_words, sentence) for sentence in flat]
+
+        ranked, offset = [], 0
+        for sentences, candidates in zip(per_doc, to_rank):
+            if not candidates:
+                ranked.append(sentences)
+                continue
+            doc_scores = scores[offset:offset + len(sentences)]
+            order = sorted(range(len(sentences)), key=lambda i: -doc_scores[i])
+            ranked.append([sentences[i] for i in order[:self.snippet_sentences]])
+            offset += len(sentences)
+        return ranked
+
+    def compress_documents(self, documents: Sequence[Document], query: str,
+                           callbacks=None) -> Sequence[Document]:
+        if not documents:
+            return []
+        if sum(len(doc.page_content) for doc in documents) < self.min_chars:
+            return documents
+        snippets = self._rank_sentences(query, [split_sentences(doc.page_content) for doc in documents])
+
+        compressed = []
+        for doc, sentences in zip(documents, snippets):
+            lines = [f"{field}: {doc.metadata[field]}" for field in self.fields if doc.metadata.get(field)]
+            snippet = " ".join(sentences)
+            if len(snippet) > self.max_snippet_chars:
+                snippet = snippet[:self.max_snippet_chars].rsplit(" ", 1)[0] + "…"
+            if snippet:
+                lines.append(f"snippet: {snippet}")
+            # Metadata is kept intact so callers can still read title/course_url
+            compressed.append(Document(page_content="\n".join(lines), metadata=doc.metadata))
+
+        before = sum(len(doc.page_content) for doc in documents)
+        after = sum(len(doc.page_content) for doc in compressed)
+        print(f"🗜️ Course context compressed: {before} → {after} characters ({len(documents)} docs)")
+        return compressed
+
+
+def compressed_course_retriever(base_retriever, embeddings: Embeddings = None,
+                                enabled: bool = COURSE_CONTEXT_COMPRESSION, **options):
+    """
+    Wrap a course retriever with CourseDocumentCompressor (or return it unchanged
+    when compression is disabled). Options override the compressor defaults
+    per chain, e.g. snippet_sentences=2 or fields=("title", "course_url").
+    """
+    if not enabled:
+        return base_retriever
+    return ContextualCompressionRetriever(
+        base_compressor=CourseDocumentCompressor(embeddings=embeddings, **options),
+        base_retriever=base_retriever,
+    )
@@ -0,0 +1,143 @@
+"""
+Cypher query cache for the CareerGraph tool
+Caches the validated Cypher generated for a question (skipping the Cypher LLM)
+and, optionally, the Neo4j rows returned for a query (skipping Neo4j).
+All entries are keyed on the graph data version so a graph reload invalidates them.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from .data_version import on_graph_version_change
+
+# Cache sizes + optional result-row caching, configurable from the environment
+CYPHER_CACHE_SIZE = int(os.getenv("CYPHER_CACHE_SIZE", "512"))
+CYPHER_RESULT_CACHE_SIZE = int(os.getenv("CYPHER_RESULT_CACHE_SIZE", "256"))
+CYPHER_RESULT_CACHE_ENABLED = os.getenv("CYPHER_RESULT_CACHE", "1").lower() in ("1", "true", "yes")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for cache lookups.
+    Lowercases, collapses whitespace and drops trailing punctuation so that
+    "Skills for a Data scientist?" and "skills for a data scientist" share an entry.
+    """
+    text = question.lower().strip()
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip(" ?!.")
+
+
+class CypherCache:
+    """
+    Two small LRU maps guarded by a lock:
+    - question key → validated Cypher
+    - (Cypher, params, data version) → Neo4j result rows
+    """
+
+    def __init__(self, max_entries=CYPHER_CACHE_SIZE, max_result_entries=CYPHER_RESULT_CACHE_SIZE,
+                 cache_results=CYPHER_RESULT_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.max_result_entries = max_result_entries
+        self.cache_results = cache_results
+        self._queries = OrderedDict()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "cypher_hits": 0,
+            "cypher_misses": 0,
+            "result_hits": 0,
+            "result_misses": 0,
+            "invalidations": 0,
+        }
+
+    # --- Keys ---
+
+    @staticmethod
+    def question_key(normalized_query: str, job_titles, data_version: str) -> tuple:
+        """Key on the normalized question + synonym-resolved job titles + data version."""
+        return (normalize_question(normalized_query), tuple(sorted(set(job_titles))), data_version)
+
+    @staticmethod
+    def result_key(cypher: str, params, data_version: str) -> tuple:
+        """Key on the query text + parameters + data version."""
+        frozen_params = tuple(sorted((params or {}).items()))
+        return (cypher.strip(), frozen_params, data_version)
+
+    # --- LRU helpers ---
+
+    @staticmethod
+    def _get(store, key):
+        if key not in store:
+            return None
+        store.move_to_end(key)
+        return store[key]
+
+    @staticmethod
+    def _put(store, key, value, max_entries):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > max_entries:
+            store.popitem(last=False)  # Evict least recently used
+
+    # --- Cypher generation cache ---
+
+    def get_cypher(self, key):
+        with self._lock:
+            cypher = self._get(self._queries, key)
+            self._stats["cypher_hits" if cypher is not None else "cypher_misses"] += 1
+            return cypher
+
+    def put_cypher(self, key, cypher: str):
+        """Store Cypher only after it has been validated and executed successfully."""
+        if not cypher:
+            return
+        with self._lock:
+            self._put(self._queries, key, cypher, self.max_entries)
+
+    # --- Neo4j result cache ---
+
+    def get_rows(self, cypher: str, params, data_version: str):
+        if not self.cache_results:
+            return None
+        key = self.result_key(cypher, params, data_version)
+        with self._lock:
+            rows = self._get(self._results, key)
+            self._stats["result_hits" if rows is not None else "result_misses"] += 1
+            # Hand out a copy so callers cannot mutate the cached rows
+            return list(rows) if rows is not None else None
+
+    def put_rows(self, cypher: str, params, data_version: str, rows):
+        if not self.cache_results:
+            return
+        key = self.result_key(cypher, params, data_version)
+        with self._lock:
+            self._put(self._results, key, list(rows), self.max_result_entries)
+
+    # --- Admin helpers ---
+
+    def invalidate(self):
+        """Drop every cached entry (called when the career graph is reloaded)."""
+        with self._lock:
+            self._queries.clear()
+            self._results.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and hit rates for the admin stats endpoint."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cypher_entries"] = len(self._queries)
+            stats["result_entries"] = len(self._results)
+        for prefix in ("cypher", "result"):
+            lookups = stats[f"{prefix}_hits"] + stats[f"{prefix}_misses"]
+            stats[f"{prefix}_hit_rate"] = round(stats[f"{prefix}_hits"] / lookups, 3) if lookups else 0.0
+        stats["result_cache_enabled"] = self.cache_results
+        return stats
+
+
+# Shared cache instance used by the CareerGraph tool
+cypher_cache = CypherCache()
+
+# Clear everything as soon as a graph reload is detected
+on_graph_version_change(cypher_cache.invalidate)
@@ -0,0 +1,268 @@
+"""
+Dynamic Cypher generation prompt
+Instead of inlining every example, keyword rule and technology list on every
+call (cypher_generation_prompt in chains.py), build a compact prompt per query:
+- fixed rules + graph schema
+- the few most relevant examples, picked from an embedding index
+- only the technology names mentioned in the query (exact graph spelling)
+- capped at CYPHER_PROMPT_TOKEN_BUDGET tokens
+Every build logs its token count next to the full static prompt's size.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from rapidfuzz import fuzz
+
+logger = logging.getLogger(__name__)
+
+# Prompt builder configuration (tunable from the environment)
+CYPHER_PROMPT_MODE = os.getenv("CYPHER_PROMPT_MODE", "dynamic").lower()  # "dynamic" or "full"
+CYPHER_PROMPT_TOKEN_BUDGET = int(os.getenv("CYPHER_PROMPT_TOKEN_BUDGET", "1200"))
+CYPHER_PROMPT_EXAMPLES = int(os.getenv("CYPHER_PROMPT_EXAMPLES", "4"))  # Max examples per prompt
+
+PROMPT_HEADER = """Task: Generate a Cypher query for a Neo4j Career Graph database.
+
+Schema:
+{schema}
+
+Node: :Job
+Properties: name, median_comp, median_workexp, top_language, top_database, top_platform, top_webframe
+Relationship: :RELATED_TO (has weight property - lower weight = more similar)
+
+CRITICAL DATA FORMAT:
+- Job names are EXACT strings (e.g., 'Data scientist', 'Developer, back-end', 'AI/ML engineer')
+- Technology fields (top_language, top_database, top_platform, top_webframe) contain COMMA-SEPARATED values
+- ALWAYS use CONTAINS for technology searches, NEVER use = for exact match
+
+MATCHING RULES:
+- For job names: Use exact match with = (e.g., WHERE j.name = 'Data scientist')
+- For technologies: Use CONTAINS (e.g., WHERE j.top_language CONTAINS 'Python')
+- Technology names are case-sensitive: 'Python' not 'python'
+"""
+
+# When to use each query pattern (the KEYWORD MAPPING of the static prompt)
+PATTERN_GUIDE = {
+    1: "Properties (skills/technologies, salary, experience) of a SPECIFIC job → MATCH the job by name and return its properties",
+    2: "Jobs similar/related to a SPECIFIC job, career transitions → follow RELATED_TO ordered by weight ASC",
+    3: "WHICH jobs use a technology → WHERE <technology field> CONTAINS '<Technology>'",
+    4: "Higher/better-paying jobs than a SPECIFIC job → RELATED_TO with WHERE on median_comp",
+    5: "Entry-level/junior/senior or years of experience → WHERE on median_workexp",
+    6: "Several conditions at once → combine the filters with AND",
+    7: "Query contains <USER_PROFILE:job_title|skills> → related jobs WITH their skills",
+}
+
+# (pattern, question, cypher) — the examples of the static prompt
+CYPHER_EXAMPLES = [
+    (1, "What is the median salary for a Data scientist?",
+     "MATCH (j:Job {name: 'Data scientist'})\nRETURN j.median_comp AS median_salary"),
+    (1, "What is the work experience for Developer, back-end?",
+     "MATCH (j:Job {name: 'Developer, back-end'})\nRETURN j.median_workexp AS work_experience"),
+    (1, "What technologies does a Developer, full-stack use?",
+     "MATCH (j:Job {name: 'Developer, full-stack'})\nRETURN j.name AS job_title,\n"
+     "       j.top_language AS language,\n       j.top_database AS database,\n"
+     "       j.top_platform AS platform,\n       j.top_webframe AS framework"),
+    (1, "What skills does a Data scientist need?",
+     "MATCH (j:Job {name: 'Data scientist'})\nRETURN j.top_language AS language,\n"
+     "       j.top_database AS database,\n       j.top_platform AS platform,\n"
+     "       j.top_webframe AS framework"),
+    (2, "What jobs are similar to Data scientist?",
+     "MATCH (j:Job {name: 'Data scientist'})-[r:RELATED_TO]->(related:Job)\n"
+     "RETURN related.name AS job_name, r.weight AS similarity\nORDER BY r.weight ASC\nLIMIT 10"),
+    (2, "Career transitions from Developer, back-end",
+     "MATCH (j:Job {name: 'Developer, back-end'})-[r:RELATED_TO]->(related:Job)\n"
+     "RETURN related.name AS job_name, r.weight AS similarity\nORDER BY r.weight ASC\nLIMIT 10"),
+    (3, "Which jobs use Python as a top language?",
+     "MATCH (j:Job)\nWHERE j.top_language CONTAINS 'Python'\n"
+     "RETURN j.name AS job_name, j.median_comp AS salary\nORDER BY j.median_comp DESC"),
+    (3, "Jobs that use React",
+     "MATCH (j:Job)\nWHERE j.top_webframe CONTAINS 'React'\n"
+     "RETURN j.name AS job_name, j.median_comp AS salary\nORDER BY j.median_comp DESC"),
+    (3, "Which jobs use PostgreSQL?",
+     "MATCH (j:Job)\nWHERE j.top_database CONTAINS 'PostgreSQL'\n"
+     "RETURN j.name AS job_name, j.median_comp AS salary\nORDER BY j.median_comp DESC"),
+    (3, "Jobs using AWS",
+     "MATCH (j:Job)\nWHERE j.top_platform CONTAINS 'AWS'\n"
+     "RETURN j.name AS job_name, j.median_comp AS salary\nORDER BY j.median_comp DESC"),
+    (3, "Which jobs use both Python and PostgreSQL?",
+     "MATCH (j:Job)\nWHERE j.top_language CONTAINS 'Python'\n  AND j.top_database CONTAINS 'PostgreSQL'\n"
+     "RETURN j.name AS job_name, j.median_comp AS salary\nORDER BY j.median_comp DESC"),
+    (4, "What jobs pay more than Engineering manager?",
+     "MATCH (current:Job {name: 'Engineering manager'})-[r:RELATED_TO]->(next:Job)\n"
+     "WHERE next.median_comp > current.median_comp\nRETURN next.name AS job_name,\n"
+     "       next.median_comp - current.median_comp AS salary_increase,\n"
+     "       next.median_comp AS new_salary\nORDER BY salary_increase DESC\nLIMIT 10"),
+    (5, "What jobs require less than 3 years experience?",
+     "MATCH (j:Job)\nWHERE j.median_workexp <= 3\n"
+     "RETURN j.name AS job_name, j.median_workexp AS years_required, j.median_comp AS salary\n"
+     "ORDER BY j.median_comp DESC"),
+    (5, "Entry-level jobs (0-2 years)",
+     "MATCH (j:Job)\nWHERE j.median_workexp <= 2\n"
+     "RETURN j.name AS job_name, j.median_workexp AS years_required, j.median_comp AS salary\n"
+     "ORDER BY j.median_comp DESC"),
+    (6, "High-paying Python jobs with less than 5 years experience",
+     "MATCH (j:Job)\nWHERE j.top_language CONTAINS 'Python'\n  AND j.median_workexp <= 5\n"
+     "  AND j.median_comp > 80000\nRETURN j.name AS job_name,\n       j.median_comp AS salary,\n"
+     "       j.median_workexp AS experience_years\nORDER BY j.median_comp DESC"),
+    (7, "Generate career recommendation <USER_PROFILE:Data or business analyst|Databricks SQL,Python>",
+     "MATCH (current:Job {name: 'Data or business analyst'})-[r:RELATED_TO]->(related:Job)\n"
+     "RETURN related.name AS job_name,\n       related.top_language AS language,\n"
+     "       related.top_database AS database,\n       related.top_platform AS platform,\n"
+     "       related.top_webframe AS framework,\n       related.median_comp AS salary,\n"
+     "       related.median_workexp AS experience,\n       r.weight AS similarity\n"
+     "ORDER BY r.weight ASC\nLIMIT 3"),
+]
+
+
+class TokenCounter:
+    """tiktoken counts when the encoding is available, ~4 chars/token otherwise."""
+
+    def __init__(self, model: str = None):
+        self._encoding = None
+        try:
+            import tiktoken
+            try:
+                self._encoding = tiktoken.encoding_for_model(model or "")
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # Missing package or encoding download blocked
+            print(f"⚠️ tiktoken unavailable, estimating prompt tokens ({e})")
+
+    def __call__(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return max(1, len(text) // 4)
+
+
+def _format_example(question: str, cypher: str) -> str:
+    return f'Example: "{question}"\n{cypher}\n'
+
+
+class CypherPromptBuilder:
+    """Per-query prompt: fixed rules + nearest examples + mentioned technologies, within a token budget."""
+
+    def __init__(self, examples=CYPHER_EXAMPLES, embed_fn=None, embed_documents_fn=None,
+                 token_budget=CYPHER_PROMPT_TOKEN_BUDGET, max_examples=CYPHER_PROMPT_EXAMPLES,
+                 count_tokens=None, skill_mentions=None):
+        self.examples = list(examples)
+        self.embed_fn = embed_fn
+        self.token_budget = token_budget
+        self.max_examples = max_examples
+        self.count_tokens = count_tokens or TokenCounter()
+        self.skill_mentions = skill_mentions  # Callable[[str], List[str]] or None
+        self._lock = threading.Lock()
+        self._stats = {"prompts": 0, "tokens": 0, "max_tokens": 0, "full_tokens": 0, "last": None}
+
+        self._vectors = None
+        if embed_fn is not None:
+            questions = [question for _, question, _ in self.examples]
+            vectors = embed_documents_fn(questions) if embed_documents_fn else [embed_fn(q) for q in questions]
+            vectors = np.asarray(vectors, dtype=np.float32)
+            self._vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def rank_examples(self, query: str) -> list:
+        """Example indices, most relevant first (embeddings, or fuzzy overlap without them)."""
+        if self._vectors is not None:
+            try:
+                vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+                scores = self._vectors @ (vector / np.linalg.norm(vector))
+                return list(np.argsort(-scores))
+            except Exception as e:
+                print(f"⚠️ Example embedding failed, using fuzzy ranking: {e}")
+        scores = [fuzz.token_set_ratio(query, question) for _, question, _ in self.examples]
+        return sorted(range(len(self.examples)), key=lambda i: -scores[i])
+
+    def build(self, query: str, schema: str, full_prompt_tokens: int = None):
+        """Return (prompt text, info dict with token counts and the examples used)."""
+        started = time.perf_counter()
+        header = PROMPT_HEADER.format(schema=schema)
+        footer = f"\nUser Query: {query}\n"
+
+        technologies = self.skill_mentions(query) if self.skill_mentions else []
+        if technologies:
+            footer = ("\nTECHNOLOGY NAMES IN THIS QUERY (use this exact spelling with CONTAINS): "
+                      + ", ".join(technologies) + "\n" + footer)
+
+        used_tokens = self.count_tokens(header) + self.count_tokens(footer)
+        chosen = []
+        for index in self.rank_examples(query):
+            if len(chosen) >= self.max_examples:
+                break
+            pattern, question, cypher = self.examples[index]
+            cost = self.count_tokens(_format_example(question, cypher))
+            # Always keep at least one example, even if the fixed part alone is over budget
+            if chosen and used_tokens + cost > self.token_budget:
+                continue
+            chosen.append(index)
+            used_tokens += cost
+
+        patterns = sorted({self.examples[i][0] for i in chosen})
+        guide = "\nQUERY PATTERNS FOR THIS QUESTION:\n" + "\n".join(
+            f"- Pattern {p}: {PATTERN_GUIDE[p]}" for p in patterns
+        ) + "\n\n"
+        examples = "\n".join(_format_example(*self.examples[i][1:]) for i in chosen)
+        prompt = header + guide + examples + footer
+
+        info = {
+            "tokens": self.count_tokens(prompt),
+            "full_prompt_tokens": full_prompt_tokens,
+            "budget": self.token_budget,
+            "examples": [self.examples[i][1] for i in chosen],
+            "technologies": technologies,
+            "build_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        self._record(info)
+        return prompt, info
+
+    def _record(self, info: dict):
+        saved = ""
+        if info["full_prompt_tokens"]:
+            saved = f", full prompt {info['full_prompt_tokens']} (-{1 - info['tokens'] / info['full_prompt_tokens']:.0%})"
+        print(f"🧮 Cypher prompt: {info['tokens']} tokens, {len(info['examples'])} examples, "
+              f"budget {info['budget']}{saved}")
+        with self._lock:
+            self._stats["prompts"] += 1
+            self._stats["tokens"] += info["tokens"]
+            self._stats["max_tokens"] = max(self._stats["max_tokens"], info["tokens"])
+            self._stats["full_tokens"] = info["full_prompt_tokens"] or self._stats["full_tokens"]
+            self._stats["last"] = info
+
+    def stats(self) -> dict:
+        with self._lock:
+            prompts = self._stats["prompts"]
+            return {
+                "mode": CYPHER_PROMPT_MODE,
+                "budget": self.token_budget,
+                "prompts": prompts,
+                "avg_tokens": round(self._stats["tokens"] / prompts, 1) if prompts else 0,
+                "max_tokens": self._stats["max_tokens"],
+                "full_prompt_tokens": self._stats["full_tokens"],
+                "last": self._stats["last"],
+            }
+
+
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def get_cypher_prompt_builder() -> CypherPromptBuilder:
+    """Return the shared builder, using the chatbot's embeddings and skill vocabulary."""
+    global _builder
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                from .chains import embeddings, CAREER_CYPHER_MODEL
+                from .skill_matcher import get_skill_matcher
+
+                def mentions(query):
+                    return get_skill_matcher().mentions(query)
+
+                _builder = CypherPromptBuilder(
+                    embed_fn=embeddings.embed_query if embeddings is not None else None,
+                    embed_documents_fn=embeddings.embed_documents if embeddings is not None else None,
+                    count_tokens=TokenCounter(CAREER_CYPHER_MODEL),
+                    skill_mentions=mentions,
+                )
+    return _builder
@@ -134,7 +134,18 @@ def store_graph_in_neo4j(graph):
                 u=u, v=v, weight=data['weight']
             )
 
+# --- Stamp the graph with a data version ---
+# The chatbot keys its Cypher/result caches on this version, so every reload
+# invalidates cached answers computed from the previous graph.
+def stamp_graph_version():
+    with driver.session() as session:
+        session.run(
+            "MERGE (m:GraphMeta {name: 'career_graph'}) "
+            "SET m.version = toString(timestamp())"
+        )
+
 # Call the function to store the graph
 store_graph_in_neo4j(Skills_Adj_Graph)
+stamp_graph_version()
 
 print("Graph stored in Neo4j successfully.")
\ No newline at end of file
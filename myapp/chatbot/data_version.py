@@ -0,0 +1,120 @@
+"""
+Data version tracking for chatbot caches
+The career graph loader (data/careers.py) stamps a :GraphMeta node with a new
+version every time it reloads Neo4j. Caches key their entries on the version
+returned here, so a graph reload automatically invalidates stale entries.
+The course catalogue version comes from COURSE_DATA_VERSION (set by the
+scraping pipeline deployment) and can be bumped manually by admins.
+"""
+import os
+import threading
+import time
+
+# How often (seconds) the graph version is re-read from Neo4j
+GRAPH_VERSION_TTL = float(os.getenv("GRAPH_VERSION_TTL", "60"))
+
+# Query used to read the version stamp written by data/careers.py
+GRAPH_VERSION_QUERY = (
+    "MATCH (m:GraphMeta {name: 'career_graph'}) "
+    "RETURN m.version AS version"
+)
+
+_lock = threading.Lock()
+_graph_version = None      # Last version read from Neo4j (None until first read)
+_graph_checked_at = 0.0    # time.monotonic() of the last successful/failed read
+_graph_refreshing = False  # A caller is reading the stamp from Neo4j right now
+_local_bump = 0            # Incremented by manual invalidation (admin endpoint)
+_course_bump = 0           # Incremented by manual course catalogue invalidation
+_listeners = []            # Callbacks fired when the graph version changes
+
+
+def on_graph_version_change(callback):
+    """Register a callback (no arguments) fired whenever the graph version changes."""
+    _listeners.append(callback)
+    return callback
+
+
+def _notify_listeners():
+    for callback in list(_listeners):
+        try:
+            callback()
+        except Exception as e:
+            print(f"⚠️ Graph version listener failed: {e}")
+
+
+def _read_graph_version():
+    """Read the version stamp from Neo4j (None if the graph has no stamp yet)."""
+    from .neo4j_client import read_query
+
+    rows = read_query(GRAPH_VERSION_QUERY, name="graph_version", timeout=2)
+    if rows:
+        return rows[0].get("version")
+    return None
+
+
+def graph_data_version() -> str:
+    """
+    Return the current career graph data version.
+    The Neo4j stamp is re-read at most once every GRAPH_VERSION_TTL seconds so
+    cache lookups never pay a graph round-trip on the hot path. One caller
+    re-reads it (outside the lock); the others keep the last known version meanwhile.
+    """
+    global _graph_version, _graph_checked_at, _graph_refreshing
+
+    now = time.monotonic()
+    with _lock:
+        due = _graph_checked_at == 0.0 or now - _graph_checked_at >= GRAPH_VERSION_TTL
+        if _graph_refreshing or not due:
+            return f"{_graph_version}:{_local_bump}"
+        _graph_refreshing = True
+        _graph_checked_at = now
+
+    changed, version, read_ok = False, None, False
+    try:
+        version, read_ok = _read_graph_version(), True
+    except Exception as e:
+        # Keep serving the last known version if Neo4j is unreachable
+        print(f"⚠️ Could not read graph data version: {e}")
+    finally:
+        with _lock:
+            _graph_refreshing = False
+            if read_ok:
+                changed = _graph_version is not None and version != _graph_version
+                _graph_version = version
+            current = f"{_graph_version}:{_local_bump}"
+
+    if changed:
+        print(f"🔄 Career graph reloaded (version {current}), invalidating caches")
+        _notify_listeners()
+    return current
+
+
+def bump_graph_version() -> str:
+    """Force a new graph data version (used when the graph is reloaded manually)."""
+    global _local_bump, _graph_checked_at
+
+    with _lock:
+        _local_bump += 1
+        _graph_checked_at = 0.0  # Re-read the Neo4j stamp on next access
+    _notify_listeners()
+    return graph_data_version()
+
+
+def course_data_version() -> str:
+    """Return the current course catalogue version."""
+    return f"{os.getenv('COURSE_DATA_VERSION', '0')}:{_course_bump}"
+
+
+def bump_course_version() -> str:
+    """Force a new course catalogue version (e.g. after re-running the scrapers)."""
+    global _course_bump
+
+    with _lock:
+        _course_bump += 1
+    # No listeners: entries keyed on the old version simply stop matching
+    return course_data_version()
+
+
+def current_data_version() -> str:
+    """Combined graph + course version for caches that depend on both."""
+    return f"graph={graph_data_version()}|courses={course_data_version()}"
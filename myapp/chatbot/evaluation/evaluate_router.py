@@ -0,0 +1,95 @@
+"""
+Offline evaluation of the local intent router
+Classifies every question in test_dataset.py and compares the routed tool with
+the tool each test set exercises. Can also score a JSONL log of production
+routing decisions (INTENT_ROUTER_LOG) against the same labels.
+
+Usage (from this folder):
+    python evaluate_router.py                 # keyword rules + embedding centroids
+    python evaluate_router.py --rules-only    # keyword rules only (no model download)
+    python evaluate_router.py --log ../router_decisions.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+# Make the chatbot package importable when running from the evaluation folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from chatbot.router import IntentRouter, AGENT, CAREER_GRAPH, COURSES
+from test_dataset import COURSE_RECOMMENDATION_TEST_SET, CAREER_GRAPH_TEST_SET
+
+
+def labelled_questions():
+    """Each test set exercises exactly one tool, which is the expected route."""
+    for case in COURSE_RECOMMENDATION_TEST_SET:
+        yield case["question"], COURSES
+    for case in CAREER_GRAPH_TEST_SET:
+        yield case["question"], CAREER_GRAPH
+
+
+def build_router(rules_only: bool) -> IntentRouter:
+    if rules_only:
+        return IntentRouter(log_path=None)
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    return IntentRouter(embeddings.embed_query, embeddings.embed_documents, log_path=None)
+
+
+def score(decisions):
+    """
+    decisions: list of (question, expected_tool, decision dict)
+    Prints per-question results and summary metrics.
+    """
+    dispatched = [d for d in decisions if d[2]["tool"] != AGENT]
+    correct_dispatch = [d for d in dispatched if d[2]["tool"] == d[1]]
+    correct_predicted = [d for d in decisions if d[2]["predicted_tool"] == d[1]]
+
+    print(f"{'Question':<60} {'Expected':<22} {'Routed':<22} {'Conf':>5}")
+    print("-" * 112)
+    for question, expected, decision in decisions:
+        mark = "✓" if decision["tool"] in (expected, AGENT) else "✗"
+        print(f"{question[:58]:<60} {expected:<22} {decision['tool']:<22} "
+              f"{decision['confidence']:>5.2f} {mark}")
+
+    total = len(decisions)
+    print("\n📊 ROUTER SUMMARY")
+    print(f"  Questions:                  {total}")
+    print(f"  Dispatch rate (LLM saved):  {len(dispatched) / total:.1%}")
+    print(f"  Dispatch precision:         {len(correct_dispatch) / len(dispatched):.1%}" if dispatched
+          else "  Dispatch precision:         n/a")
+    print(f"  Top-1 accuracy (predicted): {len(correct_predicted) / total:.1%}")
+    print(f"  Routes: {dict(Counter(d[2]['tool'] for d in decisions))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules-only", action="store_true", help="Skip embedding centroids")
+    parser.add_argument("--log", help="Score logged decisions (JSONL) instead of re-classifying")
+    args = parser.parse_args()
+
+    labels = dict(labelled_questions())
+
+    if args.log:
+        # Score production decisions for the questions we have labels for
+        decisions = []
+        with open(args.log, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("question") in labels:
+                    decisions.append((record["question"], labels[record["question"]], record))
+        if not decisions:
+            print("No logged decisions match questions in test_dataset.py")
+            return
+    else:
+        router = build_router(args.rules_only)
+        decisions = [(q, expected, router.classify(q)) for q, expected in labels.items()]
+
+    score(decisions)
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,11 @@ from test_dataset import COURSE_RECOMMENDATION_TEST_SET, CAREER_GRAPH_TEST_SET
 # Load environment variables (DB credentials, API keys, model names, etc.)
 load_dotenv()
 
+# Judge model + metrics used by RAGAS
+RAGAS_MODEL = "gpt-3.5-turbo-1106"
+COURSE_METRICS = [context_precision, context_recall, faithfulness, answer_relevancy]
+GRAPH_METRICS = [faithfulness, answer_relevancy]
+
 
 # ============================================
 # SETUP FUNCTIONS
@@ -374,6 +379,72 @@ NOW FORMAT THE RESULTS ABOVE - INCLUDE EVERY SINGLE ITEM:
 # EVALUATION FUNCTIONS
 # ============================================
 
+def course_row(qa_chain, test_case):
+    """Run one course question; returns the RAGAS row (question, answer, contexts, ground_truth)."""
+    # Run chain inference for the question
+    result = qa_chain.invoke({"query": test_case['question']})
+    
+    # Extract retrieved documents for RAGAS context fields
+    contexts = []
+    if "source_documents" in result:
+        for doc in result["source_documents"]:
+            title = doc.metadata.get('title', 'Untitled')
+            content = doc.page_content
+            contexts.append(f"Title: {title}\nDescription: {content}")
+    
+    return {
+        "question": test_case['question'],
+        "answer": result.get("result", ""),
+        "contexts": contexts if contexts else ["No context"],
+        "ground_truth": test_case.get("ground_truth", "")
+    }
+
+
+def graph_row(chain, test_case):
+    """Run one career graph question; returns the RAGAS row."""
+    # Execute graph query chain
+    result = chain.invoke({"query": test_case['question']})
+    answer = result.get("result", str(result))
+    
+    return {
+        "question": test_case['question'],
+        "answer": answer,
+        "contexts": [answer],
+        "ground_truth": test_case.get("ground_truth", "")
+    }
+
+
+def error_row(test_case, error):
+    """Failed questions are still scored (as errors) so the averages stay comparable."""
+    return {
+        "question": test_case['question'],
+        "answer": f"Error: {str(error)}",
+        "contexts": ["Error"],
+        "ground_truth": test_case.get("ground_truth", "")
+    }
+
+
+def score_rows(evaluation_data, metrics):
+    """Score collected rows with RAGAS (no chain calls); returns a DataFrame."""
+    # Convert collected data into a HuggingFace dataset
+    dataset = Dataset.from_list(evaluation_data)
+
+    # Embeddings for RAGAS semantic comparisons
+    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    
+    print("\n🚀 Running RAGAS evaluation...\n")
+    
+    # Run RAGAS metrics
+    result = evaluate(
+        dataset=dataset,
+        metrics=metrics,
+        llm=ChatOpenAI(model=RAGAS_MODEL, temperature=0),
+        embeddings=embeddings,
+    )
+    
+    return result.to_pandas()
+
+
 def evaluate_course_recommendations():
     """Evaluate course recommendations"""
     
@@ -386,61 +457,19 @@ def evaluate_course_recommendations():
     
     # Iterate over each test case
     for i, test_case in enumerate(COURSE_RECOMMENDATION_TEST_SET, 1):
-        question = test_case['question']
-        print(f"[{i}/{len(COURSE_RECOMMENDATION_TEST_SET)}] {question}")
+        print(f"[{i}/{len(COURSE_RECOMMENDATION_TEST_SET)}] {test_case['question']}")
         
         try:
-            # Run chain inference for the question
-            result = qa_chain.invoke({"query": question})
-            
-            # Extract retrieved documents for RAGAS context fields
-            contexts = []
-            if "source_documents" in result:
-                for doc in result["source_documents"]:
-                    title = doc.metadata.get('title', 'Untitled')
-                    content = doc.page_content
-                    contexts.append(f"Title: {title}\nDescription: {content}")
-            
-            answer = result.get("result", "")
-            
-            # Save data row for RAGAS evaluation
-            evaluation_data.append({
-                "question": question,
-                "answer": answer,
-                "contexts": contexts if contexts else ["No context"],
-                "ground_truth": test_case.get("ground_truth", "")
-            })
-            
-            print(f"    ✓ Retrieved {len(contexts)} courses")
-            
+            row = course_row(qa_chain, test_case)
+            print(f"    ✓ Retrieved {len(row['contexts'])} courses")
         except Exception as e:
             print(f"    ✗ Error: {e}")
             # Error handling: still append to evaluation_data
-            evaluation_data.append({
-                "question": question,
-                "answer": f"Error: {str(e)}",
-                "contexts": ["Error"],
-                "ground_truth": test_case.get("ground_truth", "")
-            })
+            row = error_row(test_case, e)
+        evaluation_data.append(row)
     
     # Run RAGAS
-    # Convert collected data into a HuggingFace dataset
-    dataset = Dataset.from_list(evaluation_data)
-
-    # Embeddings for RAGAS semantic comparisons
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    
-    print("\n🚀 Running RAGAS evaluation...\n")
-    
-    # Run RAGAS metrics
-    result = evaluate(
-        dataset=dataset,
-        metrics=[context_precision, context_recall, faithfulness, answer_relevancy],
-        llm=ChatOpenAI(model="gpt-3.5-turbo-1106", temperature=0),
-        embeddings=embeddings,
-    )
-    
-    return result.to_pandas()
+    return score_rows(evaluation_data, COURSE_METRICS)
 
 
 def evaluate_career_graph():
@@ -454,49 +483,18 @@ def evaluate_career_graph():
     evaluation_data = []
     
     for i, test_case in enumerate(CAREER_GRAPH_TEST_SET, 1):
-        question = test_case['question']
-        print(f"[{i}/{len(CAREER_GRAPH_TEST_SET)}] {question}")
+        print(f"[{i}/{len(CAREER_GRAPH_TEST_SET)}] {test_case['question']}")
         
         try:
-            # Execute graph query chain
-            result = chain.invoke({"query": question})
-            answer = result.get("result", str(result))
-            
-            # Append evaluation row
-            evaluation_data.append({
-                "question": question,
-                "answer": answer,
-                "contexts": [answer],
-                "ground_truth": test_case.get("ground_truth", "")
-            })
-            
-            print(f"    ✓ Answer length: {len(answer)} chars")
-            
+            row = graph_row(chain, test_case)
+            print(f"    ✓ Answer length: {len(row['answer'])} chars")
         except Exception as e:
             print(f"    ✗ Error: {e}")
-            evaluation_data.append({
-                "question": question,
-                "answer": f"Error: {str(e)}",
-                "contexts": ["Error"],
-                "ground_truth": test_case.get("ground_truth", "")
-            })
+            row = error_row(test_case, e)
+        evaluation_data.append(row)
     
-    # Run RAGAS
-    # Convert collected test cases into Dataset
-    dataset = Dataset.from_list(evaluation_data)
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    
-    print("\n🚀 Running RAGAS evaluation...\n")
-    
-    # Run RAGAS evaluation (career graph uses only 2 metrics)
-    result = evaluate(
-        dataset=dataset,
-        metrics=[faithfulness, answer_relevancy],
-        llm=ChatOpenAI(model="gpt-3.5-turbo-1106", temperature=0),
-        embeddings=embeddings,
-    )
-    
-    return result.to_pandas()
+    # Run RAGAS (career graph uses only 2 metrics)
+    return score_rows(evaluation_data, GRAPH_METRICS)
 
 
 # ============================================
@@ -515,6 +513,11 @@ def main():
     # Evaluate career graph
     graph_df = evaluate_career_graph()
     
+    report_results(course_df, graph_df)
+
+
+def report_results(course_df, graph_df):
+    """Print the summary and save the CSVs + text report under results/."""
     # Display results
     print("\n" + "=" * 70)
     print(" " * 25 + "RESULTS SUMMARY")
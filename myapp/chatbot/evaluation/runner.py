@@ -0,0 +1,255 @@
+"""
+Concurrent, resumable RAGAS evaluation runner
+Runs the evaluate_standalone.py chains over the test_dataset.py questions with
+a thread pool under a shared rate limiter, and appends every completed chain
+call (question, answer, contexts) to a local JSONL file. Records are keyed by
+suite + question + a hash of the chain's prompts and model names, so:
+- an interrupted run resumes where it stopped (failed calls are retried)
+- editing a prompt or switching models re-runs only under the new config
+- --rescore scores the saved records with RAGAS without calling any chain
+
+Usage (from this folder, in the evaluation venv):
+    python runner.py                          # run missing questions, then score
+    python runner.py --concurrency 8 --rate 4
+    python runner.py --no-score               # collect answers only
+    python runner.py --rescore                # RAGAS on saved records only
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from evaluate_standalone import (
+    COURSE_METRICS,
+    GRAPH_METRICS,
+    course_row,
+    error_row,
+    graph_row,
+    report_results,
+    score_rows,
+    setup_career_graph_chain,
+    setup_course_chain,
+)
+from test_dataset import COURSE_RECOMMENDATION_TEST_SET, CAREER_GRAPH_TEST_SET
+
+# Runner defaults (tunable from the environment or the command line)
+EVAL_RECORDS_PATH = os.getenv("EVAL_RECORDS_PATH", "results/eval_records.jsonl")
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "4"))
+EVAL_RATE = float(os.getenv("EVAL_RATE", "2"))      # Chain calls started per second (0 = unlimited)
+EVAL_RETRIES = int(os.getenv("EVAL_RETRIES", "2"))  # Extra attempts per question (exponential backoff)
+
+# suite → (chain factory, one-question runner, test set, RAGAS metrics)
+SUITES = {
+    "course": (setup_course_chain, course_row, COURSE_RECOMMENDATION_TEST_SET, COURSE_METRICS),
+    "graph": (setup_career_graph_chain, graph_row, CAREER_GRAPH_TEST_SET, GRAPH_METRICS),
+}
+
+
+class RateLimiter:
+    """Spaces chain call starts at least 1/rate seconds apart across all worker threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def _collect_config(obj, parts: list, seen: set):
+    """Walk a chain's pydantic fields collecting prompt templates and model names."""
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+    if isinstance(obj, (list, tuple)):
+        for item in obj:
+            _collect_config(item, parts, seen)
+        return
+    if isinstance(obj, dict):
+        for item in obj.values():
+            _collect_config(item, parts, seen)
+        return
+    if not isinstance(obj, BaseModel):
+        return
+    template = getattr(obj, "template", None)
+    if isinstance(template, str):
+        parts.append(f"prompt:{template}")
+    model_name = getattr(obj, "model_name", None)
+    if isinstance(model_name, str):
+        parts.append(f"model:{model_name}")
+    for name in type(obj).model_fields:
+        _collect_config(getattr(obj, name, None), parts, seen)
+
+
+def config_hash(chain) -> str:
+    """Short hash of every prompt + model in the chain (changes when either does)."""
+    parts = []
+    _collect_config(chain, parts, set())
+    data = json.dumps(list(dict.fromkeys(parts)))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:12]
+
+
+class RecordStore:
+    """Append-only JSONL of completed chain calls, keyed by (suite, question, config)."""
+
+    def __init__(self, path: str = EVAL_RECORDS_PATH):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        for line in content.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A run killed mid-write leaves a partial last line
+            self.records[self.key(record)] = record  # Later lines win
+        if content and not content.endswith("\n"):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    @staticmethod
+    def key(record: dict) -> tuple:
+        return record["suite"], record["question"], record["config"]
+
+    def get(self, suite: str, question: str, config: str):
+        return self.records.get((suite, question, config))
+
+    def latest(self, suite: str, question: str):
+        """Most recent record for the question under any config (successful ones first)."""
+        matches = [r for r in self.records.values() if r["suite"] == suite and r["question"] == question]
+        if not matches:
+            return None
+        return max(matches, key=lambda r: (r.get("error") is None, r["completed_at"]))
+
+    def add(self, record: dict):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.records[self.key(record)] = record
+
+
+def _run_case(suite, run_row, chain, config, test_case, limiter, retries) -> dict:
+    """One question with retries; returns the record to persist (errors included)."""
+    error = None
+    for attempt in range(retries + 1):
+        limiter.wait()
+        start = time.monotonic()
+        try:
+            row = run_row(chain, test_case)
+            error = None
+            break
+        except Exception as e:
+            error = e
+            if attempt < retries:
+                time.sleep(2 ** attempt)
+    if error is not None:
+        row = error_row(test_case, error)
+    return {
+        "suite": suite,
+        "question": test_case["question"],
+        "config": config,
+        "answer": row["answer"],
+        "contexts": row["contexts"],
+        "error": str(error) if error is not None else None,
+        "elapsed_s": round(time.monotonic() - start, 3),
+        "completed_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def collect(suite: str, store: RecordStore, concurrency: int, limiter: RateLimiter, retries: int) -> str:
+    """Run every question without a successful record for the current config; returns the config hash."""
+    setup, run_row, test_set, _ = SUITES[suite]
+    chain = setup()
+    config = config_hash(chain)
+
+    pending = []
+    for test_case in test_set:
+        record = store.get(suite, test_case["question"], config)
+        if record is None or record.get("error"):
+            pending.append(test_case)
+    print(f"\n📋 {suite}: {len(test_set) - len(pending)}/{len(test_set)} already answered "
+          f"(config {config}), running {len(pending)}")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(_run_case, suite, run_row, chain, config, test_case, limiter, retries)
+                   for test_case in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            store.add(record)
+            mark = f"✗ Error: {record['error']}" if record["error"] else f"✓ {record['elapsed_s']:.1f}s"
+            print(f"  [{done}/{len(pending)}] {record['question'][:60]} {mark}")
+    return config
+
+
+def rows_for(suite: str, store: RecordStore, config: str = None) -> list:
+    """
+    RAGAS rows from saved records, in test set order. Ground truths come from
+    test_dataset.py, so they can be edited and re-scored without re-running chains.
+    config=None → the latest record of each question under any config.
+    """
+    _, _, test_set, _ = SUITES[suite]
+    rows = []
+    for test_case in test_set:
+        question = test_case["question"]
+        record = store.get(suite, question, config) if config else store.latest(suite, question)
+        if record is None:
+            print(f"  ⚠️ {suite}: no saved answer for {question!r}, skipped")
+            continue
+        rows.append({
+            "question": question,
+            "answer": record["answer"],
+            "contexts": record["contexts"],
+            "ground_truth": test_case.get("ground_truth", ""),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", default=EVAL_RECORDS_PATH, help="JSONL file of completed chain calls")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY, help="Parallel chain calls")
+    parser.add_argument("--rate", type=float, default=EVAL_RATE, help="Chain calls started per second (0 = no limit)")
+    parser.add_argument("--retries", type=int, default=EVAL_RETRIES, help="Extra attempts per failed question")
+    parser.add_argument("--rescore", action="store_true", help="Score saved records only (no chain calls)")
+    parser.add_argument("--no-score", action="store_true", help="Collect answers without running RAGAS")
+    args = parser.parse_args()
+
+    print(f"\nStarted at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    store = RecordStore(args.records)
+    limiter = RateLimiter(args.rate)
+
+    rows = {}
+    for suite in SUITES:
+        config = None if args.rescore else collect(suite, store, args.concurrency, limiter, args.retries)
+        rows[suite] = rows_for(suite, store, config)
+
+    print(f"\n💾 Records: {args.records}")
+    if args.no_score:
+        return
+    if not rows["course"] or not rows["graph"]:
+        print("Nothing to score yet: run without --rescore first")
+        return
+
+    course_df = score_rows(rows["course"], SUITES["course"][3])
+    graph_df = score_rows(rows["graph"], SUITES["graph"][3])
+    report_results(course_df, graph_df)
+
+
+if __name__ == "__main__":
+    main()
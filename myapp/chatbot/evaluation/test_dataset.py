@@ -1,6 +1,11 @@
 """
 Test Dataset for RAGAS Evaluation
 Contains test cases for all three components of the career chatbot
+The extra labels are used by the offline benchmark (../benchmarks/pipeline.py),
+not by RAGAS:
+- relevant_keywords: a retrieved course is relevant if its title/description contains one
+- cypher: reference query (the benchmark's canned Cypher generation output)
+- expected: values the returned graph rows must contain
 """
 
 # ============================================
@@ -11,42 +16,49 @@ COURSE_RECOMMENDATION_TEST_SET = [
     {
         "question": "Python programming courses",
         "ground_truth": "Courses covering Python programming fundamentals and advanced topics",
+        "relevant_keywords": ["python"],
     },
     
     # Web frameworks
     {
         "question": "React courses for beginners",
         "ground_truth": "Beginner-friendly courses on React framework for frontend development",
+        "relevant_keywords": ["react"],
     },
     
     # Databases
     {
         "question": "PostgreSQL database courses",
         "ground_truth": "Courses focused on PostgreSQL relational database management",
+        "relevant_keywords": ["postgresql"],
     },
     
     # Cloud platforms
     {
         "question": "Learn Google Cloud Platform",
         "ground_truth": "Courses teaching Google Cloud Platform services and tools",
+        "relevant_keywords": ["google cloud", "gcp"],
     },
     
     # Data Science & ML
     {
         "question": "Machine learning courses",
         "ground_truth": "Courses covering machine learning algorithms, concepts, and applications",
+        "relevant_keywords": ["machine learning"],
     },
     
     # DevOps & Tools
     {
         "question": "Docker courses",
         "ground_truth": "Courses on Docker containerization platform",
+        "relevant_keywords": ["docker"],
     },
     
     # Edge cases
     {
         "question": "Cooking classes",
         "ground_truth": "No tech courses available - non-technical topic",
+        "relevant_keywords": [],
     },
 ]
 
@@ -59,24 +71,32 @@ CAREER_GRAPH_TEST_SET = [
     {
         "question": "What skills does a Data scientist need?",
         "ground_truth": "Skills including PostgreSQL, SQLite, MySQL, Microsoft SQL Server, MongoDB, Python, SQL, Bash/Shell (all shells), HTML/CSS, R, Docker, Pip, Amazon Web Services (AWS), Microsoft Azure, Google Cloud, cFastAPI, Flask, Node.js, React, Django",
+        "cypher": "MATCH (j:Job {name: 'Data scientist'})\nRETURN j.top_language AS language, j.top_database AS database, j.top_platform AS platform, j.top_webframe AS framework",
+        "expected": ["Python", "SQL", "PostgreSQL", "Docker"],
     },
     
     # Salary queries
     {
         "question": "What is the median salary for a Data scientist?",
         "ground_truth": "87011",
+        "cypher": "MATCH (j:Job {name: 'Data scientist'})\nRETURN j.median_comp AS median_salary",
+        "expected": ["87011"],
     },
     
     # Experience queries
     {
         "question": "How many years of experience does a Data or business analyst typically have?",
         "ground_truth": "8",
+        "cypher": "MATCH (j:Job {name: 'Data or business analyst'})\nRETURN j.median_workexp AS work_experience",
+        "expected": ["8"],
     },
     
     # Jobs by technology
     {
         "question": "Jobs that use Angular",
         "ground_truth": "Front-end Developer, QA or Test Developer, Support Engineer or Analyst, DevOps Engineer or Professional, Product Manager, Software or Solutions Architect, Project Manager",
+        "cypher": "MATCH (j:Job)\nWHERE j.top_webframe CONTAINS 'Angular'\nRETURN j.name AS job_name, j.median_comp AS salary\nORDER BY j.median_comp DESC",
+        "expected": ["Developer, front-end", "Developer, QA or test", "Support engineer or analyst", "DevOps engineer or professional", "Product manager", "Architect, software or solutions", "Project manager"],
     },
     
     
@@ -84,11 +104,15 @@ CAREER_GRAPH_TEST_SET = [
     {
         "question": "What jobs pay more than Engineering manager?",
         "ground_truth": "Financial analyst or engineer",
+        "cypher": "MATCH (current:Job {name: 'Engineering manager'})-[r:RELATED_TO]->(next:Job)\nWHERE next.median_comp > current.median_comp\nRETURN next.name AS job_name, next.median_comp - current.median_comp AS salary_increase, next.median_comp AS new_salary\nORDER BY salary_increase DESC\nLIMIT 10",
+        "expected": ["Financial analyst or engineer"],
     },
     
     # Experience-based
     {
         "question": "Jobs requiring less than 7 years experience",
         "ground_truth": "Academic researcher",
+        "cypher": "MATCH (j:Job)\nWHERE j.median_workexp < 7\nRETURN j.name AS job_name, j.median_workexp AS years_required, j.median_comp AS salary\nORDER BY j.median_comp DESC",
+        "expected": ["Academic researcher"],
     },
 ]
@@ -0,0 +1,200 @@
+"""
+Background health probes
+A daemon thread checks each chatbot dependency every HEALTH_PROBE_INTERVAL
+seconds and keeps the result in memory, so the health endpoints answer from a
+snapshot instead of hitting Neo4j / Supabase on every load balancer poll.
+
+Per dependency: status (up / down / disabled / unknown), probe latency, last
+success, last error, consecutive and total failures.
+- liveness:  the process is serving requests and the prober thread is alive
+- readiness: every required dependency is up and the snapshot is fresh
+
+With CHATBOT_AGENT_MODE=queue, web workers don't load the agent stack: they
+probe the agent job queue (is the worker pool keeping up?) instead.
+"""
+import os
+import threading
+import time
+
+# Probe configuration (tunable from the environment)
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))   # Seconds between probe rounds
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))      # Per-probe query timeout
+HEALTH_STALE_AFTER = float(os.getenv("HEALTH_STALE_AFTER", str(HEALTH_PROBE_INTERVAL * 3)))
+
+# Dependencies that must be up for the instance to receive traffic
+REQUIRED_DEPENDENCIES = ("chains", "neo4j")
+
+
+class DisabledDependency(Exception):
+    """Raised by a probe when the dependency is switched off by configuration."""
+
+
+def probe_chains():
+    """The LangChain chains imported and initialised (course chain may be disabled)."""
+    from .chains import career_cypher_chain, qa_chain
+    if career_cypher_chain is None:
+        raise RuntimeError("career chain not initialized")
+    return {"course_chain": "initialized" if qa_chain is not None else "disabled"}
+
+
+def probe_neo4j():
+    from .neo4j_client import read_query
+    read_query("RETURN 1 AS test", name="health", timeout=HEALTH_PROBE_TIMEOUT)
+
+
+def probe_course_store():
+    """Local course index when enabled, otherwise a plain SELECT 1 on the PGVector database (no embedding)."""
+    from .chains import COURSE_RETRIEVER, supabase_vector_store
+    if COURSE_RETRIEVER == "local":
+        from .local_index import get_course_index
+        index = get_course_index()
+        if index.refresh(force=True):
+            return index.status()
+    if supabase_vector_store is None:
+        raise DisabledDependency("course recommender disabled")
+    from sqlalchemy import text
+    with supabase_vector_store.session_maker() as session:
+        session.execute(text("SELECT 1"))
+
+
+def probe_agent_queue():
+    """The agent worker pool is picking up jobs (oldest pending job younger than CHATBOT_JOB_STALL_AFTER)."""
+    from .job_queue import CHATBOT_JOB_STALL_AFTER, stats
+    details = stats()
+    age = details["oldest_pending_age_s"]
+    if age is not None and age > CHATBOT_JOB_STALL_AFTER:
+        raise RuntimeError(f"oldest pending agent job is {age:g}s old (is run_agent_workers running?)")
+    return details
+
+
+PROBES = {
+    "chains": probe_chains,
+    "neo4j": probe_neo4j,
+    "course_store": probe_course_store,
+}
+# Web tier in agent queue mode (see job_queue.py)
+QUEUE_PROBES = {"agent_queue": probe_agent_queue}
+QUEUE_REQUIRED_DEPENDENCIES = ("agent_queue",)
+
+
+class HealthProber:
+    """Runs the probes on a background thread and keeps the latest results."""
+
+    def __init__(self, probes=None, interval: float = HEALTH_PROBE_INTERVAL,
+                 stale_after: float = HEALTH_STALE_AFTER, required=None):
+        if probes is None:
+            from .job_queue import runs_agent_in_process
+            queue_web = not runs_agent_in_process()
+            probes = QUEUE_PROBES if queue_web else PROBES
+            required = required or (QUEUE_REQUIRED_DEPENDENCIES if queue_web else REQUIRED_DEPENDENCIES)
+        self.probes = dict(probes)
+        self.interval = interval
+        self.stale_after = stale_after
+        self.required = tuple(REQUIRED_DEPENDENCIES if required is None else required)
+        self.started_at = time.time()
+        self.last_round_at = None
+        self._results = {
+            name: {"status": "unknown", "latency_ms": None, "last_success": None, "last_error": None,
+                   "consecutive_failures": 0, "total_failures": 0, "checks": 0}
+            for name in self.probes
+        }
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run_probe(self, name, probe):
+        started = time.perf_counter()
+        try:
+            details = probe()
+            status, error = "up", None
+        except DisabledDependency as e:
+            details, status, error = {"reason": str(e)}, "disabled", None
+        except Exception as e:
+            details, status, error = None, "down", str(e)
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        with self._lock:
+            result = self._results[name]
+            result.update(status=status, latency_ms=latency_ms, checks=result["checks"] + 1)
+            if status == "down":
+                result["last_error"] = error
+                result["consecutive_failures"] += 1
+                result["total_failures"] += 1
+            else:
+                result["last_success"] = time.time()
+                result["consecutive_failures"] = 0
+            if details:
+                result["details"] = details
+
+    def probe_once(self):
+        """Run every probe once (sequentially; each has its own timeout)."""
+        for name, probe in self.probes.items():
+            self._run_probe(name, probe)
+        self.last_round_at = time.time()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_once()
+            except Exception as e:  # Never let the prober thread die
+                print(f"⚠️ Health probe round failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name="chatbot-health-prober", daemon=True)
+                self._thread.start()
+                print(f"🩺 Health prober started (every {self.interval:g}s)")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self) -> dict:
+        """Cached health state; never runs a probe."""
+        with self._lock:
+            dependencies = {name: dict(result) for name, result in self._results.items()}
+        age = time.time() - self.last_round_at if self.last_round_at else None
+        stale = age is None or age > self.stale_after
+        required_up = all(dependencies[name]["status"] == "up" for name in self.required if name in dependencies)
+        optional_down = any(
+            result["status"] == "down" for name, result in dependencies.items() if name not in self.required
+        )
+
+        if self.last_round_at is None:
+            status = "starting"
+        elif stale or not required_up:
+            status = "unhealthy"
+        else:
+            status = "degraded" if optional_down else "healthy"
+        return {
+            "status": status,
+            "ready": status in ("healthy", "degraded"),
+            "live": self.alive,
+            "snapshot_age_s": round(age, 2) if age is not None else None,
+            "probe_interval_s": self.interval,
+            "uptime_s": round(time.time() - self.started_at, 2),
+            "dependencies": dependencies,
+        }
+
+
+_prober = None
+_prober_lock = threading.Lock()
+
+
+def get_health_prober() -> HealthProber:
+    """Return the shared prober, starting its thread on first use."""
+    global _prober
+    if _prober is None:
+        with _prober_lock:
+            if _prober is None:
+                _prober = HealthProber().start()
+    elif not _prober.alive:
+        _prober.start()
+    return _prober
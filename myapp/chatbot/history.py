@@ -0,0 +1,177 @@
+"""
+Chat history writer
+query_chatbot_api records every answer (tools used, response time and
+per-stage timings, see context.stage_timings) in chatbot_chathistory without
+waiting on the database: rows are buffered in memory and written with
+bulk_create by a background thread once CHAT_HISTORY_BATCH_SIZE rows are
+waiting or every CHAT_HISTORY_FLUSH_INTERVAL seconds.
+
+Loss is bounded: at most CHAT_HISTORY_MAX_BUFFER rows are held (the oldest
+are dropped, and counted, if the database stays unreachable), failed batches
+are retried on the next flush, and the buffer is flushed at interpreter exit.
+A batch the database rejects (IntegrityError / DataError, e.g. the user was
+deleted before the flush) is retried row by row, so only the bad rows are
+dropped (counted as "rejected") instead of blocking every later row.
+"""
+import atexit
+import os
+import threading
+from collections import deque
+
+from django.db import DataError, IntegrityError, close_old_connections
+from django.utils import timezone
+
+# Writer configuration (tunable from the environment)
+CHAT_HISTORY_ENABLED = os.getenv("CHAT_HISTORY_ENABLED", "1").lower() in ("1", "true", "yes")
+CHAT_HISTORY_BATCH_SIZE = int(os.getenv("CHAT_HISTORY_BATCH_SIZE", "50"))
+CHAT_HISTORY_FLUSH_INTERVAL = float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", "2"))
+CHAT_HISTORY_MAX_BUFFER = int(os.getenv("CHAT_HISTORY_MAX_BUFFER", "2000"))
+CHAT_HISTORY_SHUTDOWN_TIMEOUT = float(os.getenv("CHAT_HISTORY_SHUTDOWN_TIMEOUT", "5"))
+
+# chatbot_chathistory.tool_used is a varchar(100)
+TOOL_USED_MAX_LENGTH = 100
+
+
+def _bulk_insert(rows: list):
+    from .models import ChatHistory
+    close_old_connections()  # Long-lived thread: don't reuse a connection the server dropped
+    ChatHistory.objects.bulk_create([ChatHistory(**row) for row in rows], batch_size=CHAT_HISTORY_BATCH_SIZE)
+
+
+class ChatHistoryWriter:
+    """Buffered, batched, background writer of ChatHistory rows."""
+
+    def __init__(self, batch_size: int = CHAT_HISTORY_BATCH_SIZE, flush_interval: float = CHAT_HISTORY_FLUSH_INTERVAL,
+                 max_buffer: int = CHAT_HISTORY_MAX_BUFFER, save_rows=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._save_rows = save_rows or _bulk_insert
+        self._buffer = deque()
+        self._lock = threading.Lock()        # Guards the buffer + counters
+        self._flush_lock = threading.Lock()  # One flush at a time (thread or shutdown)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._counts = {"recorded": 0, "written": 0, "dropped": 0, "rejected": 0, "failed_flushes": 0}
+
+    def record(self, query: str, response: str, session_id: str = "default", user_id=None, tools=(),
+               response_time: float = None, stage_timings: dict = None):
+        """Queue one row (never blocks on the database)."""
+        row = {
+            "query": query,
+            "response": response,
+            "session_id": (session_id or "default")[:100],
+            "user_id": user_id,
+            "tool_used": ",".join(dict.fromkeys(tools))[:TOOL_USED_MAX_LENGTH] or None,
+            "response_time": response_time,
+            "stage_timings": stage_timings or None,
+            "timestamp": timezone.now(),
+        }
+        with self._lock:
+            self._buffer.append(row)
+            self._counts["recorded"] += 1
+            self._trim_locked()
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def _trim_locked(self):
+        while len(self._buffer) > self.max_buffer:
+            self._buffer.popleft()
+            self._counts["dropped"] += 1
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._buffer)
+                self._buffer.clear()
+            if not rows:
+                return 0
+            try:
+                self._save_rows(rows)
+            except (IntegrityError, DataError) as e:
+                print(f"⚠️ Chat history batch rejected, writing its {len(rows)} rows one by one: {e}")
+                return self._save_row_by_row(rows)
+            except Exception as e:
+                self._keep_for_retry(rows, e)
+                return 0
+            with self._lock:
+                self._counts["written"] += len(rows)
+            return len(rows)
+
+    def _save_row_by_row(self, rows: list) -> int:
+        """Write rows separately, dropping the ones the database rejects."""
+        written = 0
+        for i, row in enumerate(rows):
+            try:
+                self._save_rows([row])
+            except (IntegrityError, DataError) as e:
+                print(f"⚠️ Chat history row dropped: {e}")
+                with self._lock:
+                    self._counts["rejected"] += 1
+                continue
+            except Exception as e:
+                self._keep_for_retry(rows[i:], e)
+                break
+            written += 1
+            with self._lock:
+                self._counts["written"] += 1
+        return written
+
+    def _keep_for_retry(self, rows: list, error: Exception):
+        print(f"⚠️ Chat history flush failed ({len(rows)} rows kept for retry): {error}")
+        with self._lock:
+            self._buffer.extendleft(reversed(rows))  # Keep arrival order
+            self._trim_locked()
+            self._counts["failed_flushes"] += 1
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._stop.is_set() or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._loop, name="chatbot-history-writer", daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = CHAT_HISTORY_SHUTDOWN_TIMEOUT):
+        """Stop the thread and write what is left (called at exit)."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"buffered": len(self._buffer), **self._counts}
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_history_writer() -> ChatHistoryWriter:
+    """Return the shared writer (flushed at interpreter exit)."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ChatHistoryWriter()
+                atexit.register(_writer.shutdown)
+    return _writer
+
+
+def record_answer(query: str, response: str, **fields):
+    """Queue a chat history row if CHAT_HISTORY_ENABLED."""
+    if CHAT_HISTORY_ENABLED:
+        get_history_writer().record(query, response, **fields)
@@ -0,0 +1,205 @@
+"""
+Agent job queue
+With CHATBOT_AGENT_MODE=queue, Django web workers no longer run the agent
+themselves: they insert an AgentJob row and poll it, while a separate pool of
+agent worker processes (`python manage.py run_agent_workers`) claims pending
+jobs, runs the agent and stores the result. The two tiers can then be sized
+independently (many cheap web workers, a few workers holding the agent stack,
+LLM clients and drivers) on one machine, using the database already in use
+as the queue instead of an external broker.
+
+- Web side:    run_via_queue(text, user_id, session_id, timeout)
+- Worker side: claim_next_job(worker) / process_job(job) / work_forever(...)
+
+Claiming is a conditional UPDATE (pending → running), so several workers can
+poll the same table without locking rows or double-running a job.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from .context import deadline_context, session_context, stage_timings, user_context
+from .models import AgentJob
+
+# "inline" runs the agent in the web worker (default); "queue" hands it to the agent worker pool
+CHATBOT_AGENT_MODE = os.getenv("CHATBOT_AGENT_MODE", "inline").lower()
+AGENT_QUEUE = CHATBOT_AGENT_MODE == "queue"
+# Set by run_agent_workers in its children (the only processes that load the agent stack in queue mode)
+AGENT_WORKER_ENV = "CHATBOT_AGENT_WORKER"
+
+CHATBOT_AGENT_WORKERS = int(os.getenv("CHATBOT_AGENT_WORKERS", "2"))              # Default pool size
+CHATBOT_JOB_POLL_INTERVAL = float(os.getenv("CHATBOT_JOB_POLL_INTERVAL", "0.25"))  # Max web-side poll gap
+CHATBOT_WORKER_POLL_INTERVAL = float(os.getenv("CHATBOT_WORKER_POLL_INTERVAL", "0.1"))  # Idle worker sleep
+CHATBOT_JOB_TTL = float(os.getenv("CHATBOT_JOB_TTL", "30"))                       # Used when no deadline is set
+CHATBOT_JOB_RETENTION = float(os.getenv("CHATBOT_JOB_RETENTION", "3600"))         # Seconds finished rows are kept
+CHATBOT_JOB_STALL_AFTER = float(os.getenv("CHATBOT_JOB_STALL_AFTER", "10"))       # Oldest pending age = unhealthy
+
+FINISHED = (AgentJob.DONE, AgentJob.FAILED, AgentJob.EXPIRED)
+
+
+def is_agent_worker() -> bool:
+    """True inside an agent worker process started by run_agent_workers."""
+    return os.getenv(AGENT_WORKER_ENV) == "1"
+
+
+def runs_agent_in_process() -> bool:
+    """Whether this process runs the agent (and so needs chains, embeddings, drivers)."""
+    return not AGENT_QUEUE or is_agent_worker()
+
+
+def serialize_result(result: dict) -> dict:
+    """AgentExecutor result → JSON-safe dict (steps as strings, tool names kept for the answer cache)."""
+    from .agents import is_degraded_output
+    from .answer_cache import tools_used
+
+    output = result.get("output", "No response generated")
+    data = {
+        "input": result.get("input"),
+        "output": output,
+        "intermediate_steps": [str(step) for step in result.get("intermediate_steps", []) or []],
+        "tools": tools_used(result),
+        "degraded": bool(result.get("degraded")) or is_degraded_output(output),
+    }
+    if result.get("routing"):
+        data["routing"] = json.loads(json.dumps(result["routing"], default=str))
+    return data
+
+
+# ============================================
+# Web side
+# ============================================
+
+async def run_via_queue(text: str, user_id=None, session_id: str = "default", timeout: float = None) -> dict:
+    """
+    Enqueue a question and wait for an agent worker to answer it.
+    Raises asyncio.TimeoutError when no result arrives within `timeout`
+    (a job nobody has claimed yet is marked expired so it is never run).
+    """
+    timeout = CHATBOT_JOB_TTL if timeout is None else timeout
+    job = await AgentJob.objects.acreate(
+        query=text, user_id=user_id, session_id=session_id,
+        expires_at=timezone.now() + timedelta(seconds=timeout),
+    )
+    deadline = time.monotonic() + timeout
+    delay = 0.02  # Poll quickly at first (routed answers are fast), then back off
+
+    while True:
+        row = await AgentJob.objects.filter(pk=job.pk).values("status", "result", "error").afirst()
+        if row is None or row["status"] == AgentJob.EXPIRED:
+            raise asyncio.TimeoutError("agent job expired before a worker picked it up")
+        if row["status"] == AgentJob.DONE:
+            return row["result"]
+        if row["status"] == AgentJob.FAILED:
+            raise RuntimeError(f"Agent worker failed: {row['error']}")
+
+        left = deadline - time.monotonic()
+        if left <= 0:
+            await AgentJob.objects.filter(pk=job.pk, status=AgentJob.PENDING).aupdate(
+                status=AgentJob.EXPIRED, finished_at=timezone.now()
+            )
+            raise asyncio.TimeoutError(f"no agent result within {timeout:g}s")
+        await asyncio.sleep(min(delay, left))
+        delay = min(delay * 2, CHATBOT_JOB_POLL_INTERVAL)
+
+
+# ============================================
+# Worker side
+# ============================================
+
+def claim_next_job(worker: str, batch: int = 5):
+    """Atomically move the oldest pending job to running for this worker; None when the queue is empty."""
+    now = timezone.now()
+    # Nobody is waiting for these any more
+    AgentJob.objects.filter(status=AgentJob.PENDING, expires_at__lt=now).update(
+        status=AgentJob.EXPIRED, finished_at=now
+    )
+    candidates = AgentJob.objects.filter(status=AgentJob.PENDING).order_by("created_at").values_list("pk", flat=True)
+    for pk in candidates[:batch]:
+        # Only one worker's UPDATE can match status=pending
+        if AgentJob.objects.filter(pk=pk, status=AgentJob.PENDING).update(
+            status=AgentJob.RUNNING, worker=worker, started_at=now
+        ):
+            return AgentJob.objects.get(pk=pk)
+    return None
+
+
+def process_job(job: AgentJob) -> AgentJob:
+    """Run the agent for a claimed job as the job's user + session, within the time its caller has left."""
+    from .agents import arun_career_agent
+
+    remaining = (job.expires_at - timezone.now()).total_seconds()
+    try:
+        with user_context(job.user_id), session_context(job.session_id), deadline_context(max(remaining, 0)), \
+                stage_timings() as timings:
+            # Async entry point: tool calls from one agent turn run in parallel
+            result = asyncio.run(arun_career_agent(job.query))
+        job.result = serialize_result(result)
+        job.result["stage_timings"] = timings.as_dict()  # Merged into the web request's chat history row
+        job.status = AgentJob.DONE
+    except Exception as e:
+        print(f"❌ Agent job {job.pk} failed: {e}")
+        job.status, job.error = AgentJob.FAILED, str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+    return job
+
+
+def purge_finished_jobs(older_than: float = CHATBOT_JOB_RETENTION) -> int:
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    deleted, _ = AgentJob.objects.filter(status__in=FINISHED, created_at__lt=cutoff).delete()
+    return deleted
+
+
+def recover_abandoned_jobs(worker: str) -> int:
+    """Fail jobs a previous process with this worker name left running (it died mid-run)."""
+    return AgentJob.objects.filter(status=AgentJob.RUNNING, worker=worker).update(
+        status=AgentJob.FAILED, error="agent worker restarted", finished_at=timezone.now()
+    )
+
+
+def work_forever(worker: str, stop, poll_interval: float = CHATBOT_WORKER_POLL_INTERVAL,
+                 purge_every: float = 60):
+    """Agent worker loop: claim → run → store, until `stop` (a threading.Event) is set."""
+    from . import agents  # noqa: F401  Load the agent stack before taking jobs
+
+    recover_abandoned_jobs(worker)
+    next_purge = time.monotonic() + purge_every
+    print(f"👷 Agent worker {worker} ready")
+    while not stop.is_set():
+        close_old_connections()  # Long-lived process: drop connections past CONN_MAX_AGE / broken ones
+        try:
+            job = claim_next_job(worker)
+            if job is None:
+                if time.monotonic() >= next_purge:
+                    purge_finished_jobs()
+                    next_purge = time.monotonic() + purge_every
+                stop.wait(poll_interval)
+                continue
+            started = time.perf_counter()
+            process_job(job)
+            print(f"✅ Agent job {job.pk} {job.status} in {time.perf_counter() - started:.2f}s ({worker})")
+        except Exception as e:  # Database hiccup: back off, never let the worker die
+            print(f"⚠️ Agent worker {worker} error: {e}")
+            stop.wait(max(poll_interval, 1))
+    print(f"👋 Agent worker {worker} stopped")
+
+
+def stats() -> dict:
+    """Queue depth per status and the age of the oldest pending job."""
+    counts = {status: 0 for status, _ in AgentJob.STATUS_CHOICES}
+    for row in AgentJob.objects.order_by().values("status").annotate(n=Count("pk")):
+        counts[row["status"]] = row["n"]
+    oldest = AgentJob.objects.filter(status=AgentJob.PENDING).order_by("created_at").values_list(
+        "created_at", flat=True
+    ).first()
+    return {
+        "mode": CHATBOT_AGENT_MODE,
+        "jobs": counts,
+        "oldest_pending_age_s": round((timezone.now() - oldest).total_seconds(), 2) if oldest else None,
+    }
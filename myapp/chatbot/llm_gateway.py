@@ -0,0 +1,585 @@
+"""
+LLM gateway
+One client layer for every chat model the chatbot uses (Cypher generation,
+graph answers, course QA, the agent), instead of separately configured
+ChatOpenAI instances with default timeouts and retries:
+- shared keep-alive HTTP connection pools (one sync pool; one async pool per
+  event loop, since async views under WSGI and queue jobs each run on a new loop)
+- a per-call deadline per role (LLM_TIMEOUT, or LLM_TIMEOUT_<ROLE>), capped
+  at the request's remaining budget (context.py) and counted from when the
+  call starts running; calls are not started with less than LLM_MIN_BUDGET
+  seconds left
+- optional hedging: a second identical request is sent when the first is
+  slower than the role's recent LLM_HEDGE_PERCENTILE latency; first answer wins
+- a circuit breaker per role: after LLM_BREAKER_FAILURES consecutive failures
+  calls fail fast with CircuitOpenError for LLM_BREAKER_RESET seconds, so
+  callers can serve a degraded answer instead of holding a worker
+- LLM_BACKEND=fake swaps the upstream for FakeChatModel (offline tests and
+  the offline profile, where it is the default; see offline.py)
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Sequence, Union
+
+import httpx
+from dotenv import load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict, PrivateAttr
+
+from .context import DeadlineExceeded, clamp_timeout, record_stage, remaining_time
+from .offline import CHATBOT_OFFLINE, FAKE_REPLIES
+
+# Load LLM settings before reading them below
+load_dotenv()
+
+# Gateway configuration (tunable from the environment)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "fake" if CHATBOT_OFFLINE else "openai").lower()  # "openai" or "fake"
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0"))              # Simulated seconds per fake call
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))                       # Per-call deadline (seconds)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))                  # SDK retries within the deadline
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))     # Don't hedge on a cold window
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "16"))                         # Threads for sync deadline/hedge calls
+LLM_MIN_BUDGET = float(os.getenv("LLM_MIN_BUDGET", "1.5"))                # Request budget needed to start a call
+
+# Shown to the user when the LLM is unavailable and no cheaper answer exists
+DEGRADED_ANSWER = (
+    "The career assistant is temporarily overloaded, so I can't answer that right now. "
+    "Please try again in a minute."
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """The role's circuit breaker is open; the upstream was not called."""
+
+    def __init__(self, role: str, retry_in: float):
+        super().__init__(f"LLM circuit for '{role}' is open (retry in {retry_in:.0f}s)")
+        self.role = role
+        self.retry_in = retry_in
+
+
+class LLMTimeoutError(TimeoutError):
+    """The call did not finish within its deadline."""
+
+    def __init__(self, message: str = "", upstream: bool = True):
+        super().__init__(message)
+        self.upstream = upstream  # False: the queue or the request budget ran the clock out, not the upstream
+
+
+def role_timeout(role: str) -> float:
+    return float(os.getenv(f"LLM_TIMEOUT_{role.upper()}", LLM_TIMEOUT))
+
+
+# ============================================
+# Shared HTTP clients
+# ============================================
+_http_client = None
+_async_http_client = None
+_executor = None
+_clients_lock = threading.Lock()
+
+
+def _http_settings() -> dict:
+    return {
+        "timeout": httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Keep-alive connection pool shared by every sync LLM call."""
+    global _http_client
+    if _http_client is None:
+        with _clients_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(**_http_settings())
+    return _http_client
+
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport with one keep-alive pool per running event loop.
+    An AsyncOpenAI client holds a single httpx.AsyncClient for its lifetime,
+    but connections kept alive on a loop that has since closed fail with
+    "Event loop is closed"; pools are dropped with their loop.
+    """
+
+    def __init__(self, limits: httpx.Limits):
+        self._limits = limits
+        self._pools = weakref.WeakKeyDictionary()  # event loop → AsyncHTTPTransport
+        self._lock = threading.Lock()
+
+    def _pool(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                pool = self._pools[loop] = httpx.AsyncHTTPTransport(limits=self._limits)
+            return pool
+
+    def pool_count(self) -> int:
+        with self._lock:
+            return len(self._pools)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._pool().handle_async_request(request)
+
+    async def aclose(self):
+        await self._pool().aclose()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Async client shared by every async LLM call (keep-alive pool per event loop)."""
+    global _async_http_client
+    if _async_http_client is None:
+        with _clients_lock:
+            if _async_http_client is None:
+                settings = _http_settings()
+                _async_http_client = httpx.AsyncClient(timeout=settings["timeout"],
+                                                       transport=LoopLocalTransport(settings["limits"]))
+    return _async_http_client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _clients_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="llm")
+    return _executor
+
+
+# ============================================
+# Circuit breaker + latency stats (per role)
+# ============================================
+class CircuitBreaker:
+    """closed → (N consecutive failures) → open → (reset time) → half-open → one trial call."""
+
+    def __init__(self, role: str, failures: int = LLM_BREAKER_FAILURES, reset_after: float = LLM_BREAKER_RESET):
+        self.role = role
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream."""
+        with self._lock:
+            if self.state == "open":
+                retry_in = self.opened_at + self.reset_after - time.monotonic()
+                if retry_in > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.role, retry_in)
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._trial_running:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.role, self.reset_after)
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures, self._trial_running = "closed", 0, False
+
+    def release(self):
+        """End a call without a verdict (a half-open trial may be retried)."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    print(f"🔌 LLM circuit for '{self.role}' opened after {self.failures} failures")
+                self.state, self.opened_at = "open", time.monotonic()
+            self._trial_running = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class LatencyStats:
+    """Rolling latencies of successful calls, plus call/error/timeout/hedge counters."""
+
+    def __init__(self, window: int = 500):
+        self._samples = deque(maxlen=window)
+        self.calls = self.errors = self.timeouts = self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool, timed_out: bool = False):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self._samples.append(seconds)
+            else:
+                self.errors += 1
+                self.timeouts += timed_out
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if len(ordered) < max(1, min_samples):
+            return None
+        return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+    def snapshot(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        }
+
+
+_breakers = {}
+_stats = {}
+_registry_lock = threading.Lock()
+
+
+def breaker_for(role: str) -> CircuitBreaker:
+    with _registry_lock:
+        return _breakers.setdefault(role, CircuitBreaker(role))
+
+
+def stats_for(role: str) -> LatencyStats:
+    with _registry_lock:
+        return _stats.setdefault(role, LatencyStats())
+
+
+def reset_breakers():
+    """Forget breaker + latency state (tests, manual recovery)."""
+    with _registry_lock:
+        _breakers.clear()
+        _stats.clear()
+
+
+def stats() -> dict:
+    """Per-role breaker state and latency metrics."""
+    with _registry_lock:
+        roles = sorted(set(_breakers) | set(_stats))
+    return {
+        "backend": LLM_BACKEND,
+        "timeout_s": LLM_TIMEOUT,
+        "hedging": LLM_HEDGE,
+        "roles": {
+            role: {**stats_for(role).snapshot(), "circuit": breaker_for(role).snapshot()}
+            for role in roles
+        },
+    }
+
+
+# ============================================
+# Chat models
+# ============================================
+class GatewayChatModel(BaseChatModel):
+    """
+    Wraps a chat model (ChatOpenAI or FakeChatModel) with the gateway policies.
+    Bound kwargs (functions=, tools=) are forwarded to the wrapped model.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    inner: BaseChatModel
+    role: str = "default"
+    timeout: float = LLM_TIMEOUT
+    hedge: bool = LLM_HEDGE
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.inner._llm_type}"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"role": self.role, **self.inner._identifying_params}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _hedge_delay(self, timeout: float) -> Optional[float]:
+        if not self.hedge:
+            return None
+        delay = stats_for(self.role).percentile(LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES)
+        return delay if delay is not None and delay < timeout else None
+
+    def _start(self) -> float:
+        """
+        Timeout for this call: the role timeout capped at the request's remaining
+        budget. Fails fast (LLMTimeoutError) when too little budget is left.
+        """
+        try:
+            timeout = clamp_timeout(self.timeout, LLM_MIN_BUDGET)
+        except DeadlineExceeded as e:
+            raise LLMTimeoutError(f"LLM call for '{self.role}' skipped: {e}") from e
+        breaker_for(self.role).before_call()
+        return timeout
+
+    def _finish(self, started: float, error: Optional[BaseException], timeout: float):
+        """Record the outcome in the role's latency stats + breaker."""
+        timed_out = isinstance(error, LLMTimeoutError)
+        elapsed = time.perf_counter() - started
+        stats_for(self.role).record(elapsed, error is None, timed_out)
+        record_stage(f"llm.{self.role}", elapsed)
+        breaker = breaker_for(self.role)
+        if error is None:
+            breaker.record_success()
+        elif timed_out and (not error.upstream or timeout < self.timeout):
+            # Cut short by the request budget or the worker queue, not evidence that the upstream is down
+            breaker.release()
+        else:
+            breaker.record_failure()
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        timeout = self._start()
+        started, error = time.perf_counter(), None
+        # Callbacks are handled by this model's run, so the wrapped model runs without them
+        call = lambda: self.inner._generate(messages, stop=stop, **kwargs)
+        try:
+            return self._call_sync(call, timeout)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(started, error, timeout)
+
+    def _call_sync(self, call: Callable[[], ChatResult], timeout: float) -> ChatResult:
+        """
+        Run on the LLM pool with a deadline (and a hedged duplicate when slow).
+        The deadline starts when a worker picks the call up: waiting behind other
+        roles' calls in the shared pool is bounded by the same timeout, but a call
+        that never started does not count against this role's breaker.
+        """
+        pool = _get_executor()
+        running = threading.Event()
+
+        def attempt():
+            running.set()
+            return call()
+
+        submit = lambda: pool.submit(contextvars.copy_context().run, attempt)
+        futures = [submit()]
+        if not running.wait(timeout) and futures[0].cancel():
+            raise LLMTimeoutError(f"No LLM worker free for '{self.role}' within {timeout:.2f}s", upstream=False)
+
+        budget = remaining_time()  # Queue wait may have used part of the request budget
+        limit = timeout if budget is None else max(0.0, min(timeout, budget))
+        deadline = time.monotonic() + limit
+
+        hedge_after = self._hedge_delay(limit)
+        if hedge_after is not None and not wait(futures, timeout=hedge_after).done:
+            stats_for(self.role).record_hedge()
+            futures.append(submit())
+
+        last_error = None
+        while futures:
+            done, pending = wait(futures, timeout=max(0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()  # A slower duplicate is left to finish and be discarded
+                last_error = future.exception()
+            futures = list(pending)
+        if last_error is not None and not futures:
+            raise last_error
+        raise LLMTimeoutError(f"LLM call for '{self.role}' exceeded {limit:.2f}s", upstream=limit >= timeout)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        timeout = self._start()
+        started, error = time.perf_counter(), None
+        call = lambda: self.inner._agenerate(messages, stop=stop, **kwargs)
+        try:
+            return await self._call_async(call, timeout)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(started, error, timeout)
+
+    async def _call_async(self, call, timeout: float) -> ChatResult:
+        deadline = time.monotonic() + timeout
+        tasks = [asyncio.ensure_future(call())]
+        try:
+            hedge_after = self._hedge_delay(timeout)
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    stats_for(self.role).record_hedge()
+                    tasks.append(asyncio.ensure_future(call()))
+
+            last_error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0, deadline - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+            if last_error is not None and not pending:
+                raise last_error
+            raise LLMTimeoutError(f"LLM call for '{self.role}' exceeded {timeout:.2f}s")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # Streams can't be hedged; the deadline is checked between chunks
+        timeout = self._start()
+        started, error = time.perf_counter(), None
+        deadline = time.monotonic() + timeout
+        try:
+            for chunk in self.inner._stream(messages, stop=stop, **kwargs):
+                if time.monotonic() > deadline:
+                    raise LLMTimeoutError(f"LLM stream for '{self.role}' exceeded {timeout:.2f}s")
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(started, error, timeout)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        timeout = self._start()
+        started, error = time.perf_counter(), None
+        deadline = time.monotonic() + timeout
+        stream = self.inner._astream(messages, stop=stop, **kwargs).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), max(0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise LLMTimeoutError(f"LLM stream for '{self.role}' exceeded {timeout:.2f}s")
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(started, error, timeout)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Local stand-in backend: canned or computed replies with optional latency and
+    failures, so timeouts, hedging and the breaker can be exercised offline.
+    respond() may return an AIMessage instead of text, e.g. one with tool_calls.
+    """
+
+    responses: List[str] = ["This is an offline response from the fake LLM backend."]
+    respond: Optional[Callable[[List[BaseMessage]], Union[str, AIMessage]]] = None  # Overrides responses
+    latency: float = 0.0
+    error: Optional[Exception] = None
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        self._calls += 1
+        if self.error is not None:
+            raise self.error
+        if self.respond is not None:
+            reply = self.respond(messages)
+        else:
+            reply = self.responses[(self._calls - 1) % len(self.responses)]
+        return reply if isinstance(reply, AIMessage) else AIMessage(content=reply)
+
+    @staticmethod
+    def _chunks(reply: AIMessage) -> Iterator[ChatGenerationChunk]:
+        """Text word by word; tool calls arrive whole in one chunk."""
+        if reply.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=reply.content, tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(reply.tool_calls)
+            ]))
+            return
+        words = reply.content.split(" ")
+        for i, word in enumerate(words):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == len(words) - 1 else word + " "))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        yield from self._chunks(self._reply(messages))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(self._reply(messages)):
+            yield chunk
+
+
+def get_chat_model(role: str, model: str = None, tags: List[str] = None,
+                   backend: str = None, **kwargs: Any) -> GatewayChatModel:
+    """
+    Chat model for a role ("cypher", "graph_answer", "course", "agent", ...)
+    on the configured backend, wrapped with the gateway policies.
+    """
+    timeout = role_timeout(role)
+    if (backend or LLM_BACKEND) == "fake":
+        inner = FakeChatModel(respond=FAKE_REPLIES.get(role), latency=LLM_FAKE_LATENCY)
+    else:
+        from langchain_openai import ChatOpenAI
+        inner = ChatOpenAI(
+            model=model,
+            temperature=kwargs.pop("temperature", 0),
+            timeout=timeout,
+            max_retries=LLM_MAX_RETRIES,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            **kwargs,
+        )
+    return GatewayChatModel(inner=inner, role=role, timeout=timeout, tags=tags)
@@ -0,0 +1,417 @@
+"""
+Cypher subset over the in-memory career graph
+Runs the read queries the chatbot sends to Neo4j (the patterns of the Cypher
+generation prompt, RELATED_JOBS_QUERY, the graph version stamp) against
+LocalCareerGraph, so the graph stages can be exercised without a Neo4j server.
+
+Supported:
+    [MATCH (a:Job {name: 'x' | $param})[-[r:RELATED_TO]->(b:Job {...})]]   (or <-[...]-)
+    WHERE <comparison> [AND <comparison> ...]
+        =, <>, <, <=, >, >=, CONTAINS, STARTS WITH, ENDS WITH, IS [NOT] NULL
+    RETURN [DISTINCT] <expression> [AS alias], ...
+        properties, literals, $params, + - *, toLower/toUpper/toString/toInteger/toFloat/round
+    ORDER BY <expression | alias> [ASC | DESC], ...
+    LIMIT <n | $param>
+
+Anything else (OR, OPTIONAL MATCH, aggregation, writes, ...) raises
+UnsupportedCypher.
+
+LocalGraphStore wraps it as a LangChain GraphStore, the drop-in for
+Neo4jGraph in GraphCypherQAChain used by the offline profile (offline.py).
+"""
+import re
+from typing import Any, Dict, List
+
+from langchain_community.graphs.graph_store import GraphStore
+
+from .local_graph import get_local_graph
+
+# Schema text in the format Neo4jGraph.refresh_schema() gives the Cypher prompt
+GRAPH_SCHEMA = """Node properties:
+Job {name: STRING, median_comp: FLOAT, median_workexp: FLOAT, top_language: STRING, top_database: STRING, top_platform: STRING, top_webframe: STRING}
+Relationship properties:
+RELATED_TO {weight: FLOAT}
+The relationships:
+(:Job)-[:RELATED_TO]->(:Job)"""
+
+# Same schema as Neo4jGraph.get_structured_schema (used by the chain's Cypher corrector)
+GRAPH_STRUCTURED_SCHEMA = {
+    "node_props": {"Job": [{"property": name, "type": kind} for name, kind in (
+        ("name", "STRING"), ("median_comp", "FLOAT"), ("median_workexp", "FLOAT"), ("top_language", "STRING"),
+        ("top_database", "STRING"), ("top_platform", "STRING"), ("top_webframe", "STRING"))]},
+    "rel_props": {"RELATED_TO": [{"property": "weight", "type": "FLOAT"}]},
+    "relationships": [{"start": "Job", "type": "RELATED_TO", "end": "Job"}],
+    "metadata": {"constraint": [], "index": []},
+}
+
+_TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<param>\$\w+)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op><=|>=|<>|->|<-|[-()\[\]{}:,.<>=+*])
+)""", re.VERBOSE)
+
+_FUNCTIONS = {
+    "tolower": lambda v: v.lower() if isinstance(v, str) else None,
+    "toupper": lambda v: v.upper() if isinstance(v, str) else None,
+    "tostring": lambda v: None if v is None else str(v),
+    "tointeger": lambda v: None if v is None else int(float(v)),
+    "tofloat": lambda v: None if v is None else float(v),
+    "round": lambda v: None if v is None else round(v),
+}
+
+_COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "contains": lambda a, b: b in a,
+    "starts with": lambda a, b: a.startswith(b),
+    "ends with": lambda a, b: a.endswith(b),
+}
+
+
+class UnsupportedCypher(ValueError):
+    """The query uses Cypher outside the subset this module understands."""
+
+
+def _tokenize(query: str) -> list:
+    tokens, position = [], 0
+    query = query.strip().rstrip(";")
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        if not match or match.end() == position:
+            raise UnsupportedCypher(f"unexpected character at {position}: {query[position:position + 20]!r}")
+        kind = match.lastgroup
+        if kind is not None:
+            tokens.append((kind, match.group(kind), match.start(kind), match.end(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing a query dict (see run_local_cypher)."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = _tokenize(query)
+        self.index = 0
+
+    # --- token helpers ---
+    def peek(self, offset: int = 0):
+        index = self.index + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None, len(self.query), len(self.query))
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise UnsupportedCypher("unexpected end of query")
+        self.index += 1
+        return token
+
+    def at_keyword(self, *words) -> bool:
+        return all(self.peek(i)[0] == "name" and self.peek(i)[1].lower() == word for i, word in enumerate(words))
+
+    def keyword(self, *words) -> bool:
+        if self.at_keyword(*words):
+            self.index += len(words)
+            return True
+        return False
+
+    def expect_keyword(self, *words):
+        if not self.keyword(*words):
+            raise UnsupportedCypher(f"expected {' '.join(words).upper()} near {self.peek()[1]!r}")
+
+    def at_op(self, op: str) -> bool:
+        return self.peek()[0] == "op" and self.peek()[1] == op
+
+    def expect_op(self, op: str):
+        if not self.at_op(op):
+            raise UnsupportedCypher(f"expected {op!r} near {self.peek()[1]!r}")
+        self.index += 1
+
+    def name(self) -> str:
+        kind, value, _, _ = self.next()
+        if kind != "name":
+            raise UnsupportedCypher(f"expected a name, got {value!r}")
+        return value
+
+    # --- grammar ---
+    def parse(self) -> dict:
+        query = {"pattern": None, "where": [], "distinct": False, "order": [], "limit": None}
+        if not self.at_keyword("return"):  # A bare RETURN (e.g. the health probe's RETURN 1) has no pattern
+            self.expect_keyword("match")
+            query["pattern"] = self.pattern()
+            if self.keyword("where"):
+                query["where"] = self.conditions()
+        self.expect_keyword("return")
+        query["distinct"] = self.keyword("distinct")
+        query["columns"] = self.columns()
+        if self.keyword("order", "by"):
+            query["order"] = self.order_items()
+        if self.keyword("limit"):
+            query["limit"] = self.term()
+        if self.peek()[0] is not None:
+            raise UnsupportedCypher(f"unsupported clause near {self.peek()[1]!r}")
+        return query
+
+    def pattern(self) -> dict:
+        pattern = {"left": self.node(), "rel": None}
+        if self.at_op("-") or self.at_op("<-"):
+            incoming = self.next()[1] == "<-"
+            self.expect_op("[")
+            variable = self.name() if self.peek()[0] == "name" else None
+            self.expect_op(":")
+            rel_type = self.name()
+            self.expect_op("]")
+            self.expect_op("-" if incoming else "->")
+            if rel_type != "RELATED_TO":
+                raise UnsupportedCypher(f"unknown relationship type {rel_type}")
+            pattern["rel"] = {"variable": variable, "incoming": incoming}
+            pattern["right"] = self.node()
+        if self.at_op(","):
+            raise UnsupportedCypher("multiple MATCH patterns are not supported")
+        return pattern
+
+    def node(self) -> dict:
+        self.expect_op("(")
+        node = {"variable": None, "label": None, "props": {}}
+        if self.peek()[0] == "name":
+            node["variable"] = self.name()
+        if self.at_op(":"):
+            self.index += 1
+            node["label"] = self.name()
+        if self.at_op("{"):
+            self.index += 1
+            while not self.at_op("}"):
+                key = self.name()
+                self.expect_op(":")
+                node["props"][key] = self.term()
+                if self.at_op(","):
+                    self.index += 1
+            self.index += 1
+        self.expect_op(")")
+        return node
+
+    def conditions(self) -> list:
+        conditions = [self.comparison()]
+        while self.keyword("and"):
+            conditions.append(self.comparison())
+        if self.at_keyword("or") or self.at_keyword("xor"):
+            raise UnsupportedCypher("OR conditions are not supported")
+        return conditions
+
+    def comparison(self) -> tuple:
+        left = self.expression()
+        if self.keyword("is", "not", "null"):
+            return ("not_null", left)
+        if self.keyword("is", "null"):
+            return ("null", left)
+        for words in (("contains",), ("starts", "with"), ("ends", "with")):
+            if self.keyword(*words):
+                return ("compare", " ".join(words), left, self.expression())
+        kind, value, _, _ = self.next()
+        if kind != "op" or value not in _COMPARISONS:
+            raise UnsupportedCypher(f"unsupported operator {value!r}")
+        return ("compare", value, left, self.expression())
+
+    def expression(self) -> tuple:
+        expression = self.term()
+        while self.at_op("+") or self.at_op("-") or self.at_op("*"):
+            op = self.next()[1]
+            expression = ("arith", op, expression, self.term())
+        return expression
+
+    def term(self) -> tuple:
+        kind, value, _, _ = self.next()
+        if kind == "string":
+            return ("literal", re.sub(r"\\(.)", r"\1", value[1:-1]))
+        if kind == "number":
+            return ("literal", float(value) if "." in value else int(value))
+        if kind == "param":
+            return ("param", value[1:])
+        if kind == "op" and value == "-":
+            return ("arith", "-", ("literal", 0), self.term())
+        if kind == "op" and value == "(":
+            expression = self.expression()
+            self.expect_op(")")
+            return expression
+        if kind != "name":
+            raise UnsupportedCypher(f"unexpected {value!r}")
+        if value.lower() in ("true", "false", "null"):
+            return ("literal", {"true": True, "false": False, "null": None}[value.lower()])
+        if self.at_op("("):
+            function = value.lower()
+            if function not in _FUNCTIONS:
+                raise UnsupportedCypher(f"unsupported function {value}()")
+            self.index += 1
+            argument = self.expression()
+            self.expect_op(")")
+            return ("call", function, argument)
+        if self.at_op("."):
+            self.index += 1
+            return ("property", value, self.name())
+        return ("variable", value)
+
+    def columns(self) -> list:
+        columns = []
+        while True:
+            start = self.peek()[2]
+            expression = self.expression()
+            end = self.tokens[self.index - 1][3]
+            alias = self.name() if self.keyword("as") else self.query[start:end].strip()
+            columns.append((alias, expression))
+            if not self.at_op(","):
+                return columns
+            self.index += 1
+
+    def order_items(self) -> list:
+        items = []
+        while True:
+            expression = self.expression()
+            descending = False
+            if self.keyword("desc") or self.keyword("descending"):
+                descending = True
+            else:
+                self.keyword("asc") or self.keyword("ascending")
+            items.append((expression, descending))
+            if not self.at_op(","):
+                return items
+            self.index += 1
+
+
+def _evaluate(expression: tuple, binding: dict, params: dict, row: dict = None):
+    kind = expression[0]
+    if kind == "literal":
+        return expression[1]
+    if kind == "param":
+        if expression[1] not in params:
+            raise UnsupportedCypher(f"missing parameter ${expression[1]}")
+        return params[expression[1]]
+    if kind == "property":
+        value = binding.get(expression[1])
+        if value is None and expression[1] not in binding:
+            raise UnsupportedCypher(f"unknown variable {expression[1]}")
+        return value.get(expression[2]) if value else None
+    if kind == "variable":
+        if row is not None and expression[1] in row:
+            return row[expression[1]]  # ORDER BY may name a RETURN alias
+        raise UnsupportedCypher(f"returning whole nodes ({expression[1]}) is not supported")
+    if kind == "call":
+        return _FUNCTIONS[expression[1]](_evaluate(expression[2], binding, params, row))
+    if kind == "arith":
+        left = _evaluate(expression[2], binding, params, row)
+        right = _evaluate(expression[3], binding, params, row)
+        if left is None or right is None:
+            return None
+        if expression[1] == "+":
+            return left + right
+        return left - right if expression[1] == "-" else left * right
+    raise UnsupportedCypher(f"unsupported expression {kind}")
+
+
+def _holds(condition: tuple, binding: dict, params: dict) -> bool:
+    if condition[0] in ("null", "not_null"):
+        is_null = _evaluate(condition[1], binding, params) is None
+        return is_null if condition[0] == "null" else not is_null
+    _, op, left, right = condition
+    left, right = _evaluate(left, binding, params), _evaluate(right, binding, params)
+    if left is None or right is None:
+        return False
+    try:
+        return _COMPARISONS[op](left, right)
+    except TypeError:
+        return False  # e.g. a string compared with a number: no match, as in Neo4j
+
+
+def _node_matches(node: dict, job: dict, params: dict) -> bool:
+    return all(job.get(key) == _evaluate(value, {}, params) for key, value in node["props"].items())
+
+
+def _bindings(pattern: dict, graph, params: dict):
+    """Every variable binding of the MATCH pattern."""
+    if pattern is None:
+        yield {}
+        return
+    left = pattern["left"]
+    if any(node["label"] not in (None, "Job") for node in (left, pattern.get("right") or left)):
+        return  # Only :Job nodes (the GraphMeta version stamp is not part of the local graph)
+    if pattern["rel"] is None:
+        for job in graph.jobs.values():
+            if _node_matches(left, job, params):
+                yield {left["variable"]: job}
+        return
+
+    right, rel = pattern["right"], pattern["rel"]
+    source, target = (right, left) if rel["incoming"] else (left, right)
+    for job in graph.jobs.values():
+        if not _node_matches(source, job, params):
+            continue
+        for weight, other in graph.edges.get(job["name"], []):
+            related = graph.jobs[other]
+            if _node_matches(target, related, params):
+                yield {source["variable"]: job, target["variable"]: related, rel["variable"]: {"weight": weight}}
+
+
+def _sort_key(value):
+    # Neo4j orders nulls last in ascending order; numbers and strings never compare here
+    return (value is None, isinstance(value, str), value if value is not None else 0)
+
+
+def run_local_cypher(query: str, params: dict = None, graph=None) -> List[dict]:
+    """Run a read query against the in-memory career graph; rows are dicts keyed by RETURN alias."""
+    params = params or {}
+    graph = graph or get_local_graph()
+    parsed = _Parser(query).parse()
+
+    matches = []
+    for binding in _bindings(parsed["pattern"], graph, params):
+        if all(_holds(condition, binding, params) for condition in parsed["where"]):
+            row = {alias: _evaluate(expression, binding, params) for alias, expression in parsed["columns"]}
+            matches.append((row, binding))
+
+    if parsed["distinct"]:
+        seen, unique = set(), []
+        for row, binding in matches:
+            key = tuple(repr(value) for value in row.values())
+            if key not in seen:
+                seen.add(key)
+                unique.append((row, binding))
+        matches = unique
+
+    # Stable sorts from the last key to the first give a multi-key ORDER BY
+    for expression, descending in reversed(parsed["order"]):
+        matches.sort(key=lambda match: _sort_key(_evaluate(expression, match[1], params, match[0])),
+                     reverse=descending)
+
+    rows = [row for row, _ in matches]
+    if parsed["limit"] is not None:
+        rows = rows[:int(_evaluate(parsed["limit"], {}, params))]
+    return rows
+
+
+class LocalGraphStore(GraphStore):
+    """Read-only GraphStore over the in-memory career graph (Neo4jGraph's query/schema interface)."""
+
+    schema = GRAPH_SCHEMA
+    structured_schema = GRAPH_STRUCTURED_SCHEMA
+
+    @property
+    def get_schema(self) -> str:
+        return GRAPH_SCHEMA
+
+    @property
+    def get_structured_schema(self) -> Dict[str, Any]:
+        return GRAPH_STRUCTURED_SCHEMA
+
+    def query(self, query: str, params: dict = {}) -> List[Dict[str, Any]]:
+        return run_local_cypher(query, params)
+
+    def refresh_schema(self) -> None:
+        pass  # The schema is fixed by the CSV loader
+
+    def add_graph_documents(self, graph_documents, include_source: bool = False) -> None:
+        raise UnsupportedCypher("the local career graph is read-only")
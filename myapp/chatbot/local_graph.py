@@ -0,0 +1,130 @@
+"""
+In-memory career graph
+The Neo4j career graph is built from data/processed_devtype_skills_salaries_exp.csv
+by data/careers.py. This module builds the same jobs and RELATED_TO weights in
+memory (no pandas / networkx needed), so the chatbot can still answer job
+property and related-job questions when Neo4j is slow or there is no request
+budget left for a round-trip.
+
+Rows use the same aliases as the Cypher queries they stand in for.
+"""
+import csv
+import threading
+from typing import Dict, List
+
+from .data_version import on_graph_version_change
+from .skill_matcher import SKILLS_CSV_PATH, SKILL_CSV_COLUMNS, split_skills
+
+# CSV column → Job node property (see store_graph_in_neo4j in data/careers.py)
+JOB_PROPERTIES = {
+    "Top_LanguageHaveWorkedWith": "top_language",
+    "Top_DatabaseHaveWorkedWith": "top_database",
+    "Top_PlatformHaveWorkedWith": "top_platform",
+    "Top_WebframeHaveWorkedWith": "top_webframe",
+    "MedianComp": "median_comp",
+    "MedianWorkExp": "median_workexp",
+}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0
+    return len(a & b) / len(a | b)
+
+
+class LocalCareerGraph:
+    """Job nodes + weighted RELATED_TO edges (lower weight = better transition)."""
+
+    def __init__(self, csv_path: str = SKILLS_CSV_PATH):
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+
+        self.jobs = {}
+        skills = {}
+        for row in rows:
+            job = {"name": row["DevType"]}
+            for column, prop in JOB_PROPERTIES.items():
+                job[prop] = float(row[column]) if prop.startswith("median") else row[column]
+            self.jobs[job["name"]] = job
+            skills[job["name"]] = {s for column in SKILL_CSV_COLUMNS for s in split_skills(row[column])}
+
+        self.edges = self._build_edges(list(self.jobs.values()), skills)
+
+    @staticmethod
+    def _build_edges(jobs: List[dict], skills: Dict[str, set]) -> Dict[str, List[tuple]]:
+        """Same weights as compute_weight in data/careers.py: salary + skill overlap + experience."""
+        pairs = [(a, b) for a in jobs for b in jobs if a is not b]
+        salary_diffs = [a["median_comp"] - b["median_comp"] for a, b in pairs]
+        exp_diffs = [a["median_workexp"] - b["median_workexp"] for a, b in pairs]
+        salary_min, salary_max = min(salary_diffs, default=0), max(salary_diffs, default=1)
+        exp_min, exp_max = min(exp_diffs, default=0), max(exp_diffs, default=1)
+
+        edges = {job["name"]: [] for job in jobs}
+        for a, b in pairs:
+            salary = (b["median_comp"] - a["median_comp"] - salary_min) / ((salary_max - salary_min) or 1)
+            skill = 1 - _jaccard(skills[a["name"]], skills[b["name"]])
+            exp_diff = max(0, b["median_workexp"] - a["median_workexp"])
+            experience = (exp_diff - exp_min) / ((exp_max - exp_min) or 1)
+            edges[a["name"]].append((salary + skill + experience, b["name"]))
+        for targets in edges.values():
+            targets.sort()
+        return edges
+
+    def job_rows(self, names: List[str]) -> List[dict]:
+        """Properties of the named jobs (aliases of the CareerGraph "technologies" example)."""
+        rows = []
+        for name in names:
+            job = self.jobs.get(name)
+            if job:
+                rows.append({
+                    "job_title": job["name"],
+                    "language": job["top_language"],
+                    "database": job["top_database"],
+                    "platform": job["top_platform"],
+                    "framework": job["top_webframe"],
+                    "median_salary": job["median_comp"],
+                    "work_experience": job["median_workexp"],
+                })
+        return rows
+
+    def related_jobs(self, name: str, limit: int = 3) -> List[dict]:
+        """Top related jobs by weight (same rows as RELATED_JOBS_QUERY in personalized.py)."""
+        rows = []
+        for weight, other in self.edges.get(name, [])[:limit]:
+            job = self.jobs[other]
+            rows.append({
+                "job_name": job["name"],
+                "language": job["top_language"],
+                "database": job["top_database"],
+                "platform": job["top_platform"],
+                "framework": job["top_webframe"],
+                "salary": job["median_comp"],
+                "experience": job["median_workexp"],
+                "similarity": weight,
+            })
+        return rows
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_local_graph() -> LocalCareerGraph:
+    """Return the shared in-memory graph (built on first use, rebuilt after a graph reload)."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = LocalCareerGraph()
+                print(f"🗺️ Local career graph built ({len(_graph.jobs)} jobs)")
+    return _graph
+
+
+def invalidate_local_graph():
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+# Neo4j is reloaded from the same CSV, so a new graph version means the CSV changed too
+on_graph_version_change(invalidate_local_graph)
@@ -0,0 +1,253 @@
+"""
+Local course index
+A memory-mapped copy of the PGVector course collection, so course retrieval
+doesn't need a Supabase round-trip for a catalogue that fits in memory.
+
+Layout of COURSE_INDEX_DIR:
+    manifest.json                  {"version", "count", "dim", "collection", "created_at"}
+    versions/<version>/vectors.npy     float32, L2-normalised, one row per course
+    versions/<version>/documents.json  [{"id", "page_content", "metadata"}, ...]
+
+publish_index() writes a new version directory, then swaps manifest.json
+atomically. Readers re-check the manifest every COURSE_INDEX_CHECK_INTERVAL
+seconds and switch to the new version (bumping the course data version so
+course caches are invalidated). The management command build_course_index
+exports the PGVector collection into this format. Nothing in the Airflow
+pipeline publishes it (it runs in its own container, without access to this
+directory), so the command has to be scheduled on the web host after the
+course collection is reloaded; see the README.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from .offline import CHATBOT_OFFLINE, OFFLINE_INDEX_DIR
+
+COURSE_INDEX_DIR = os.getenv(
+    "COURSE_INDEX_DIR", os.path.join(os.path.dirname(__file__), "data", "course_index")
+)
+COURSE_INDEX_CHECK_INTERVAL = float(os.getenv("COURSE_INDEX_CHECK_INTERVAL", "30"))
+COURSE_INDEX_KEEP_VERSIONS = int(os.getenv("COURSE_INDEX_KEEP_VERSIONS", "2"))
+
+MANIFEST = "manifest.json"
+
+
+def _normalise(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic embeddings without a model download: words and character
+    trigrams hashed into `dim` signed buckets, L2-normalised. Far weaker than
+    all-MiniLM-L6-v2, but stable across runs (benchmarks, offline checks).
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str):
+        for word in re.findall(r"\w+", text.lower()):
+            yield word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            bucket = zlib.crc32(feature.encode("utf-8"))
+            vector[bucket % self.dim] += weight if bucket & 0x80000000 else -weight
+        return _normalise(vector)[0].tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def publish_index(documents: List[Document], vectors, index_dir: str = COURSE_INDEX_DIR,
+                  version: str = None, collection: str = "course_embeddings") -> dict:
+    """Write documents + their embeddings as a new index version and make it current."""
+    if len(documents) != len(vectors):
+        raise ValueError(f"{len(documents)} documents but {len(vectors)} vectors")
+    version = version or time.strftime("%Y%m%d%H%M%S")
+    version_dir = os.path.join(index_dir, "versions", version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    matrix = _normalise(vectors)
+    np.save(os.path.join(version_dir, "vectors.npy"), matrix)
+    with open(os.path.join(version_dir, "documents.json"), "w", encoding="utf-8") as f:
+        json.dump([
+            {"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}
+            for doc in documents
+        ], f)
+
+    manifest = {
+        "version": version,
+        "count": len(documents),
+        "dim": int(matrix.shape[1]) if len(documents) else 0,
+        "collection": collection,
+        "created_at": time.time(),
+    }
+    # Write-then-rename so readers never see a half-written manifest
+    tmp_path = os.path.join(index_dir, MANIFEST + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(index_dir, MANIFEST))
+
+    _prune_versions(index_dir, keep=version)
+    return manifest
+
+
+def _read_manifest(index_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(index_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _written_at(version_dir: str) -> float:
+    """When a version was (last) published: its documents file's mtime (labels are free-form, so not sortable)."""
+    for path in (os.path.join(version_dir, "documents.json"), version_dir):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            continue
+    return 0.0
+
+
+def _prune_versions(index_dir: str, keep: str, keep_count: int = COURSE_INDEX_KEEP_VERSIONS):
+    """
+    Delete the oldest version directories (readers may still map the previous one,
+    so keep a few). `keep` and the manifest's current version are never deleted.
+    """
+    versions_dir = os.path.join(index_dir, "versions")
+    protected = {keep, (_read_manifest(index_dir) or {}).get("version")}
+    versions = sorted((v for v in os.listdir(versions_dir) if v not in protected),
+                      key=lambda v: _written_at(os.path.join(versions_dir, v)))
+    for old in versions[:max(0, len(versions) - (keep_count - 1))]:
+        shutil.rmtree(os.path.join(versions_dir, old), ignore_errors=True)
+
+
+class LocalCourseIndex:
+    """Reader for the current index version (memory-mapped vectors + in-memory metadata)."""
+
+    def __init__(self, index_dir: str = COURSE_INDEX_DIR, check_interval: float = COURSE_INDEX_CHECK_INTERVAL):
+        self.index_dir = index_dir
+        self.check_interval = check_interval
+        self.version = None
+        self._vectors = None
+        self._documents = []
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _read_manifest(self) -> Optional[dict]:
+        return _read_manifest(self.index_dir)
+
+    def _load(self, manifest: dict):
+        version_dir = os.path.join(self.index_dir, "versions", manifest["version"])
+        vectors = np.load(os.path.join(version_dir, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(version_dir, "documents.json"), encoding="utf-8") as f:
+            documents = json.load(f)
+        previous = self.version
+        self._vectors, self._documents, self.version = vectors, documents, manifest["version"]
+        print(f"📦 Local course index loaded: version {self.version}, {len(documents)} courses")
+        if previous is not None:
+            # New catalogue → memoised course links and cached answers are stale
+            from .data_version import bump_course_version
+            bump_course_version()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Switch to a newly published version if there is one; returns True when an index is loaded."""
+        now = time.monotonic()
+        if not force and self.version is not None and now - self._checked_at < self.check_interval:
+            return True
+        with self._lock:
+            self._checked_at = now
+            manifest = self._read_manifest()
+            if manifest and manifest.get("version") != self.version:
+                try:
+                    self._load(manifest)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️ Could not load course index version {manifest.get('version')}: {e}")
+        return self.version is not None
+
+    @property
+    def available(self) -> bool:
+        return self.refresh()
+
+    def search(self, query_vector, k: int = 5) -> List[Tuple[Document, float]]:
+        """Top-k documents by cosine similarity."""
+        if not self.refresh() or not self._documents:
+            return []
+        vectors, documents = self._vectors, self._documents  # Consistent snapshot during a reload
+        scores = vectors @ _normalise(query_vector)[0]
+        k = min(k, len(documents))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(id=documents[i]["id"], page_content=documents[i]["page_content"],
+                      metadata=documents[i]["metadata"]), float(scores[i]))
+            for i in top
+        ]
+
+    def status(self) -> dict:
+        manifest = self._read_manifest() or {}
+        return {
+            "loaded_version": self.version,
+            "published_version": manifest.get("version"),
+            "count": len(self._documents),
+            "index_dir": self.index_dir,
+        }
+
+
+class LocalCourseRetriever(BaseRetriever):
+    """Course retriever served from LocalCourseIndex, falling back to another retriever (PGVector)."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: LocalCourseIndex
+    embeddings: Embeddings
+    k: int = 5
+    fallback: Optional[BaseRetriever] = None
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if self.index.available:
+            try:
+                return [doc for doc, _ in self.index.search(self.embeddings.embed_query(query), self.k)]
+            except Exception as e:
+                print(f"⚠️ Local course index failed, using fallback: {e}")
+        if self.fallback is not None:
+            return self.fallback.invoke(query, config={"callbacks": run_manager.get_child()})
+        return []
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_course_index() -> LocalCourseIndex:
+    """Shared reader for COURSE_INDEX_DIR (OFFLINE_INDEX_DIR in the offline profile, see offline.py)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LocalCourseIndex(index_dir=OFFLINE_INDEX_DIR if CHATBOT_OFFLINE else COURSE_INDEX_DIR)
+    return _index
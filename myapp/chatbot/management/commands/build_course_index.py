@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from langchain_core.documents import Document
+from sqlalchemy import create_engine, text
+import json
+import os
+
+from chatbot.local_index import COURSE_INDEX_DIR, publish_index
+
+# langchain_postgres tables (the collection row + one row per embedded course)
+EXPORT_QUERY = text("""
+    SELECT e.id, e.document, e.cmetadata, e.embedding::text AS embedding
+    FROM langchain_pg_embedding e
+    JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+    WHERE c.name = :collection
+    ORDER BY e.id
+""")
+
+
+class Command(BaseCommand):
+    help = ('Export the PGVector course collection into the local memory-mapped course index. '
+            'Schedule it (e.g. cron) after the course collection is reloaded: the pipeline does not publish it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--collection', default='course_embeddings', help='PGVector collection name')
+        parser.add_argument('--index-dir', default=COURSE_INDEX_DIR, help='Where to publish the index')
+        parser.add_argument('--label', default=None, help='Version label (defaults to a timestamp)')
+
+    def handle(self, *args, **options):
+        connection = os.getenv('SUPABASE_POOLER_URL')
+        if not connection:
+            self.stderr.write('SUPABASE_POOLER_URL is not set.')
+            return
+
+        try:
+            engine = create_engine(connection)
+            with engine.connect() as conn:
+                rows = conn.execute(EXPORT_QUERY, {'collection': options['collection']}).fetchall()
+        except Exception as e:
+            self.stderr.write(f'Failed to export from PGVector: {e}')
+            return
+
+        if not rows:
+            self.stdout.write(f'No documents found in collection "{options["collection"]}".')
+            return
+
+        documents, vectors = [], []
+        for row in rows:
+            # Same Document shape PGVector returns (course_url etc. live in the metadata)
+            documents.append(Document(id=str(row.id), page_content=row.document, metadata=row.cmetadata or {}))
+            vectors.append(json.loads(row.embedding))
+
+        manifest = publish_index(documents, vectors, index_dir=options['index_dir'],
+                                 version=options['label'], collection=options['collection'])
+        self.stdout.write(
+            f'Published course index version {manifest["version"]} '
+            f'({manifest["count"]} courses, {manifest["dim"]} dims) to {options["index_dir"]}'
+        )
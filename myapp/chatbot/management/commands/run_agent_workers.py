@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+# Same name as job_queue.AGENT_WORKER_ENV (job_queue imports models, so it can't load before django.setup())
+AGENT_WORKER_ENV = 'CHATBOT_AGENT_WORKER'
+
+
+def _worker_main(name, poll_interval):
+    """Entry point of one agent worker process (spawned, so it sets Django up itself)."""
+    import django
+    os.environ[AGENT_WORKER_ENV] = '1'
+    django.setup()
+
+    from chatbot.job_queue import work_forever
+
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    work_forever(name, stop, poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    help = 'Run the pool of agent worker processes that answer queued chatbot questions (CHATBOT_AGENT_MODE=queue).'
+
+    def add_arguments(self, parser):
+        from chatbot.job_queue import CHATBOT_AGENT_WORKERS, CHATBOT_WORKER_POLL_INTERVAL
+        parser.add_argument('--workers', type=int, default=CHATBOT_AGENT_WORKERS, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=CHATBOT_WORKER_POLL_INTERVAL,
+                            help='Seconds an idle worker waits before polling the queue again')
+
+    def handle(self, *args, **options):
+        from chatbot.job_queue import AGENT_QUEUE
+        if not AGENT_QUEUE:
+            self.stderr.write('CHATBOT_AGENT_MODE is not "queue": web workers will not enqueue any jobs.')
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        host = socket.gethostname()
+        names = [f'{host}:{slot}' for slot in range(options['workers'])]
+        processes = {}
+        stopping = False
+
+        def start(name):
+            process = context.Process(target=_worker_main, args=(name, options['poll_interval']),
+                                      name=f'agent-worker-{name}', daemon=False)
+            process.start()
+            processes[name] = process
+
+        def shutdown(*_):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        for name in names:
+            start(name)
+        self.stdout.write(f'Started {len(names)} agent workers (pid {os.getpid()})')
+
+        # Supervise: restart workers that died until asked to stop
+        while not stopping:
+            time.sleep(1)
+            for name, process in list(processes.items()):
+                if not process.is_alive() and not stopping:
+                    self.stderr.write(f'Agent worker {name} exited ({process.exitcode}), restarting')
+                    start(name)
+
+        self.stdout.write('Stopping agent workers...')
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+        self.stdout.write('Agent workers stopped.')
@@ -0,0 +1,104 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+import csv
+import json
+
+from chatbot.offline import (
+    CHATBOT_OFFLINE,
+    course_text,
+    ensure_course_index,
+    get_offline_embeddings,
+    load_offline_courses,
+)
+from chatbot.skill_matcher import SKILLS_CSV_PATH, split_skills
+
+# The skill graph page reads tables Django doesn't manage (created by the data pipeline in Supabase)
+SKILLGRAPH_TABLES = [
+    """CREATE TABLE IF NOT EXISTS stackoverflow_jobs_2025 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, created_at DATETIME NOT NULL, job TEXT,
+        top_language TEXT, top_database TEXT, top_platform TEXT, top_framework TEXT,
+        work_exp REAL, yearly_comp REAL)""",
+    """CREATE TABLE IF NOT EXISTS courses_with_embeddings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, course_id TEXT, title TEXT, provider TEXT, url TEXT,
+        price TEXT, duration TEXT, level TEXT, language TEXT, rating TEXT, reviews_count TEXT,
+        last_updated TEXT, keyword TEXT, description TEXT, what_you_will_learn TEXT, skills TEXT,
+        recommended_experience TEXT, embeddings TEXT)""",
+]
+
+
+class Command(BaseCommand):
+    help = 'Create the offline profile\'s SQLite data: schema, skill graph tables, demo user and course index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default='demo@example.com', help='Demo user login (username = email)')
+        parser.add_argument('--password', default='offline-demo', help='Demo user password')
+        parser.add_argument('--job-title', default='Data scientist', help='Demo profile job title')
+        parser.add_argument('--skills', default='Python, SQL, Pandas', help='Demo profile skills (comma-separated)')
+
+    def handle(self, *args, **options):
+        if not CHATBOT_OFFLINE or connection.vendor != 'sqlite':
+            self.stderr.write('Run with CHATBOT_OFFLINE=1: this command writes demo data into the SQLite database.')
+            return
+
+        call_command('migrate', interactive=False, verbosity=0)
+        jobs, courses = self._seed_skillgraph()
+        self._seed_demo_user(options)
+        manifest = ensure_course_index(force=True)
+        self.stdout.write(
+            f'Seeded {jobs} jobs, {courses} courses (index version {manifest["version"]}) '
+            f'and demo user {options["email"]}'
+        )
+
+    def _seed_skillgraph(self):
+        """Fill the skill graph tables from the career CSV and the offline course catalogue."""
+        with open(SKILLS_CSV_PATH, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        documents = load_offline_courses()
+        vectors = get_offline_embeddings().embed_documents(
+            [course_text(doc.metadata, doc.page_content) for doc in documents]
+        )
+
+        now = timezone.now().isoformat()
+        with connection.cursor() as cursor:
+            for statement in SKILLGRAPH_TABLES:
+                cursor.execute(statement)
+            cursor.execute('DELETE FROM stackoverflow_jobs_2025')
+            cursor.execute('DELETE FROM courses_with_embeddings')
+            cursor.executemany(
+                'INSERT INTO stackoverflow_jobs_2025 (created_at, job, top_language, top_database, top_platform, '
+                'top_framework, work_exp, yearly_comp) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)',
+                [(now, row['DevType'],
+                  json.dumps(split_skills(row['Top_LanguageHaveWorkedWith'])),
+                  json.dumps(split_skills(row['Top_DatabaseHaveWorkedWith'])),
+                  json.dumps(split_skills(row['Top_PlatformHaveWorkedWith'])),
+                  json.dumps(split_skills(row['Top_WebframeHaveWorkedWith'])),
+                  float(row['MedianWorkExp']), float(row['MedianComp'])) for row in rows],
+            )
+            cursor.executemany(
+                'INSERT INTO courses_with_embeddings (course_id, title, provider, url, level, description, '
+                'embeddings) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                [(doc.id, doc.metadata.get('title'), doc.metadata.get('provider'), doc.metadata.get('course_url'),
+                  doc.metadata.get('level'), doc.page_content, json.dumps(vector))
+                 for doc, vector in zip(documents, vectors)],
+            )
+        return len(rows), len(documents)
+
+    def _seed_demo_user(self, options):
+        from accounts.models import Profile
+
+        email = options['email']
+        user = User.objects.filter(username=email).first()
+        if user is None:
+            user = User.objects.create_user(username=email, email=email, password=options['password'])
+        else:
+            user.set_password(options['password'])
+            user.save()
+        Profile.objects.update_or_create(user=user, defaults={
+            'job_title': options['job_title'],
+            'skills': [s.strip() for s in options['skills'].split(',') if s.strip()],
+            'median_salary': 6000,
+            'years_experience': 3,
+        })
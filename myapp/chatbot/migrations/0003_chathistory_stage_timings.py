@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chatbot", "0002_agentjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chathistory",
+            name="stage_timings",
+            field=models.JSONField(
+                blank=True,
+                help_text="Milliseconds per stage (route, neo4j, llm.<role>, tool.<name>, ...)",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chathistory",
+            name="timestamp",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+    ]
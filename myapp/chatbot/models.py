@@ -1,4 +1,92 @@
 """
 Django Models for Chatbot
-Optional: For storing chat history
+- ChatHistory: one row per answered query (written in batches by history.py)
+- AgentJob: queue of agent runs served by the agent worker pool (see job_queue.py)
 """
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class ChatHistory(models.Model):
+    """A chatbot answer with the tool(s) used and where the time went."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="User who made the query (null for anonymous)",
+    )
+    session_id = models.CharField(max_length=100, help_text="Session identifier")
+    query = models.TextField(help_text="User's query")
+    response = models.TextField(help_text="AI-generated response")
+    tool_used = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        help_text="Which tool was used (CareerGraph or CourseRecommendations)",
+    )
+    # Set when the request is answered, not when the batch is inserted
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
+    response_time = models.FloatField(null=True, blank=True, help_text="Response time in seconds")
+    stage_timings = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Milliseconds per stage (route, neo4j, llm.<role>, tool.<name>, ...)",
+    )
+
+    class Meta:
+        ordering = ["-timestamp"]
+        verbose_name = "Chat History"
+        verbose_name_plural = "Chat Histories"
+
+    def __str__(self):
+        return f"{self.session_id}: {self.query[:50]}"
+
+
+class AgentJob(models.Model):
+    """One question handed from a web worker to the agent worker pool."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    EXPIRED = "expired"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+        (EXPIRED, "Expired"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    query = models.TextField(help_text="User's query")
+    session_id = models.CharField(max_length=100, default="default", help_text="Session identifier")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="User who made the query (null for anonymous)",
+    )
+    result = models.JSONField(null=True, blank=True, help_text="Serialized agent result")
+    error = models.TextField(blank=True, default="")
+    worker = models.CharField(max_length=100, blank=True, default="", help_text="Worker that ran the job")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(help_text="Workers drop the job if it is still pending after this")
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "created_at"], name="chatbot_job_status_idx")]
+        verbose_name = "Agent Job"
+        verbose_name_plural = "Agent Jobs"
+
+    def __str__(self):
+        return f"{self.status}: {self.query[:50]}"
@@ -0,0 +1,194 @@
+"""
+Neo4j access for the chatbot request path
+Shared, pooled sync + async drivers for the direct graph queries (personalised
+recommendations, CareerGraph rows, health checks, graph version):
+- async queries run on the sync pool in a thread by default: under WSGI and in
+  queue jobs every async call gets a fresh event loop, and an async driver is
+  bound to the loop that opened it. Served over ASGI (myapp/asgi.py sets
+  NEO4J_ASYNC_DRIVER=1) each running loop gets its own async driver
+- parameterised Cypher only, so Neo4j can reuse cached plans
+- read transactions (retried on transient errors, never able to write)
+- per-query server-side timeouts, capped at the request's remaining budget
+  (DeadlineExceeded when less than NEO4J_MIN_BUDGET is left, so callers can
+  fall back to cached / in-memory graph data)
+- per-query latency metrics (p50/p95) for the staff metrics endpoint
+In the offline profile (offline.py) queries run on the in-memory career graph
+instead (local_cypher.py), with the same metrics.
+"""
+import asyncio
+import os
+import threading
+import weakref
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+from neo4j import AsyncGraphDatabase, GraphDatabase, unit_of_work
+from neo4j.exceptions import DriverError, Neo4jError
+
+from .context import DeadlineExceeded, clamp_timeout, record_stage
+from .local_cypher import run_local_cypher
+from .offline import CHATBOT_OFFLINE
+
+# Load Neo4j credentials before reading them below
+load_dotenv()
+
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None  # None → server default database
+
+# Pool + timeout configuration (tunable from the environment)
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "20"))
+NEO4J_ACQUIRE_TIMEOUT = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "5"))  # Seconds to wait for a pooled connection
+NEO4J_QUERY_TIMEOUT = float(os.getenv("NEO4J_QUERY_TIMEOUT", "10"))     # Default server-side transaction timeout
+NEO4J_RETRY_TIME = float(os.getenv("NEO4J_RETRY_TIME", "2"))            # Max time spent retrying transient errors
+NEO4J_METRICS_WINDOW = int(os.getenv("NEO4J_METRICS_WINDOW", "1000"))   # Latency samples kept per query
+NEO4J_MIN_BUDGET = float(os.getenv("NEO4J_MIN_BUDGET", "0.3"))          # Request budget needed to start a query
+NEO4J_ASYNC_DRIVER = os.getenv("NEO4J_ASYNC_DRIVER", "0").lower() in ("1", "true", "yes")  # Worth it on long-lived loops
+
+# What callers catch to fall back to the in-memory career graph (local_graph.py)
+GRAPH_UNAVAILABLE = (DeadlineExceeded, DriverError, Neo4jError)
+
+_driver = None
+_async_drivers = weakref.WeakKeyDictionary()  # event loop → async driver
+_driver_lock = threading.Lock()
+
+
+def _driver_config() -> dict:
+    return {
+        "auth": (NEO4J_USERNAME, NEO4J_PASSWORD),
+        "max_connection_pool_size": NEO4J_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_ACQUIRE_TIMEOUT,
+        "max_transaction_retry_time": NEO4J_RETRY_TIME,  # Driver default (30s) would dominate tail latency
+    }
+
+
+def get_driver():
+    """Return the shared sync driver (created on first use)."""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(NEO4J_URI, **_driver_config())
+    return _driver
+
+
+def get_async_driver():
+    """Return the running event loop's async driver (created on first use; dropped with the loop)."""
+    loop = asyncio.get_running_loop()
+    with _driver_lock:
+        driver = _async_drivers.get(loop)
+        if driver is None:
+            driver = _async_drivers[loop] = AsyncGraphDatabase.driver(NEO4J_URI, **_driver_config())
+    return driver
+
+
+class QueryMetrics:
+    """Rolling latency samples per named query."""
+
+    def __init__(self, window: int = NEO4J_METRICS_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, ok: bool):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            calls, errors = self._counts.get(name, (0, 0))
+            self._counts[name] = (calls + 1, errors + (not ok))
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        """Calls, errors and p50/p95 latency (ms) per query name."""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            name: {
+                "calls": counts[name][0],
+                "errors": counts[name][1],
+                "p50_ms": round(self._percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(self._percentile(ordered, 95) * 1000, 2),
+            }
+            for name, ordered in samples.items()
+        }
+
+
+metrics = QueryMetrics()
+
+
+def _transaction(cypher: str, params: dict, name: str, timeout: float):
+    """Build a read transaction function with a server-side timeout."""
+    @unit_of_work(timeout=timeout, metadata={"app": "chatbot", "query": name})
+    def work(tx):
+        return [record.data() for record in tx.run(cypher, params)]
+    return work
+
+
+def _async_transaction(cypher: str, params: dict, name: str, timeout: float):
+    @unit_of_work(timeout=timeout, metadata={"app": "chatbot", "query": name})
+    async def work(tx):
+        result = await tx.run(cypher, params)
+        return [record.data() async for record in result]
+    return work
+
+
+def read_query(cypher: str, params: dict = None, name: str = "adhoc", timeout: float = None) -> list:
+    """
+    Run a parameterised read query and return rows as dicts (like Neo4jGraph.query).
+    `name` labels the query in the latency metrics and Neo4j's query log.
+    """
+    timeout = clamp_timeout(timeout or NEO4J_QUERY_TIMEOUT, NEO4J_MIN_BUDGET)
+    work = _transaction(cypher, params or {}, name, timeout)
+    started = time.perf_counter()
+    ok = False
+    try:
+        if CHATBOT_OFFLINE:
+            rows = run_local_cypher(cypher, params)
+        else:
+            with get_driver().session(database=NEO4J_DATABASE) as session:
+                rows = session.execute_read(work)
+        ok = True
+        return rows
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.record(name, elapsed, ok)
+        record_stage("neo4j", elapsed)
+
+
+async def async_read_query(cypher: str, params: dict = None, name: str = "adhoc",
+                           timeout: float = None) -> list:
+    """Async version of read_query (the loop's async driver, or the sync pool in a thread)."""
+    if not NEO4J_ASYNC_DRIVER:
+        return await asyncio.to_thread(read_query, cypher, params, name, timeout)
+    timeout = clamp_timeout(timeout or NEO4J_QUERY_TIMEOUT, NEO4J_MIN_BUDGET)
+    work = _async_transaction(cypher, params or {}, name, timeout)
+    started = time.perf_counter()
+    ok = False
+    try:
+        if CHATBOT_OFFLINE:
+            rows = run_local_cypher(cypher, params)
+        else:
+            async with get_async_driver().session(database=NEO4J_DATABASE) as session:
+                rows = await session.execute_read(work)
+        ok = True
+        return rows
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.record(name, elapsed, ok)
+        record_stage("neo4j", elapsed)
+
+
+def stats() -> dict:
+    """Pool configuration + per-query latency metrics."""
+    return {
+        "pool_size": NEO4J_POOL_SIZE,
+        "query_timeout_s": NEO4J_QUERY_TIMEOUT,
+        "queries": metrics.snapshot(),
+    }
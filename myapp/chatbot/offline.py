@@ -0,0 +1,236 @@
+"""
+Offline profile (CHATBOT_OFFLINE=1)
+Swaps every external service for a local stand-in, so the whole webapp can be
+imported, served and profiled without Neo4j, Supabase or OpenAI credentials:
+- Neo4j → the in-memory career graph built from
+  data/processed_devtype_skills_salaries_exp.csv, queried through the Cypher
+  subset of local_cypher.py (neo4j_client and the chains' LocalGraphStore)
+- PGVector → LocalCourseIndex (NumPy, memory-mapped) over HashingEmbeddings,
+  seeded from OFFLINE_COURSES into its own OFFLINE_INDEX_DIR
+- Supabase users table → StubSupabaseClient (in-memory, per process)
+- OpenAI → FakeChatModel (LLM_BACKEND defaults to "fake") with
+  LLM_FAKE_LATENCY seconds per call; the Cypher model answers with the
+  nearest prompt example for the job / technology named in the question
+- Postgres → SQLite (settings.py); `manage.py seed_offline` creates the demo
+  user and the skill graph tables from the same CSV
+
+Usage:
+    CHATBOT_OFFLINE=1 python manage.py seed_offline
+    CHATBOT_OFFLINE=1 LLM_FAKE_LATENCY=0.5 python manage.py runserver
+"""
+import os
+import re
+import threading
+
+CHATBOT_OFFLINE = os.getenv("CHATBOT_OFFLINE", "0").lower() in ("1", "true", "yes")
+
+OFFLINE_COURSES = os.getenv(
+    "OFFLINE_COURSES", os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "courses.json")
+)
+OFFLINE_INDEX_DIR = os.getenv(
+    "OFFLINE_INDEX_DIR", os.path.join(os.path.dirname(__file__), "data", "offline_course_index")
+)
+
+_lock = threading.Lock()
+_embeddings = None
+
+
+def get_offline_embeddings():
+    """Shared HashingEmbeddings (deterministic, no model download)."""
+    global _embeddings
+    if _embeddings is None:
+        with _lock:
+            if _embeddings is None:
+                from .local_index import HashingEmbeddings
+                _embeddings = HashingEmbeddings()
+    return _embeddings
+
+
+def course_text(metadata: dict, page_content: str) -> str:
+    """What a seeded course is embedded from (title first, as PGVector documents start)."""
+    return f"{metadata.get('title', '')}. {page_content}"
+
+
+def load_offline_courses() -> list:
+    """The seed course catalogue as Documents."""
+    import json
+    from langchain_core.documents import Document
+
+    with open(OFFLINE_COURSES, encoding="utf-8") as f:
+        return [Document(**course) for course in json.load(f)]
+
+
+def ensure_course_index(force: bool = False) -> dict:
+    """Publish the seed catalogue into OFFLINE_INDEX_DIR unless a version is already there."""
+    from .local_index import LocalCourseIndex, publish_index
+
+    index = LocalCourseIndex(index_dir=OFFLINE_INDEX_DIR)
+    if index.available and not force:
+        return index.status()
+    documents = load_offline_courses()
+    vectors = get_offline_embeddings().embed_documents(
+        [course_text(doc.metadata, doc.page_content) for doc in documents]
+    )
+    manifest = publish_index(documents, vectors, index_dir=OFFLINE_INDEX_DIR, collection="offline_courses")
+    print(f"📦 Offline course index seeded: {manifest['count']} courses")
+    return manifest
+
+
+# ============================================
+# Fake LLM replies
+# ============================================
+_PROFILE_PATTERN = re.compile(r"<USER_PROFILE:([^|>]*)")
+_NAME_PATTERN = re.compile(r"\{name: '([^']*)'\}")
+_CONTAINS_PATTERN = re.compile(r"(\w+)\.top_\w+ CONTAINS '[^']*'")
+_TECHNOLOGY_FIELDS = ("top_language", "top_database", "top_platform", "top_webframe")
+
+
+def _user_query(messages) -> str:
+    text = messages[-1].content if messages else ""
+    return text.rsplit("User Query:", 1)[-1].strip()
+
+
+def _mentioned_job(question: str):
+    """Job title named in the question (profile tag first, then the longest known title)."""
+    from .local_graph import get_local_graph
+
+    profile = _PROFILE_PATTERN.search(question)
+    if profile:
+        return profile.group(1).strip()
+    lowered = question.lower()
+    names = sorted(get_local_graph().jobs, key=len, reverse=True)
+    return next((name for name in names if name.lower() in lowered), None)
+
+
+def _technology_filter(variable: str, question: str):
+    """CONTAINS filter for the first technology the question mentions, on the field that lists it."""
+    from .local_graph import get_local_graph
+    from .skill_matcher import get_skill_matcher
+
+    for technology in get_skill_matcher().mentions(question):
+        for field in _TECHNOLOGY_FIELDS:
+            if any(technology in (job.get(field) or "") for job in get_local_graph().jobs.values()):
+                return f"{variable}.{field} CONTAINS '{technology}'"
+    return None
+
+
+def fake_cypher(messages) -> str:
+    """
+    Cypher model stand-in: the prompt example closest to the question, with its
+    job name and first technology swapped for the ones the question mentions.
+    Always in the subset local_cypher.py runs, so the graph stages do real work offline.
+    """
+    from rapidfuzz import fuzz
+    from .cypher_prompt import CYPHER_EXAMPLES
+
+    question = _user_query(messages)
+    _, _, cypher = max(CYPHER_EXAMPLES, key=lambda example: fuzz.token_set_ratio(question, example[1]))
+    job = _mentioned_job(question)
+    if job:
+        cypher = _NAME_PATTERN.sub(lambda _: "{name: '" + job.replace("'", "\\'") + "'}", cypher, count=1)
+    contains = _CONTAINS_PATTERN.search(cypher)
+    replacement = contains and _technology_filter(contains.group(1), question)
+    if replacement:
+        cypher = cypher[:contains.start()] + replacement + cypher[contains.end():]
+    return cypher
+
+
+def fake_graph_answer(messages) -> str:
+    """Graph answer model stand-in: the query results the prompt carries, unformatted."""
+    text = messages[-1].content if messages else ""
+    results = text.split("=== QUERY RESULTS ===", 1)[-1].split("=== USER QUESTION ===", 1)[0].strip()
+    return f"Here are the results from the career graph:\n{results or '[]'}"
+
+
+# role → reply function (other roles get FakeChatModel's canned response)
+FAKE_REPLIES = {"cypher": fake_cypher, "graph_answer": fake_graph_answer}
+
+
+# ============================================
+# Supabase
+# ============================================
+class StubResponse:
+    """Shape of postgrest's APIResponse that callers read (.data, .count)."""
+
+    def __init__(self, data: list):
+        self.data = data
+        self.count = len(data)
+
+
+class _StubQuery:
+    def __init__(self, rows: list, lock: threading.Lock):
+        self._rows = rows
+        self._lock = lock
+        self._action = ("select", None, None)
+        self._filters = []
+
+    def select(self, *columns, **kwargs):
+        self._action = ("select", None, None)
+        return self
+
+    def insert(self, payload, **kwargs):
+        self._action = ("insert", payload, None)
+        return self
+
+    def upsert(self, payload, on_conflict: str = "id", **kwargs):
+        self._action = ("upsert", payload, on_conflict)
+        return self
+
+    def update(self, payload, **kwargs):
+        self._action = ("update", payload, None)
+        return self
+
+    def delete(self, **kwargs):
+        self._action = ("delete", None, None)
+        return self
+
+    def eq(self, column: str, value):
+        self._filters.append((column, value))
+        return self
+
+    def _matches(self, row: dict) -> bool:
+        return all(row.get(column) == value for column, value in self._filters)
+
+    def execute(self) -> StubResponse:
+        action, payload, key = self._action
+        payloads = payload if isinstance(payload, list) else [payload]
+        with self._lock:
+            if action == "select":
+                return StubResponse([dict(row) for row in self._rows if self._matches(row)])
+            if action == "insert":
+                self._rows.extend(dict(item) for item in payloads)
+                return StubResponse([dict(item) for item in payloads])
+            if action == "upsert":
+                written = []
+                for item in payloads:
+                    existing = next((row for row in self._rows if key in item and row.get(key) == item[key]), None)
+                    if existing is None:
+                        existing = {}
+                        self._rows.append(existing)
+                    existing.update(item)
+                    written.append(dict(existing))
+                return StubResponse(written)
+            matched = [row for row in self._rows if self._matches(row)]
+            if action == "update":
+                for row in matched:
+                    row.update(payload)
+            else:
+                self._rows[:] = [row for row in self._rows if not self._matches(row)]
+            return StubResponse([dict(row) for row in matched])
+
+
+class StubSupabaseClient:
+    """In-memory stand-in for supabase.Client: table(...).select/insert/upsert/update/delete/eq(...).execute()."""
+
+    _tables = {}
+    _tables_lock = threading.Lock()
+
+    def table(self, name: str) -> _StubQuery:
+        with self._tables_lock:
+            rows = self._tables.setdefault(name, [])
+        return _StubQuery(rows, self._tables_lock)
+
+    @classmethod
+    def reset(cls):
+        with cls._tables_lock:
+            cls._tables.clear()
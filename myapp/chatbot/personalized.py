@@ -0,0 +1,190 @@
+"""
+Personalised career recommendation pipeline (no LLM calls)
+profile → top-3 related jobs (Neo4j, in-memory graph as fallback) → missing
+skills + a course per skill → formatted answer.
+
+Shared by the PersonalizedCareerRecommendation agent tool and the direct
+recommendation endpoint (the chat UI's recommendation button). Results are
+cached per profile version: a hash of the profile's job title and skills plus
+the graph and course data versions, so editing the profile or reloading the
+data gives a fresh answer while repeated requests skip Neo4j and the course
+lookup entirely.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .data_version import course_data_version, graph_data_version
+from .local_graph import get_local_graph
+from .neo4j_client import GRAPH_UNAVAILABLE, async_read_query, read_query
+from .recommendation_helper import enrich_recommendations, format_recommendations
+from .session_memory import remember
+from .title_resolver import canonical_job_title
+
+# Cache limits (tunable from the environment)
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1000"))
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "3600"))
+
+# Top-3 related jobs (aligns with the skill graph recommendation method).
+# Parameterised so Neo4j reuses one cached plan for every job title.
+RELATED_JOBS_QUERY = """
+MATCH (current:Job {name: $job_name})-[r:RELATED_TO]->(related:Job)
+RETURN related.name AS job_name,
+       related.top_language AS language,
+       related.top_database AS database,
+       related.top_platform AS platform,
+       related.top_webframe AS framework,
+       related.median_comp AS salary,
+       related.median_workexp AS experience,
+       r.weight AS similarity
+ORDER BY r.weight ASC
+LIMIT 3
+"""
+
+
+def profile_problem(user_id, profile) -> str:
+    """Return the message to show when the profile can't be used (None if it's fine)."""
+    # Ensure user is logged in before accessing profile
+    if not user_id:
+        return "I need you to be logged in to generate personalized recommendations."
+    if not profile:
+        return "I couldn't find your profile. Please make sure you've filled out your job title and skills in your profile."
+    if not profile.get('job_title'):
+        return "Please add your current job title to your profile first."
+    return None
+
+
+def profile_version(profile: dict) -> str:
+    """Short hash of what a recommendation depends on (job title + skills)."""
+    data = json.dumps([profile.get("job_title"), sorted(profile.get("skills", []))])
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:12]
+
+
+class RecommendationCache:
+    """LRU + TTL cache: (user, profile version, graph version, course version) → recommendation."""
+
+    def __init__(self, max_size: int = RECOMMENDATION_CACHE_SIZE, ttl: float = RECOMMENDATION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry["created_at"] > self.ttl:
+                self._entries.pop(key, None)
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts["hits"] += 1
+            return entry["recommendation"]
+
+    def put(self, key, recommendation: dict):
+        with self._lock:
+            self._entries[key] = {"recommendation": recommendation, "created_at": time.monotonic()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._counts["hits"] + self._counts["misses"]
+            return {"entries": len(self._entries), "hit_rate": round(self._counts["hits"] / total, 3) if total else 0,
+                    **self._counts}
+
+
+recommendation_cache = RecommendationCache()
+
+
+def _vector_store():
+    """PGVector course index for skills without a curated course (None → search links)."""
+    try:
+        from .chains import supabase_vector_store
+    except Exception as e:
+        print(f"⚠️ Course index unavailable for recommendations: {e}")
+        return None
+    return supabase_vector_store
+
+
+def _cache_key(user_id, profile: dict) -> tuple:
+    return user_id, profile_version(profile), graph_data_version(), course_data_version()
+
+
+def _build(profile: dict, rows: list) -> dict:
+    """Enrich + format the related-job rows (same answer as the agent tool has always given)."""
+    user_job = canonical_job_title(profile.get("job_title"))
+    if not rows:
+        # Handle case where user job isn't in the graph
+        output = (f"I couldn't find any career recommendations for {user_job}. "
+                  "This might be because the job title isn't in our database.")
+        return {"user_job": user_job, "jobs": [], "output": output}
+
+    print(f"✅ Found {len(rows)} recommendations")
+    jobs = enrich_recommendations(rows, profile.get("skills", []), vector_store=_vector_store())
+    return {"user_job": user_job, "jobs": jobs, "output": format_recommendations(user_job, jobs)}
+
+
+def recommend(user_id, profile: dict) -> dict:
+    """
+    Recommendation for a usable profile (see profile_problem):
+    {"user_job", "jobs" (enriched rows), "output", "profile_version", "cached"}.
+    """
+    key = _cache_key(user_id, profile)
+    cached = recommendation_cache.get(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    # Older profiles may hold free-form titles; the graph only knows canonical ones
+    user_job = canonical_job_title(profile.get("job_title"))
+    print(f"👤 Generating recommendations for: {user_job}")
+    try:
+        rows = read_query(RELATED_JOBS_QUERY, {"job_name": user_job}, name="related_jobs")
+    except GRAPH_UNAVAILABLE as e:
+        print(f"⚠️ Neo4j unavailable, using the local career graph: {e}")
+        rows = get_local_graph().related_jobs(user_job)
+
+    recommendation = {**_build(profile, rows), "profile_version": key[1]}
+    recommendation_cache.put(key, recommendation)
+    return {**recommendation, "cached": False}
+
+
+async def arecommend(user_id, profile: dict) -> dict:
+    """Async version of recommend (graph query on the async driver, formatting off the event loop)."""
+    key = await asyncio.to_thread(_cache_key, user_id, profile)
+    cached = recommendation_cache.get(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    user_job = canonical_job_title(profile.get("job_title"))
+    print(f"👤 Generating recommendations for: {user_job}")
+    try:
+        rows = await async_read_query(RELATED_JOBS_QUERY, {"job_name": user_job}, name="related_jobs")
+    except GRAPH_UNAVAILABLE as e:
+        print(f"⚠️ Neo4j unavailable, using the local career graph: {e}")
+        rows = get_local_graph().related_jobs(user_job)
+
+    # Formatting may embed skills + query the course index
+    recommendation = {**await asyncio.to_thread(_build, profile, rows), "profile_version": key[1]}
+    recommendation_cache.put(key, recommendation)
+    return {**recommendation, "cached": False}
+
+
+def remember_recommendation(profile: dict, recommendation: dict) -> str:
+    """Keep the jobs for follow-ups in this session ("what courses for #2?"); returns the answer."""
+    remember(recommendation={
+        "job": recommendation["user_job"],
+        "skills": profile.get("skills", []),
+        "jobs": recommendation["jobs"],
+        "output": recommendation["output"],
+    })
+    return recommendation["output"]
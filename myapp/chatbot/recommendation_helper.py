@@ -3,11 +3,16 @@ Helper functions for personalized career recommendations
 Fetches user profile and generates recommendations with courses
 """
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
 from dotenv import load_dotenv
 from langchain_postgres.vectorstores import PGVector
 from langchain_community.embeddings import SentenceTransformerEmbeddings
 import psycopg2
+import sqlalchemy
 from accounts.models import Profile 
 
 # Load environment variables for any external dependencies
@@ -57,41 +62,49 @@ def fetch_user_profile(user_id: int) -> Optional[Dict[str, any]]:
         # Catch-all for any unexpected errors
         print(f"❌ Error fetching user profile: {e}")
         return None
+
+
+# Bounded pool for ORM calls made from async views. Each pool thread holds its
+# own DB connection, so the pool size caps the connections the chatbot opens.
+CHATBOT_DB_POOL_SIZE = int(os.getenv("CHATBOT_DB_POOL_SIZE", "4"))
+_db_executor = ThreadPoolExecutor(max_workers=CHATBOT_DB_POOL_SIZE, thread_name_prefix="chatbot-db")
+
+
+def _fetch_user_profile_in_pool(user_id: int) -> Optional[Dict[str, any]]:
+    try:
+        return fetch_user_profile(user_id)
+    finally:
+        # Pool threads outlive requests, so release stale connections ourselves
+        close_old_connections()
+
+
+async def fetch_user_profile_async(user_id: int) -> Optional[Dict[str, any]]:
+    """
+    Async version of fetch_user_profile for async views.
+    Runs the ORM lookup on the bounded chatbot DB pool instead of Django's single
+    thread-sensitive executor, so concurrent requests don't queue behind each other.
+    """
+    return await sync_to_async(
+        _fetch_user_profile_in_pool, thread_sensitive=False, executor=_db_executor
+    )(user_id)
     
 
 def find_missing_skills(user_skills: List[str], job_skills_dict: Dict[str, str]) -> List[str]:
     """
     Compare the user's skills with the skills required by a particular job
     to determine which skills the user is missing.
+    Known skills are compared by ID (aliases included); substring matching is
+    only used as a fallback for skills outside the vocabulary.
     """
-    # Normalize user's skills for easier comparison
-    user_skills_normalized = [skill.lower() for skill in user_skills]
-    
+    from .skill_matcher import get_skill_matcher, split_skills
+
     # Extract skills from all job skill categories (language, database, framework, etc.)
     all_job_skills = []
     for field, skills_str in job_skills_dict.items():
         if skills_str:
-            # Split comma-separated skills
-            skills_list = [s.strip() for s in skills_str.split(',')]
-            all_job_skills.extend(skills_list)
+            all_job_skills.extend(split_skills(skills_str))
     
-    # Identify skills the user does NOT have (case-insensitive)
-    missing = []
-    for job_skill in all_job_skills:
-        # Check using containment both ways for more flexible matching
-        if not any(user_skill in job_skill.lower() or job_skill.lower() in user_skill 
-                   for user_skill in user_skills_normalized):
-            missing.append(job_skill)
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    missing_unique = []
-    for skill in missing:
-        if skill.lower() not in seen:
-            seen.add(skill.lower())
-            missing_unique.append(skill)
-    
-    return missing_unique
+    return get_skill_matcher().missing(user_skills, all_job_skills, fallback=True)
 
 
 # Mapping of skills to external course URLs for skill-building recommendations
@@ -171,40 +184,219 @@ def find_course_for_skill(skill: str, vector_store: PGVector = None, max_results
         return SKILL_COURSE_MAPPING[skill_lower]
     
     # Fallback generic Coursera search URL if specific match not found
+    return _search_url_course(skill)
+
+# Distance (cosine by default) above which a retrieved course is not a match for a skill
+COURSE_MATCH_MAX_DISTANCE = float(os.getenv("COURSE_MATCH_MAX_DISTANCE", "0.6"))
+# Request budget (seconds) needed to run the batched course query; below it, search links are used
+COURSE_LOOKUP_MIN_BUDGET = float(os.getenv("COURSE_LOOKUP_MIN_BUDGET", "0.5"))
+
+# pgvector operator for each PGVector distance strategy
+_DISTANCE_OPERATORS = {"cosine": "<=>", "l2": "<->", "inner": "<#>"}
+
+# Memoised skill → course, valid for one course data version
+_course_memo = {"version": None, "courses": {}}
+_course_memo_lock = threading.Lock()
+
+
+def _search_url_course(skill: str) -> Dict[str, str]:
+    """Fallback generic Coursera search URL when no specific course is known."""
     return {
         "title": f"Learn {skill} - Search on Coursera",
         "url": f"https://www.coursera.org/search?query={skill.replace(' ', '%20')}"
     }
 
-def format_recommendation_output(
-    user_job: str,
+
+class CourseStore:
+    """
+    Nearest-course lookups on the course vector store.
+    PGVector: one LATERAL top-1 query for a whole batch of skill vectors (needs its
+    SQLAlchemy internals: EmbeddingStore, session_maker, get_collection).
+    Any other store, or a PGVector release without those attributes: the public
+    similarity search API, one call per vector.
+    """
+
+    _PGVECTOR_INTERNALS = ("EmbeddingStore", "session_maker", "get_collection")
+
+    def __init__(self, vector_store):
+        self.store = vector_store
+        self.batched = all(hasattr(vector_store, name) for name in self._PGVECTOR_INTERNALS)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.store.embeddings.embed_documents(texts)
+
+    def nearest(self, vectors: List[List[float]]) -> List[tuple]:
+        """(metadata, distance) of the closest course per vector; distance is None when unscored."""
+        if self.batched:
+            return self._nearest_batched(vectors)
+        return [self._nearest_one(vector) for vector in vectors]
+
+    def _nearest_one(self, vector) -> tuple:
+        if hasattr(self.store, "similarity_search_with_score_by_vector"):
+            hits = self.store.similarity_search_with_score_by_vector(vector, k=1)
+            return (hits[0][0].metadata, hits[0][1]) if hits else ({}, None)
+        docs = self.store.similarity_search_by_vector(vector, k=1)
+        return (docs[0].metadata, None) if docs else ({}, None)
+
+    def _nearest_batched(self, vectors) -> List[tuple]:
+        strategy = getattr(self.store, "_distance_strategy", "cosine")
+        operator = _DISTANCE_OPERATORS.get(getattr(strategy, "value", strategy), "<=>")
+        table = self.store.EmbeddingStore.__tablename__
+
+        sql = sqlalchemy.text(f"""
+            SELECT q.idx, best.cmetadata, best.distance
+            FROM unnest(CAST(:idx AS int[]), CAST(:vecs AS text[])) AS q(idx, vec)
+            CROSS JOIN LATERAL (
+                SELECT e.cmetadata, e.embedding {operator} CAST(q.vec AS vector) AS distance
+                FROM {table} e
+                WHERE e.collection_id = :collection_id
+                ORDER BY distance
+                LIMIT 1
+            ) AS best
+        """)
+
+        results = [({}, None)] * len(vectors)
+        with self.store.session_maker() as session:
+            collection = self.store.get_collection(session)
+            if not collection:
+                return results
+            rows = session.execute(sql, {
+                "idx": list(range(len(vectors))),
+                "vecs": ["[" + ",".join(str(x) for x in v) + "]" for v in vectors],  # pgvector text format
+                "collection_id": collection.uuid,
+            }).fetchall()
+        for idx, metadata, distance in rows:
+            results[idx] = (metadata or {}, distance)
+        return results
+
+
+def _nearest_courses(skills: List[str], vector_store) -> Dict[str, Dict[str, str]]:
+    """
+    Best course per skill from the course index: embeds all skills in one batch,
+    then looks up every skill vector at once (one SQL round trip on PGVector).
+    """
+    store = CourseStore(vector_store)
+    vectors = store.embed([f"Course to learn {s}" for s in skills])
+
+    courses = {}
+    for skill, (metadata, distance) in zip(skills, store.nearest(vectors)):
+        if (distance is None or distance <= COURSE_MATCH_MAX_DISTANCE) and metadata.get("course_url"):
+            courses[skill] = {"title": metadata.get("title", skill), "url": metadata["course_url"]}
+    return courses
+
+
+def find_courses_for_skills(skills: List[str], vector_store: PGVector = None) -> Dict[str, Dict[str, str]]:
+    """
+    Batched version of find_course_for_skill for a whole recommendation.
+    Returns {lowercased skill: {"title", "url"}}, resolving in this order:
+    1. Curated SKILL_COURSE_MAPPING
+    2. Memoised result for the current course data version
+    3. Nearest real course from the course index (one batched query for all misses)
+    4. Generic Coursera search URL (also used when the request budget is nearly spent)
+    """
+    from .context import has_budget
+    from .data_version import course_data_version
+
+    # Lowercased key → first spelling seen (used for display in fallback links)
+    originals = {}
+    for skill in skills:
+        if skill and skill.strip():
+            originals.setdefault(skill.lower().strip(), skill.strip())
+    unique = list(originals)
+    version = course_data_version()
+
+    with _course_memo_lock:
+        if _course_memo["version"] != version:
+            _course_memo["version"] = version
+            _course_memo["courses"] = {}
+        memo = _course_memo["courses"]
+        result = {s: SKILL_COURSE_MAPPING.get(s) or memo.get(s) for s in unique}
+
+    misses = [s for s, course in result.items() if course is None]
+    if misses and vector_store is not None and has_budget(COURSE_LOOKUP_MIN_BUDGET):
+        try:
+            found = _nearest_courses(misses, vector_store)
+            print(f"🔎 Course index: {len(found)}/{len(misses)} skills matched in one batch")
+            memoise = True
+        except Exception as e:
+            print(f"⚠️ Batched course lookup failed: {e}")
+            found, memoise = {}, False  # Retry on the next request instead of caching the fallback
+        for skill in misses:
+            result[skill] = found.get(skill) or _search_url_course(originals[skill])
+        if memoise:
+            with _course_memo_lock:
+                if _course_memo["version"] == version:
+                    _course_memo["courses"].update({s: result[s] for s in misses})
+    else:
+        for skill in misses:
+            result[skill] = _search_url_course(originals[skill])
+
+    return result
+
+
+def enrich_recommendations(
     recommendations: List[Dict],
     user_skills: List[str],
-    vector_store: PGVector = None  # Keep for compatibility but not used
-) -> str:
+    vector_store: PGVector = None  # Course index for skills without a curated course
+) -> List[Dict]:
     """
-    Format career recommendations and missing skills into a human-readable message.
+    Add to every related-job row the skills the user is missing (max 5) and a
+    course per missing skill: {..., "missing_skills": [...], "courses": {skill: {"title", "url"}}}.
+    """
+    # Work out missing skills for every job first, so courses are looked up in one batch
+    missing_by_job = []
+    for job_data in recommendations:
+        job_skills = {
+            'language': job_data.get('language', ''),
+            'database': job_data.get('database', ''),
+            'platform': job_data.get('platform', ''),
+            'framework': job_data.get('framework', '')
+        }
+        missing_by_job.append(find_missing_skills(user_skills, job_skills)[:5])  # Limit to 5 missing skills per job
+    
+    courses = find_courses_for_skills(
+        [skill for missing in missing_by_job for skill in missing], vector_store
+    )
+    
+    return [
+        {
+            **job_data,
+            'missing_skills': missing_skills,
+            'courses': {skill: courses.get(skill.lower().strip()) for skill in missing_skills},
+        }
+        for job_data, missing_skills in zip(recommendations, missing_by_job)
+    ]
+
+
+def _format_skill_courses(job_data: Dict) -> str:
+    """Markdown list of a job's missing skills with their courses."""
+    if not job_data['missing_skills']:
+        # User already meets the required skills
+        return "**Great news!** You already have all the key skills for this role.\n"
+    
+    output = "**Skills to learn:**\n"
+    for skill in job_data['missing_skills']:
+        course = job_data['courses'].get(skill)
+        if course:
+            output += f"- {skill}: [{course['title']}]({course['url']})\n"
+        else:
+            output += f"- {skill}: (No course found)\n"
+    return output
+
+
+def format_recommendations(user_job: str, enriched: List[Dict]) -> str:
+    """
+    Format career recommendations (see enrich_recommendations) into a human-readable message.
     """
     # Header describing the user’s role
     output = f"For your job as a **{user_job}**, here are the top 3 recommended career pathways:\n\n"
     
-    for i, job_data in enumerate(recommendations, 1):
+    for i, job_data in enumerate(enriched, 1):
         # Extract job information
         job_name = job_data.get('job_name', 'Unknown Job')
         salary = job_data.get('salary', 'N/A')
         experience = job_data.get('experience', 'N/A')
         
-        # Collect associated skills from the recommendation
-        job_skills = {
-            'language': job_data.get('language', ''),
-            'database': job_data.get('database', ''),
-            'platform': job_data.get('platform', ''),
-            'framework': job_data.get('framework', '')
-        }
-        
-        # Determine what skills the user is missing
-        missing_skills = find_missing_skills(user_skills, job_skills)
-        
         # Display job entry
         output += f"### {i}. {job_name}\n"
         # Format salary for numeric values
@@ -212,22 +404,27 @@ def format_recommendation_output(
         output += f"- **Experience**: {experience} years\n\n"
         
         # Include missing skills and recommended courses
-        if missing_skills:
-            output += "**Skills to learn:**\n"
-            
-            # For each missing skill, find a course
-            for skill in missing_skills[:5]:  # Limit to 5 missing skills per job
-                course = find_course_for_skill(skill)  
-                
-                if course:
-                    output += f"- {skill}: [{course['title']}]({course['url']})\n"
-                else:
-                    output += f"- {skill}: (No course found)\n"
-        else:
-            # User already meets the required skills
-            output += "**Great news!** You already have all the key skills for this role.\n"
+        output += _format_skill_courses(job_data)
         
         # Add spacing before next recommendation
         output += "\n"
     
-    return output
\ No newline at end of file
+    return output
+
+
+def format_job_courses(position: int, job_data: Dict) -> str:
+    """Courses for one remembered recommendation (follow-ups like "what courses for #2?")."""
+    job_name = job_data.get('job_name', 'Unknown Job')
+    return f"For recommendation #{position}, **{job_name}**:\n\n" + _format_skill_courses(job_data)
+
+
+def format_recommendation_output(
+    user_job: str,
+    recommendations: List[Dict],
+    user_skills: List[str],
+    vector_store: PGVector = None  # Course index for skills without a curated course
+) -> str:
+    """
+    Format career recommendations and missing skills into a human-readable message.
+    """
+    return format_recommendations(user_job, enrich_recommendations(recommendations, user_skills, vector_store))
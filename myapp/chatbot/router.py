@@ -0,0 +1,254 @@
+"""
+Local intent router for the Career RAG Agent
+Classifies a query into one of the agent's tools without an LLM call, using:
+1. The keyword rules from the agent's system prompt
+2. Job titles found by the title resolver
+3. Nearest-centroid matching on the query embedding
+Confident decisions are dispatched straight to the tool; everything else is
+delegated to the agent, including multi-part questions and course requests
+that name no tech topic (the agent declines non-tech subjects like cooking). Every decision is logged for offline evaluation.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from .title_resolver import get_title_resolver
+
+logger = logging.getLogger(__name__)
+
+# Router configuration (tunable from the environment)
+ROUTER_ENABLED = os.getenv("INTENT_ROUTER", "1").lower() in ("1", "true", "yes")
+ROUTER_CONFIDENCE = float(os.getenv("INTENT_ROUTER_CONFIDENCE", "0.75"))
+ROUTER_LOG_PATH = os.getenv("INTENT_ROUTER_LOG")  # Optional JSONL file of decisions
+
+PERSONALIZED = "PersonalizedCareerRecommendation"
+CAREER_GRAPH = "CareerGraph"
+COURSES = "CourseRecommendations"
+AGENT = "agent"  # Pseudo-route: let the LLM agent decide
+
+# --- Keyword rules (mirrors TOOL SELECTION RULES in the agent prompt) ---
+KEYWORD_RULES = {
+    PERSONALIZED: [
+        r"\bgenerate my\b",
+        r"\b(recommend|suggest)\w* (careers?|jobs?|roles?) for me\b",
+        r"\bcareer (paths?|suggestions?|recommendations?|navigation)\b.*\b(for me|my)\b",
+        r"\bmy (career|profile)\b",
+        r"\bbased on my\b",
+    ],
+    CAREER_GRAPH: [
+        r"\bjobs?\b",
+        r"\bsalar(y|ies)\b|\bpay\w*\b|\bcompensation\b",
+        r"\bskills?\b|\btech(nolog(y|ies))?\b|\btech stack\b|\btools?\b",
+        r"\b(years?|experience|entry-level|junior|senior)\b",
+        r"\b(similar|related|transitions?)\b",
+        r"\b(which|what) (roles?|careers?)\b",
+    ],
+    COURSES: [
+        r"\bcourses?\b",
+        r"\btutorials?\b|\bcertifications?\b|\bclass(es)?\b",
+        r"\blearn(ing)?\b|\bstudy\b|\bmaterials?\b",
+    ],
+}
+
+# Course requests are only dispatched when they name a tech topic, a skill or a job
+TECH_TOPIC_PATTERN = re.compile(
+    r"\b(programming|coding|software|computer|developers?|data|databases?|machine learning|ai|ml|"
+    r"cloud|devops|web|front-?end|back-?end|security|networking|algorithms?)\b",
+    re.IGNORECASE,
+)
+
+# --- Seed examples per tool used to build the embedding centroids ---
+# Taken from the agent prompt + tool descriptions (NOT from test_dataset.py,
+# which is reserved for offline evaluation of the router).
+CENTROID_EXAMPLES = {
+    PERSONALIZED: [
+        "Generate my career recommendation",
+        "What career paths for me",
+        "Recommend careers for me",
+        "Career suggestions based on my profile",
+        "Generate my career navigation recommendation",
+    ],
+    CAREER_GRAPH: [
+        "Which jobs use Python?",
+        "What skills does a data scientist need?",
+        "Jobs similar to backend developer",
+        "What is the salary of a DevOps engineer?",
+        "Which jobs pay more than a product manager?",
+        "Entry-level jobs with less than 2 years experience",
+    ],
+    COURSES: [
+        "Show me courses for Python",
+        "Recommend learning materials for machine learning",
+        "Tutorials to learn React",
+        "Certifications for cloud computing",
+        "Where can I study SQL online?",
+    ],
+}
+
+_compiled_rules = {
+    tool: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for tool, patterns in KEYWORD_RULES.items()
+}
+
+
+def keyword_scores(query: str) -> dict:
+    """Count keyword rule hits per tool."""
+    return {
+        tool: sum(1 for rule in rules if rule.search(query))
+        for tool, rules in _compiled_rules.items()
+    }
+
+
+def mentions_tech(query: str) -> bool:
+    """True if the query names a tech topic or a technology the skill matcher knows."""
+    from .skill_matcher import get_skill_matcher
+
+    return bool(TECH_TOPIC_PATTERN.search(query)) or bool(get_skill_matcher().mentions(query))
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class IntentRouter:
+    """Keyword + nearest-centroid classifier over the agent's tools."""
+
+    def __init__(self, embed_fn=None, embed_documents_fn=None, threshold=ROUTER_CONFIDENCE,
+                 log_path=ROUTER_LOG_PATH):
+        self.embed_fn = embed_fn  # Callable[[str], List[float]] or None (rules only)
+        self.threshold = threshold
+        self.log_path = log_path
+        self._log_lock = threading.Lock()
+        self.centroids = {}
+        if embed_fn is not None:
+            self._build_centroids(embed_documents_fn)
+
+    def _build_centroids(self, embed_documents_fn=None):
+        """Embed the seed examples once and average them into one centroid per tool."""
+        for tool, examples in CENTROID_EXAMPLES.items():
+            if embed_documents_fn is not None:
+                vectors = embed_documents_fn(examples)
+            else:
+                vectors = [self.embed_fn(example) for example in examples]
+            self.centroids[tool] = _unit(np.mean([_unit(v) for v in vectors], axis=0))
+
+    def centroid_scores(self, query: str) -> dict:
+        """Cosine similarity between the query embedding and each tool centroid."""
+        if not self.centroids:
+            return {}
+        try:
+            query_vector = _unit(self.embed_fn(query))
+        except Exception as e:
+            print(f"⚠️ Router embedding failed: {e}")
+            return {}
+        return {tool: float(centroid @ query_vector) for tool, centroid in self.centroids.items()}
+
+    def classify(self, query: str) -> dict:
+        """
+        Return a routing decision:
+            {"tool": <tool or "agent">, "confidence": float, "method": str,
+             "job_titles": [...], "keyword_scores": {...}, "centroid_scores": {...}}
+        """
+        started = time.perf_counter()
+        keywords = keyword_scores(query)
+        centroids = self.centroid_scores(query)
+        
+        # A job title mention ("backend dev", "data scientist") counts as a career graph hit
+        job_titles = [title for _, _, title in get_title_resolver().find_titles(query)]
+        if job_titles:
+            keywords[CAREER_GRAPH] += 1
+
+        # Keyword share: fraction of rule hits that point at each tool
+        total_hits = sum(keywords.values())
+        keyword_share = {t: (hits / total_hits if total_hits else 0.0) for t, hits in keywords.items()}
+
+        # Personal phrasing always wins the keyword vote (mirrors the prompt's rules)
+        if keywords[PERSONALIZED]:
+            keyword_share = {t: (1.0 if t == PERSONALIZED else 0.0) for t in keywords}
+
+        if centroids:
+            # Softmax over centroid similarities, then blend with the keyword vote
+            tools = list(centroids)
+            sims = np.array([centroids[t] for t in tools]) * 20.0  # Temperature
+            probs = np.exp(sims - sims.max())
+            probs = probs / probs.sum()
+            centroid_share = dict(zip(tools, probs.tolist()))
+            if total_hits:
+                blended = {t: 0.5 * keyword_share[t] + 0.5 * centroid_share[t] for t in tools}
+                method = "keywords+centroid"
+            else:
+                blended = centroid_share
+                method = "centroid"
+        else:
+            blended = keyword_share
+            method = "keywords"
+
+        best_tool = max(blended, key=blended.get)
+        confidence = blended[best_tool]
+
+        # Multi-part questions (e.g. jobs AND courses) always go to the agent
+        multi_intent = keywords[CAREER_GRAPH] >= 2 and keywords[COURSES] >= 1 and not keywords[PERSONALIZED]
+
+        # Course requests without a tech topic ("cooking classes") go to the agent, which declines them
+        off_topic = best_tool == COURSES and not job_titles and not mentions_tech(query)
+
+        dispatch = confidence >= self.threshold and not multi_intent and not off_topic
+        return {
+            "tool": best_tool if dispatch else AGENT,
+            "predicted_tool": best_tool,
+            "confidence": round(confidence, 4),
+            "method": method,
+            "multi_intent": multi_intent,
+            "off_topic": off_topic,
+            "job_titles": job_titles,
+            "keyword_scores": keywords,
+            "centroid_scores": {t: round(s, 4) for t, s in centroids.items()},
+            "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def log_decision(self, query: str, decision: dict):
+        """Log a decision (and append it to INTENT_ROUTER_LOG as JSONL if configured)."""
+        logger.info(
+            f"Router → {decision['tool']} (predicted {decision['predicted_tool']}, "
+            f"confidence {decision['confidence']:.2f}, {decision['method']})"
+        )
+        if not self.log_path:
+            return
+        record = dict(decision, question=query, timestamp=time.time())
+        try:
+            with self._log_lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write router log: {e}")
+
+    def route(self, query: str) -> dict:
+        """Classify + log in one call (used by the chatbot views)."""
+        decision = self.classify(query)
+        self.log_decision(query, decision)
+        return decision
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> IntentRouter:
+    """Return the shared router, built lazily with the embeddings from chains.py."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                from .chains import embeddings
+
+                if embeddings is not None:
+                    _router = IntentRouter(embeddings.embed_query, embeddings.embed_documents)
+                else:
+                    _router = IntentRouter()
+    return _router
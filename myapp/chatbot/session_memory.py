@@ -0,0 +1,155 @@
+"""
+Session working memory for follow-up questions
+Per (user, session_id) the chatbot keeps what the last personalised answer
+was built from: the profile snapshot (job title + skills) and the recommended
+jobs with their missing skills and courses. Follow-ups such as
+"what courses for #2?" or "what is the salary of the second one?" are then
+resolved against these results instead of re-fetching the profile and
+re-running the Neo4j recommendation query and course lookup.
+
+Entries expire after CHATBOT_SESSION_TTL seconds of inactivity; at most
+CHATBOT_SESSION_MAX sessions are kept (least recently used dropped first).
+Saving or deleting a Profile drops that user's entries in this process (the
+TTL bounds staleness in other processes, e.g. agent workers in queue mode).
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.db.models.signals import post_delete, post_save
+
+from .context import get_session_id, get_user_id
+
+# Memory limits (tunable from the environment)
+CHATBOT_SESSION_MEMORY = os.getenv("CHATBOT_SESSION_MEMORY", "1").lower() in ("1", "true", "yes")
+CHATBOT_SESSION_TTL = float(os.getenv("CHATBOT_SESSION_TTL", "1800"))
+CHATBOT_SESSION_MAX = int(os.getenv("CHATBOT_SESSION_MAX", "1000"))
+
+# "#2", "number 2", "option 2", "the second one", "the 3rd job", "the last one"
+_ORDINALS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3,
+             "fourth": 4, "4th": 4, "fifth": 5, "5th": 5, "last": -1}
+_REFERENCE_PATTERN = re.compile(
+    r"#\s*(?P<hash>\d+)"
+    r"|\b(?:number|no\.|option|path|pathway|job|role|career)\s+(?P<number>\d+)\b"
+    r"|\bthe\s+(?P<ordinal>" + "|".join(_ORDINALS) + r")\s+(?:one|job|role|path|pathway|option|career)\b",
+    re.IGNORECASE,
+)
+# Follow-ups answered straight from the remembered missing skills + courses
+_COURSE_FOLLOWUP_PATTERN = re.compile(r"\b(courses?|learn|learning|tutorials?|training|study|skills?)\b",
+                                      re.IGNORECASE)
+
+
+def find_reference(text: str, count: int):
+    """
+    Return (phrase, index) for the first reference to item 1..count of a
+    previous list ("#2" → index 1), or None.
+    """
+    for match in _REFERENCE_PATTERN.finditer(text):
+        if match.group("ordinal"):
+            position = _ORDINALS[match.group("ordinal").lower()]
+        else:
+            position = int(match.group("hash") or match.group("number"))
+        index = count - 1 if position == -1 else position - 1
+        if 0 <= index < count:
+            return match.group(0), index
+    return None
+
+
+def has_reference(text: str) -> bool:
+    """True if the question points at an item of an earlier answer (so it depends on the session)."""
+    return bool(_REFERENCE_PATTERN.search(text))
+
+
+def is_course_followup(text: str) -> bool:
+    return bool(_COURSE_FOLLOWUP_PATTERN.search(text))
+
+
+class SessionMemory:
+    """TTL + LRU bounded store: (user_id, session_id) → {field: value}."""
+
+    def __init__(self, ttl: float = CHATBOT_SESSION_TTL, max_sessions: int = CHATBOT_SESSION_MAX,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _key(user_id, session_id):
+        return user_id, session_id or "default"
+
+    def get(self, user_id, session_id, field: str):
+        """Remembered value of `field` for the session (None if unknown or expired)."""
+        key = self._key(user_id, session_id)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and self._clock() - entry["touched"] > self.ttl:
+                del self._sessions[key]
+                entry = None
+            if entry is None or field not in entry["data"]:
+                self._counts["misses"] += 1
+                return None
+            entry["touched"] = self._clock()
+            self._sessions.move_to_end(key)
+            self._counts["hits"] += 1
+            return entry["data"][field]
+
+    def update(self, user_id, session_id, **fields):
+        key = self._key(user_id, session_id)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None or self._clock() - entry["touched"] > self.ttl:
+                entry = self._sessions[key] = {"data": {}}
+            entry["data"].update(fields)
+            entry["touched"] = self._clock()
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def invalidate_user(self, user_id):
+        """Forget everything remembered for a user (all of their sessions)."""
+        with self._lock:
+            for key in [key for key in self._sessions if key[0] == user_id]:
+                del self._sessions[key]
+            self._counts["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "ttl_s": self.ttl, "max_sessions": self.max_sessions,
+                    **self._counts}
+
+
+# Shared per process
+session_memory = SessionMemory()
+
+
+def recall(field: str):
+    """Remembered value for the current request's user + session (see context.py)."""
+    if not CHATBOT_SESSION_MEMORY:
+        return None
+    return session_memory.get(get_user_id(), get_session_id(), field)
+
+
+def remember(**fields):
+    """Remember values for the current request's user + session."""
+    if CHATBOT_SESSION_MEMORY:
+        session_memory.update(get_user_id(), get_session_id(), **fields)
+
+
+def _on_profile_changed(sender, instance, **kwargs):
+    session_memory.invalidate_user(instance.user_id)
+
+
+# A profile edit changes the job title / skills every remembered recommendation was built from
+post_save.connect(_on_profile_changed, sender="accounts.Profile", dispatch_uid="chatbot_session_memory_profile_save")
+post_delete.connect(_on_profile_changed, sender="accounts.Profile",
+                    dispatch_uid="chatbot_session_memory_profile_delete")
@@ -0,0 +1,225 @@
+"""
+Indexed skill matcher
+Resolves free-text skills (profile skills, comma-separated Neo4j fields,
+skillgraph JSON columns) to canonical skill IDs, so missing skills are a set
+difference instead of pairwise substring checks.
+
+Vocabulary (built once per graph data version):
+- skills in the career graph CSV (data/processed_devtype_skills_salaries_exp.csv)
+- the authoritative SignupForm.SKILLS list
+- the curated SKILL_COURSE_MAPPING keys
+- SKILL_ALIASES below (abbreviations + spelling variants)
+
+Bidirectional substring matching is only used as an explicit fallback for
+tokens that are not in the vocabulary.
+"""
+import csv
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .data_version import on_graph_version_change
+
+SKILLS_CSV_PATH = os.path.join(os.path.dirname(__file__), "data", "processed_devtype_skills_salaries_exp.csv")
+SKILL_CSV_COLUMNS = (
+    "Top_LanguageHaveWorkedWith",
+    "Top_DatabaseHaveWorkedWith",
+    "Top_PlatformHaveWorkedWith",
+    "Top_WebframeHaveWorkedWith",
+)
+
+# Alias → canonical skill (both normalised); variants that mean the same technology
+SKILL_ALIASES = {
+    "aws": "amazon web services (aws)",
+    "amazon web services": "amazon web services (aws)",
+    "gcp": "google cloud",
+    "google cloud platform": "google cloud",
+    "azure": "microsoft azure",
+    "js": "javascript",
+    "ts": "typescript",
+    "golang": "go",
+    "postgres": "postgresql",
+    "mssql": "microsoft sql server",
+    "sql server": "microsoft sql server",
+    "mongo": "mongodb",
+    "reactjs": "react",
+    "react.js": "react",
+    "node": "node.js",
+    "nodejs": "node.js",
+    "vue": "vue.js",
+    "vuejs": "vue.js",
+    "nextjs": "next.js",
+    "nuxtjs": "nuxt.js",
+    "angularjs": "angular.js",
+    "express.js": "express",
+    "k8s": "kubernetes",
+    "cpp": "c++",
+    "c sharp": "c#",
+    "html": "html/css",
+    "css": "html/css",
+    "bash": "bash/shell (all shells)",
+    "shell": "bash/shell (all shells)",
+    "bash/shell": "bash/shell (all shells)",
+    "digital ocean": "digitalocean",
+    "couch db": "couchdb",
+    "linode, now akamai": "linode",
+    "ibm cloud or watson": "ibm cloud",
+    "oracle cloud infrastructure (oci)": "oracle cloud infrastructure",
+    "sklearn": "scikit-learn",
+}
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_skill(skill) -> str:
+    """Lowercase + collapse whitespace (the form used for vocabulary keys)."""
+    return _whitespace.sub(" ", str(skill)).strip().lower()
+
+
+@lru_cache(maxsize=4096)
+def split_skills(value: str) -> Tuple[str, ...]:
+    """Split a comma-separated skills field once (Neo4j rows repeat the same strings)."""
+    return tuple(s.strip() for s in value.split(",") if s.strip())
+
+
+def _vocabulary_sources() -> Iterable[str]:
+    """Yield every canonical skill spelling, CSV first (its spellings are shown to users)."""
+    with open(SKILLS_CSV_PATH, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            for column in SKILL_CSV_COLUMNS:
+                yield from split_skills(row.get(column) or "")
+
+    try:
+        from accounts.forms import SignupForm
+        yield from SignupForm.SKILLS
+    except Exception as e:  # Outside Django (scripts) the form list is optional
+        print(f"⚠️ Skill matcher: SignupForm.SKILLS unavailable ({e})")
+
+    from .recommendation_helper import SKILL_COURSE_MAPPING
+    yield from SKILL_COURSE_MAPPING
+
+
+class SkillMatcher:
+    """Precompiled skill vocabulary: token → skill ID, plus set-based comparisons."""
+
+    def __init__(self, skills: Iterable[str], aliases: Dict[str, str] = None):
+        self._ids = {}    # normalised spelling → skill ID
+        self.names = []   # skill ID → display name (first spelling seen)
+        for skill in skills:
+            key = normalize_skill(skill)
+            if key and key not in self._ids:
+                self._ids[key] = len(self.names)
+                self.names.append(str(skill).strip())
+
+        for alias, canonical in (aliases or {}).items():
+            alias, canonical = normalize_skill(alias), normalize_skill(canonical)
+            if canonical not in self._ids:
+                self._ids[canonical] = len(self.names)
+                self.names.append(canonical)
+            # An alias redirects even if it was also listed as its own skill
+            self._ids[alias] = self._ids[canonical]
+
+    def __len__(self):
+        return len(self.names)
+
+    def resolve(self, skill) -> Optional[int]:
+        """Skill ID for a token (None when it's not in the vocabulary)."""
+        return self._ids.get(normalize_skill(skill))
+
+    def resolve_many(self, skills: Iterable[str]) -> Tuple[Set[int], List[str]]:
+        """Resolve tokens to (set of IDs, list of normalised unknown tokens)."""
+        ids, unknown = set(), []
+        for skill in skills:
+            skill_id = self.resolve(skill)
+            if skill_id is not None:
+                ids.add(skill_id)
+            elif normalize_skill(skill):
+                unknown.append(normalize_skill(skill))
+        return ids, unknown
+
+    def mentions(self, text: str, max_words: int = 4) -> List[str]:
+        """
+        Skills mentioned in free text (longest match first), as display names.
+        One- and two-letter words only count when written with capitals or
+        symbols ("R", "Go", "C#"), so ordinary words don't match.
+        """
+        words = [w.strip("?!.,;:()'\"") for w in text.split()]
+        found, i = [], 0
+        while i < len(words):
+            for size in range(min(max_words, len(words) - i), 0, -1):
+                phrase = " ".join(words[i:i + size])
+                skill_id = self._ids.get(normalize_skill(phrase))
+                if skill_id is None or (size == 1 and len(phrase) <= 2 and phrase.islower()):
+                    continue
+                if self.names[skill_id] not in found:
+                    found.append(self.names[skill_id])
+                i += size
+                break
+            else:
+                i += 1
+        return found
+
+    def split_known(self, user_skills: Iterable[str], job_skills: Iterable[str],
+                    fallback: bool = False) -> Tuple[List[str], List[str]]:
+        """
+        Partition job_skills into (have, missing), keeping the job's own spellings
+        in order (duplicates by ID removed).
+        fallback=True: tokens outside the vocabulary also match by bidirectional
+        substring (the legacy behaviour), but only against other unknown-or-raw tokens.
+        """
+        user_ids, user_unknown = self.resolve_many(user_skills)
+        user_all = [normalize_skill(s) for s in user_skills if normalize_skill(s)] if fallback else []
+
+        have, missing, seen = [], [], set()
+        for job_skill in job_skills:
+            key = normalize_skill(job_skill)
+            if not key:
+                continue
+            skill_id = self._ids.get(key)
+            identity = skill_id if skill_id is not None else key
+            if identity in seen:
+                continue
+            seen.add(identity)
+
+            if skill_id is not None:
+                matched = skill_id in user_ids or (
+                    fallback and any(u in key or key in u for u in user_unknown)
+                )
+            else:
+                matched = key in user_unknown or (
+                    fallback and any(u in key or key in u for u in user_all)
+                )
+            (have if matched else missing).append(job_skill)
+        return have, missing
+
+    def missing(self, user_skills: Iterable[str], job_skills: Iterable[str],
+                fallback: bool = False) -> List[str]:
+        """Job skills the user does not have (see split_known)."""
+        return self.split_known(user_skills, job_skills, fallback)[1]
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_skill_matcher() -> SkillMatcher:
+    """Return the shared matcher (built on first use, rebuilt after a graph reload)."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = SkillMatcher(_vocabulary_sources(), SKILL_ALIASES)
+                print(f"🧩 Skill matcher built ({len(_matcher)} skills)")
+    return _matcher
+
+
+def invalidate_skill_matcher():
+    global _matcher
+    with _matcher_lock:
+        _matcher = None
+
+
+# The career graph is rebuilt from the same CSV, so a new graph version means a new vocabulary
+on_graph_version_change(invalidate_skill_matcher)
@@ -0,0 +1,1396 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+# The views import the agent stack: run it on the local stand-ins (no Neo4j / PGVector / OpenAI here)
+os.environ.setdefault("CHATBOT_OFFLINE", "1")
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.tools import Tool
+
+from .admission import AdmissionController, InflightCoalescer, Overloaded
+from .answer_cache import AnswerCache, is_personal_query
+from . import data_version, neo4j_client, recommendation_helper
+from .course_compression import CourseDocumentCompressor, compressed_course_retriever
+from .context import (
+    DeadlineExceeded, clamp_timeout, deadline_context, get_user_id, has_budget, remaining_time, set_user_id,
+    stage_timings, timed, timed_stage, user_context,
+)
+from .health import DisabledDependency, HealthProber
+from .history import ChatHistoryWriter
+from .job_queue import claim_next_job, recover_abandoned_jobs, run_via_queue
+from .llm_gateway import (
+    CircuitOpenError, FakeChatModel, GatewayChatModel, LLMTimeoutError, breaker_for, get_async_http_client,
+    reset_breakers, stats_for,
+)
+from .cypher_prompt import CYPHER_EXAMPLES, PROMPT_HEADER, CypherPromptBuilder
+from .local_cypher import LocalGraphStore, UnsupportedCypher, run_local_cypher
+from .local_graph import get_local_graph
+from .local_index import HashingEmbeddings, LocalCourseIndex, LocalCourseRetriever, publish_index
+from .models import AgentJob, ChatHistory
+from .offline import StubSupabaseClient, fake_cypher
+from .personalized import RecommendationCache, profile_problem, profile_version
+from .router import AGENT, CAREER_GRAPH, COURSES, PERSONALIZED, IntentRouter
+from .session_memory import SessionMemory, find_reference, session_memory
+from .skill_matcher import SkillMatcher, get_skill_matcher
+from .title_resolver import canonical_job_title, get_title_resolver
+
+
+def _whoami(query: str) -> str:
+    """Sync tool body: reads the caller the same way personalized_recommendation_wrapper does."""
+    return str(get_user_id())
+
+
+class RequestContextConcurrencyTests(SimpleTestCase):
+    """Concurrent requests in one worker must never see each other's user ID."""
+
+    USERS = 200
+
+    async def _fake_request(self, tool, user_id):
+        # Mirrors query_chatbot_api: set the user, then await the agent/tool
+        set_user_id(user_id)
+        await asyncio.sleep(random.random() / 100)  # Interleave with other requests
+        seen_by_tool = await tool.ainvoke("Generate my career recommendation")
+        seen_after = get_user_id()
+        return user_id, seen_by_tool, seen_after
+
+    async def test_concurrent_async_requests_see_their_own_user(self):
+        # Sync tools run in LangChain's thread executor, like the personalised tool
+        tool = Tool(name="WhoAmI", func=_whoami, description="Return the current user ID")
+
+        results = await asyncio.gather(*[
+            self._fake_request(tool, user_id) for user_id in range(1, self.USERS + 1)
+        ])
+
+        for user_id, seen_by_tool, seen_after in results:
+            self.assertEqual(seen_by_tool, str(user_id))
+            self.assertEqual(seen_after, user_id)
+
+    async def test_to_thread_propagates_user(self):
+        async def request(user_id):
+            set_user_id(user_id)
+            await asyncio.sleep(random.random() / 100)
+            return user_id, await asyncio.to_thread(get_user_id)
+
+        results = await asyncio.gather(*[request(u) for u in range(1, self.USERS + 1)])
+        for user_id, seen in results:
+            self.assertEqual(seen, user_id)
+
+    def test_thread_pool_requests_are_isolated(self):
+        # WSGI-style: each request handled on a pool thread
+        barrier = threading.Barrier(20)
+
+        def request(user_id):
+            with user_context(user_id):
+                barrier.wait()  # Force all users to be "active" at the same time
+                return user_id, _whoami("")
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(request, range(1, 21)))
+
+        for user_id, seen in results:
+            self.assertEqual(seen, str(user_id))
+
+    def test_user_context_restores_previous_user(self):
+        with user_context(1):
+            with user_context(2):
+                self.assertEqual(get_user_id(), 2)
+            self.assertEqual(get_user_id(), 1)
+        self.assertIsNone(get_user_id())
+
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic offline embeddings: one dimension per vocabulary word."""
+
+    VOCABULARY = ["python", "sql", "design", "cloud", "data"]
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(word in words) for word in self.VOCABULARY]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class StaticRetriever(BaseRetriever):
+    documents: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.documents
+
+
+def _course(title, text):
+    return Document(id=title, page_content=text,
+                    metadata={"title": title, "course_url": f"https://courses.example/{title}"})
+
+
+class LocalCourseIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.embeddings = KeywordEmbeddings()
+        self.courses = [
+            _course("python-basics", "python data"),
+            _course("sql-intro", "sql data"),
+            _course("ui-design", "design"),
+        ]
+        publish_index(self.courses, self.embeddings.embed_documents([c.page_content for c in self.courses]),
+                      index_dir=self.index_dir, version="v1")
+
+    def _retriever(self, index, **kwargs):
+        return LocalCourseRetriever(index=index, embeddings=self.embeddings, k=2, **kwargs)
+
+    def test_returns_documents_with_course_url(self):
+        docs = self._retriever(LocalCourseIndex(self.index_dir)).invoke("learn sql")
+        self.assertEqual(docs[0].metadata["course_url"], "https://courses.example/sql-intro")
+        self.assertEqual(len(docs), 2)
+
+    def test_picks_up_newly_published_version(self):
+        index = LocalCourseIndex(self.index_dir, check_interval=0)
+        self.assertEqual(index.search(self.embeddings.embed_query("cloud"), k=1)[0][1], 0.0)
+
+        cloud = _course("cloud-101", "cloud")
+        publish_index(self.courses + [cloud],
+                      self.embeddings.embed_documents([c.page_content for c in self.courses + [cloud]]),
+                      index_dir=self.index_dir, version="v2")
+        doc, score = index.search(self.embeddings.embed_query("cloud"), k=1)[0]
+        self.assertEqual((index.version, doc.id, score), ("v2", "cloud-101", 1.0))
+
+    def test_falls_back_without_an_index(self):
+        fallback = StaticRetriever(documents=[_course("from-pgvector", "python")])
+        docs = self._retriever(LocalCourseIndex(tempfile.mkdtemp()), fallback=fallback).invoke("python")
+        self.assertEqual([d.id for d in docs], ["from-pgvector"])
+
+    def test_prunes_the_oldest_versions_not_the_lowest_labels(self):
+        vectors = self.embeddings.embed_documents([c.page_content for c in self.courses])
+        versions_dir = os.path.join(self.index_dir, "versions")
+        publish_index(self.courses, vectors, index_dir=self.index_dir, version="a-fix")
+        for age, version in enumerate(["v1", "a-fix"]):
+            stamp = 1_000_000 + age  # Publish order, independent of the filesystem's mtime resolution
+            os.utime(os.path.join(versions_dir, version, "documents.json"), (stamp, stamp))
+
+        publish_index(self.courses, vectors, index_dir=self.index_dir, version="v2")  # Keeps 2 versions
+        self.assertEqual(sorted(os.listdir(versions_dir)), ["a-fix", "v2"])  # "a-fix" sorts before "v1"
+
+    def test_never_prunes_the_current_version(self):
+        from .local_index import _prune_versions
+
+        _prune_versions(self.index_dir, keep="other", keep_count=1)
+        self.assertEqual(os.listdir(os.path.join(self.index_dir, "versions")), ["v1"])
+        self.assertEqual(LocalCourseIndex(self.index_dir).status()["published_version"], "v1")
+
+
+_FILLER = " ".join(f"Week {n} wraps up with a recap and a short quiz for everyone." for n in range(1, 9))
+
+
+class CourseCompressionTests(SimpleTestCase):
+    def setUp(self):
+        self.embeddings = mock.Mock(spec=KeywordEmbeddings, wraps=KeywordEmbeddings())
+        self.documents = [
+            _course("python-101", f"{_FILLER} You will write python scripts from day one. {_FILLER}"),
+            _course("cloud-201", f"{_FILLER} Deploy services to the cloud with confidence. {_FILLER}"),
+        ]
+
+    def test_keeps_the_relevant_sentence_and_shrinks_the_context(self):
+        compressor = CourseDocumentCompressor(embeddings=self.embeddings, min_chars=0)
+        compressed = compressor.compress_documents(self.documents, "python course")
+
+        self.assertIn("snippet: You will write python scripts from day one.", compressed[0].page_content)
+        self.assertIn("course_url: https://courses.example/python-101", compressed[0].page_content)
+        self.assertEqual(compressed[1].metadata["title"], "cloud-201")
+        self.assertLess(sum(len(doc.page_content) for doc in compressed),
+                        sum(len(doc.page_content) for doc in self.documents) / 4)
+        self.embeddings.embed_documents.assert_called_once()
+
+    def test_word_overlap_without_embeddings(self):
+        compressor = CourseDocumentCompressor(min_chars=0)
+        compressed = compressor.compress_documents(self.documents, "deploy to the cloud")
+        self.assertIn("snippet: Deploy services to the cloud with confidence.", compressed[1].page_content)
+
+    def test_small_contexts_are_not_embedded(self):
+        short = [_course("sql-101", "Query data with SQL. Joins, indexes and window functions.")]
+        compressor = CourseDocumentCompressor(embeddings=self.embeddings)
+        self.assertEqual(compressor.compress_documents(short, "sql"), short)
+
+        compressor = CourseDocumentCompressor(embeddings=self.embeddings, min_chars=0)
+        self.assertIn("snippet:", compressor.compress_documents(short, "sql")[0].page_content)
+        self.embeddings.embed_documents.assert_not_called()
+
+    def test_retriever_wrapper(self):
+        retriever = StaticRetriever(documents=self.documents)
+        self.assertIs(compressed_course_retriever(retriever, enabled=False), retriever)
+        wrapped = compressed_course_retriever(retriever, self.embeddings, enabled=True, min_chars=0)
+        self.assertTrue(wrapped.invoke("python")[0].page_content.startswith("title: python-101"))
+
+
+def _failing_probe():
+    raise ConnectionError("connection refused")
+
+
+def _disabled_probe():
+    raise DisabledDependency("off")
+
+
+class HealthProberTests(SimpleTestCase):
+    def test_snapshot_before_first_round_is_not_ready(self):
+        snapshot = HealthProber({"neo4j": lambda: None}, required=("neo4j",)).snapshot()
+        self.assertEqual((snapshot["status"], snapshot["ready"]), ("starting", False))
+
+    def test_optional_failure_degrades_but_stays_ready(self):
+        prober = HealthProber({"neo4j": lambda: None, "course_store": _failing_probe,
+                               "extra": _disabled_probe}, required=("neo4j",))
+        prober.probe_once()
+        prober.probe_once()
+        snapshot = prober.snapshot()
+        self.assertEqual((snapshot["status"], snapshot["ready"]), ("degraded", True))
+        course_store = snapshot["dependencies"]["course_store"]
+        self.assertEqual((course_store["consecutive_failures"], course_store["last_error"]),
+                         (2, "connection refused"))
+        self.assertEqual(snapshot["dependencies"]["extra"]["status"], "disabled")
+
+    def test_required_failure_is_unhealthy_and_recovers(self):
+        outcomes = [_failing_probe, lambda: None]
+        prober = HealthProber({"neo4j": lambda: outcomes.pop(0)()}, required=("neo4j",))
+        prober.probe_once()
+        self.assertFalse(prober.snapshot()["ready"])
+        prober.probe_once()
+        neo4j = prober.snapshot()["dependencies"]["neo4j"]
+        self.assertEqual((neo4j["status"], neo4j["consecutive_failures"], neo4j["total_failures"]), ("up", 0, 1))
+
+
+class LLMGatewayTests(SimpleTestCase):
+    def setUp(self):
+        reset_breakers()
+
+    def _model(self, role, **fake):
+        return GatewayChatModel(inner=FakeChatModel(**fake), role=role, timeout=0.5)
+
+    def test_fake_backend_answers_sync_async_and_streaming(self):
+        model = self._model("fake", responses=["offline answer"])
+        self.assertEqual(model.invoke("hi").content, "offline answer")
+        self.assertEqual(asyncio.run(model.ainvoke("hi")).content, "offline answer")
+        self.assertEqual("".join(chunk.content for chunk in model.stream("hi")).strip(), "offline answer")
+
+    def test_deadline_raises_timeout(self):
+        model = self._model("slow", latency=2)
+        with self.assertRaises(LLMTimeoutError):
+            model.invoke("hi")
+        with self.assertRaises(LLMTimeoutError):
+            asyncio.run(model.ainvoke("hi"))
+        self.assertEqual(stats_for("slow").timeouts, 2)
+
+    def test_breaker_opens_and_fails_fast(self):
+        fake = FakeChatModel(error=ConnectionError("upstream down"))
+        model = GatewayChatModel(inner=fake, role="flaky", timeout=0.5)
+        for _ in range(breaker_for("flaky").threshold):
+            with self.assertRaises(ConnectionError):
+                model.invoke("hi")
+        with self.assertRaises(CircuitOpenError):
+            model.invoke("hi")
+        self.assertEqual(fake.calls, breaker_for("flaky").threshold)  # Last call never went upstream
+
+    def test_breaker_half_open_trial_closes_it(self):
+        breaker = breaker_for("recovering")
+        breaker.reset_after = 0
+        for _ in range(breaker.threshold):
+            breaker.record_failure()
+        self._model("recovering").invoke("hi")
+        self.assertEqual(breaker.state, "closed")
+
+    def test_hedged_request_wins_over_slow_primary(self):
+        latencies = iter([1.0, 0.0])
+
+        def respond(messages):
+            time.sleep(next(latencies))
+            return "answer"
+
+        model = GatewayChatModel(inner=FakeChatModel(respond=respond), role="hedged", timeout=0.8, hedge=True)
+        for _ in range(20):
+            stats_for("hedged").record(0.05, True)  # Warm window: p95 = 50ms
+        started = time.perf_counter()
+        self.assertEqual(model.invoke("hi").content, "answer")
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(stats_for("hedged").hedges, 1)
+
+    def test_queue_wait_is_not_charged_to_the_call(self):
+        pool, release = ThreadPoolExecutor(max_workers=1), threading.Event()
+        self.addCleanup(pool.shutdown)
+        with mock.patch("chatbot.llm_gateway._executor", pool):
+            pool.submit(time.sleep, 0.3)  # Another role's call holds the only worker
+            model = self._model("queued", latency=0.3, responses=["answer"])
+            self.assertEqual(model.invoke("hi").content, "answer")  # 0.6s wall, 0.3s running
+
+            pool.submit(release.wait)
+            for _ in range(breaker_for("queued").threshold):
+                with self.assertRaises(LLMTimeoutError) as raised:
+                    model.invoke("hi")
+                self.assertFalse(raised.exception.upstream)
+            release.set()
+        self.assertEqual(breaker_for("queued").snapshot()["state"], "closed")
+        self.assertEqual(breaker_for("queued").failures, 0)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keeps the connection open between requests
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class AsyncHTTPClientTests(SimpleTestCase):
+    def test_calls_from_separate_event_loops_reuse_the_client(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/"
+
+        with mock.patch("chatbot.llm_gateway._async_http_client", None):
+            client = get_async_http_client()
+
+            async def call():
+                responses = [await client.get(url), await client.get(url)]
+                return [response.status_code for response in responses]
+
+            # Each asyncio.run is a new loop, like async_to_sync under WSGI or a queue job
+            for _ in range(3):
+                self.assertEqual(asyncio.run(call()), [200, 200])
+            self.assertIs(get_async_http_client(), client)
+            self.assertLessEqual(client._transport.pool_count(), 3)
+
+
+class RequestDeadlineTests(SimpleTestCase):
+    def test_no_deadline_means_unbounded(self):
+        self.assertIsNone(remaining_time())
+        self.assertTrue(has_budget(1000))
+        self.assertEqual(clamp_timeout(10), 10)
+
+    def test_nested_deadline_never_extends_outer(self):
+        with deadline_context(1):
+            with deadline_context(60):
+                self.assertLessEqual(remaining_time(), 1)
+            self.assertLess(clamp_timeout(10), 1.01)
+        self.assertIsNone(remaining_time())
+
+    def test_stage_fails_fast_without_budget(self):
+        with deadline_context(0.2):
+            self.assertFalse(has_budget(1))
+            with self.assertRaises(DeadlineExceeded):
+                clamp_timeout(10, minimum=1)
+
+    def test_deadline_reaches_thread_pool_and_tasks(self):
+        async def check():
+            with deadline_context(5):
+                return await asyncio.to_thread(remaining_time)
+        self.assertGreater(asyncio.run(check()), 4)
+
+    def test_llm_call_skipped_when_budget_is_spent(self):
+        reset_breakers()
+        fake = FakeChatModel(latency=1)
+        model = GatewayChatModel(inner=fake, role="budgeted", timeout=5)
+        with deadline_context(0.5):
+            with self.assertRaises(LLMTimeoutError):
+                model.invoke("hi")
+        self.assertEqual(fake.calls, 0)
+        self.assertEqual(breaker_for("budgeted").state, "closed")
+
+
+class LocalCareerGraphTests(SimpleTestCase):
+    def test_related_jobs_match_the_neo4j_query_shape(self):
+        rows = get_local_graph().related_jobs("Developer, back-end")
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(set(rows[0]), {"job_name", "language", "database", "platform", "framework",
+                                        "salary", "experience", "similarity"})
+        self.assertEqual(rows, sorted(rows, key=lambda row: row["similarity"]))
+
+    def test_job_rows_for_known_titles_only(self):
+        rows = get_local_graph().job_rows(["Data scientist", "Not a job"])
+        self.assertEqual([row["job_title"] for row in rows], ["Data scientist"])
+
+
+class LocalCypherTests(SimpleTestCase):
+    def test_runs_every_prompt_example(self):
+        for _, question, cypher in CYPHER_EXAMPLES:
+            with self.subTest(question=question):
+                self.assertIsInstance(run_local_cypher(cypher), list)
+
+    def test_related_jobs_query_matches_the_local_graph(self):
+        from .personalized import RELATED_JOBS_QUERY
+
+        rows = run_local_cypher(RELATED_JOBS_QUERY, {"job_name": "Developer, back-end"})
+        self.assertEqual(rows, get_local_graph().related_jobs("Developer, back-end"))
+
+    def test_filters_orders_and_limits(self):
+        rows = run_local_cypher("MATCH (j:Job) WHERE j.median_comp > $floor "
+                                "RETURN j.name AS job, j.median_comp AS salary ORDER BY salary DESC LIMIT 3",
+                                {"floor": 0})
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows, sorted(rows, key=lambda row: row["salary"], reverse=True))
+
+    def test_rejects_writes_and_unknown_syntax(self):
+        for cypher in ("CREATE (j:Job {name: 'x'})", "MATCH (j:Job) DETACH DELETE j",
+                       "MATCH (j:Job) RETURN count(j)"):
+            with self.subTest(cypher=cypher), self.assertRaises(UnsupportedCypher):
+                run_local_cypher(cypher)
+
+
+class Neo4jAsyncDriverTests(SimpleTestCase):
+    def test_each_event_loop_gets_its_own_async_driver(self):
+        async def driver_twice():
+            return neo4j_client.get_async_driver(), neo4j_client.get_async_driver()
+
+        with mock.patch("chatbot.neo4j_client.AsyncGraphDatabase.driver", side_effect=lambda *a, **k: object()):
+            first, again = asyncio.run(driver_twice())
+            second, _ = asyncio.run(driver_twice())
+        self.assertIs(first, again)
+        self.assertIsNot(first, second)
+
+    def test_async_queries_use_the_sync_pool_by_default(self):
+        async def query():
+            return await neo4j_client.async_read_query("MATCH (j:Job) RETURN j.name", name="jobs")
+
+        with mock.patch("chatbot.neo4j_client.read_query", return_value=[{"j.name": "Developer"}]) as read, \
+                mock.patch("chatbot.neo4j_client.get_async_driver") as async_driver:
+            rows = [asyncio.run(query()) for _ in range(2)]  # Two loops, as under WSGI or in queue jobs
+        self.assertEqual(rows, [[{"j.name": "Developer"}]] * 2)
+        self.assertEqual(read.call_count, 2)
+        async_driver.assert_not_called()
+
+
+class OfflineProfileTests(SimpleTestCase):
+    def test_fake_cypher_targets_the_mentioned_job_and_technology(self):
+        from langchain_core.messages import HumanMessage
+
+        cypher = fake_cypher([HumanMessage(content="...\nUser Query: What jobs are similar to Developer, back-end?")])
+        self.assertIn("{name: 'Developer, back-end'}", cypher)
+        self.assertTrue(run_local_cypher(cypher))
+
+        cypher = fake_cypher([HumanMessage(content="User Query: Which jobs use React?")])
+        self.assertIn("top_webframe CONTAINS 'React'", cypher)
+
+    def test_graph_store_is_a_drop_in_for_the_chain(self):
+        store = LocalGraphStore()
+        self.assertEqual(store.structured_schema["relationships"],
+                         [{"start": "Job", "type": "RELATED_TO", "end": "Job"}])
+        self.assertEqual(store.query("RETURN 1 AS test"), [{"test": 1}])
+        self.assertEqual(store.query("MATCH (m:GraphMeta {name: 'career_graph'}) RETURN m.version AS version"), [])
+
+    def test_stub_supabase_upserts_on_the_conflict_column(self):
+        StubSupabaseClient.reset()
+        client = StubSupabaseClient()
+        client.table("users").upsert({"email": "a@example.com", "job_title": "Data scientist"},
+                                     on_conflict="email").execute()
+        response = client.table("users").upsert({"email": "a@example.com", "job_title": "Engineering manager"},
+                                                on_conflict="email").execute()
+        self.assertTrue(response.data)
+        rows = client.table("users").select("*").eq("email", "a@example.com").execute().data
+        self.assertEqual(rows, [{"email": "a@example.com", "job_title": "Engineering manager"}])
+        StubSupabaseClient.reset()
+
+
+class HashingEmbeddingsTests(SimpleTestCase):
+    def test_deterministic_and_normalised(self):
+        embeddings = HashingEmbeddings(dim=64)
+        first, second = embeddings.embed_documents(["Learn Python", "Learn Python"])
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 64)
+        self.assertAlmostEqual(sum(x * x for x in first), 1.0, places=6)
+
+    def test_shared_words_score_higher(self):
+        embeddings = HashingEmbeddings()
+        query = embeddings.embed_query("python course")
+        python, cooking = embeddings.embed_documents(["Intro to Python programming", "French cooking basics"])
+
+        def dot(a, b):
+            return sum(x * y for x, y in zip(a, b))
+
+        self.assertGreater(dot(query, python), dot(query, cooking))
+
+
+class AdmissionControlTests(SimpleTestCase):
+    def test_bounds_concurrency_and_queues(self):
+        controller = AdmissionController(limit=2, max_queue=10, queue_timeout=5)
+        running, peak = 0, 0
+
+        async def run():
+            nonlocal running, peak
+            async with controller.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.02)
+                running -= 1
+
+        async def main():
+            await asyncio.gather(*[run() for _ in range(8)])
+
+        asyncio.run(main())
+        self.assertEqual(peak, 2)
+        self.assertEqual(controller.stats()["admitted"], 8)
+        self.assertEqual(controller.stats()["active"], 0)
+
+    def test_rejects_when_queue_full_or_wait_times_out(self):
+        controller = AdmissionController(limit=1, max_queue=1, queue_timeout=0.05, retry_after=3)
+
+        async def main():
+            await controller.acquire()  # Hold the only slot
+            queued = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+            with self.assertRaises(Overloaded) as full:
+                await controller.acquire()
+            with self.assertRaises(Overloaded):
+                await queued
+            controller.release()
+            return full.exception.retry_after
+
+        self.assertEqual(asyncio.run(main()), 3)
+        stats = controller.stats()
+        self.assertEqual((stats["rejected_queue_full"], stats["rejected_timeout"], stats["active"]), (1, 1, 0))
+
+    def test_slot_handoff_across_event_loops(self):
+        # WSGI: each async request runs on its own loop (here: its own thread)
+        controller = AdmissionController(limit=1, max_queue=10, queue_timeout=5)
+        order = []
+
+        def request(name, hold):
+            async def run():
+                async with controller.slot():
+                    order.append(name)
+                    await asyncio.sleep(hold)
+            asyncio.run(run())
+
+        first = threading.Thread(target=request, args=("first", 0.1))
+        first.start()
+        time.sleep(0.02)
+        request("second", 0)
+        first.join()
+        self.assertEqual(order, ["first", "second"])
+
+
+class InflightCoalescingTests(SimpleTestCase):
+    def test_identical_questions_share_one_run(self):
+        coalescer = InflightCoalescer(enabled=True)
+        calls = 0
+
+        async def answer():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"output": "shared"}
+
+        async def main():
+            keys = [coalescer.key(q) for q in ("Skills for a Data scientist?", "skills for a data scientist")]
+            return await asyncio.gather(*[coalescer.run(key, answer) for key in keys * 3])
+
+        results = asyncio.run(main())
+        self.assertEqual(calls, 1)
+        self.assertEqual(sum(coalesced for _, coalesced in results), 5)
+        self.assertTrue(all(result["output"] == "shared" for result, _ in results))
+
+    def test_personal_questions_are_scoped_per_user(self):
+        question = "Generate my career recommendation"
+        self.assertNotEqual(InflightCoalescer.key(question, 1, personal=True),
+                            InflightCoalescer.key(question, 2, personal=True))
+        self.assertEqual(InflightCoalescer.key("Jobs using Python", 1), InflightCoalescer.key("jobs using python", 2))
+
+    def test_followers_receive_leader_error(self):
+        coalescer = InflightCoalescer(enabled=True)
+
+        async def fail():
+            await asyncio.sleep(0.02)
+            raise Overloaded("busy")
+
+        async def main():
+            return await asyncio.gather(*[coalescer.run("q", fail) for _ in range(3)], return_exceptions=True)
+
+        self.assertTrue(all(isinstance(r, Overloaded) for r in asyncio.run(main())))
+
+    def test_streamed_answer_is_shared_with_identical_requests(self):
+        coalescer = InflightCoalescer(enabled=True)
+        calls = 0
+
+        async def events():
+            nonlocal calls
+            calls += 1
+            yield {"event": "tool", "data": {"tool": "CareerGraph"}}
+            await asyncio.sleep(0.05)
+            yield {"event": "final", "result": {"output": "streamed"}}
+
+        async def collect():
+            return [item async for item in coalescer.stream("q", events)]
+
+        async def main():
+            leader = asyncio.ensure_future(collect())
+            await asyncio.sleep(0.01)
+            return await asyncio.gather(leader, collect(), coalescer.run("q", events))
+
+        leader, follower, (result, coalesced) = asyncio.run(main())
+        self.assertEqual(calls, 1)
+        self.assertEqual([item["event"] for item in leader], ["tool", "final"])
+        self.assertEqual(follower, [{"event": "final", "result": {"output": "streamed"}, "coalesced": True}])
+        self.assertEqual((result, coalesced), ({"output": "streamed"}, True))
+        self.assertEqual(coalescer.stats()["in_flight"], 0)
+
+
+@mock.patch("chatbot.views.record_answer")
+class QueryStreamAdmissionTests(TestCase):
+    url = "/askai/api/query/stream/"
+
+    def setUp(self):
+        self.async_client.force_login(User.objects.create_user("stream@example.com", password="x"))
+
+    def _post(self, text):
+        return async_to_sync(self.async_client.post)(self.url, {"text": text}, content_type="application/json")
+
+    @staticmethod
+    def _consume(response):
+        async def consume():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        # Own context: the stream sets the request's user, which must not leak into other tests
+        return contextvars.copy_context().run(async_to_sync(consume))
+
+    @mock.patch("chatbot.views.ANSWER_CACHE_ENABLED", False)
+    def test_returns_429_when_the_controller_is_full(self, _):
+        with mock.patch("chatbot.views.admission", AdmissionController(limit=0, max_queue=0, retry_after=7)):
+            response = self._post("Which jobs use Rust?")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "7")
+
+    def test_slot_is_held_only_while_the_agent_streams(self, _):
+        controller = AdmissionController(limit=1, max_queue=0)
+        active = []
+
+        async def events(text):
+            active.append(controller.stats()["active"])
+            yield {"event": "tool", "data": {"tool": "CareerGraph"}}
+            active.append(controller.stats()["active"])
+            yield {"event": "final", "result": {"output": "ok", "intermediate_steps": []}}
+
+        with mock.patch("chatbot.views.admission", controller), \
+                mock.patch("chatbot.agents.astream_career_agent", events):
+            response = self._post("Which jobs use Zig?")
+            self.assertEqual(controller.stats()["active"], 0)
+            body = self._consume(response)
+        self.assertEqual(active, [1, 1])
+        self.assertIn(b"event: final", body)
+        self.assertEqual(controller.stats()["active"], 0)
+
+    def test_cache_hits_and_followers_need_no_slot(self, _):
+        controller, coalescer = AdmissionController(limit=0, max_queue=0), InflightCoalescer()
+        cached = ({"answer": "cached answer", "tools": ["CareerGraph"]}, "exact", None)
+        leader = coalescer._inflight[coalescer.key("Which jobs use Go?")] = Future()
+        leader.set_result({"output": "shared answer", "intermediate_steps": []})
+
+        with mock.patch("chatbot.views.admission", controller), mock.patch("chatbot.views.coalescer", coalescer):
+            with mock.patch("chatbot.views._lookup_cached_answer", mock.AsyncMock(return_value=cached)):
+                hit = self._post("Which jobs use Kotlin?")
+                self.assertEqual(hit.status_code, 200)
+                self.assertIn(b"cached answer", self._consume(hit))
+            follower = self._post("Which jobs use Go?")
+            self.assertEqual(follower.status_code, 200)
+            self.assertIn(b'"coalesced": true', self._consume(follower))
+        self.assertEqual(controller.stats()["admitted"], 0)
+
+    @mock.patch("chatbot.views.ANSWER_CACHE_ENABLED", False)
+    def test_slot_wait_timeout_ends_with_a_busy_event(self, _):
+        controller = AdmissionController(limit=1, max_queue=1, queue_timeout=0.05, retry_after=3)
+        async_to_sync(controller.acquire)()  # Another request's agent run holds the only slot
+        with mock.patch("chatbot.views.admission", controller):
+            response = self._post("Which jobs use Scala?")
+            self.assertEqual(response.status_code, 200)
+            body = self._consume(response)
+        self.assertIn(b"event: error", body)
+        self.assertIn(b'"retry_after": 3', body)
+        self.assertEqual(controller.stats()["rejected_timeout"], 1)
+
+    def test_unread_stream_takes_no_slot(self, _):
+        controller = AdmissionController(limit=1, max_queue=0)
+        with mock.patch("chatbot.views.admission", controller):
+            self._post("Which jobs use Elixir?").close()
+        self.assertEqual(controller.stats()["active"], 0)
+
+
+@mock.patch("chatbot.views.record_answer")
+class QueryStreamEventTests(TestCase):
+    """The SSE sequence of a full agent run on FakeChatModel: tool → step → token… → final, or error."""
+
+    url = "/askai/api/query/stream/"
+
+    def setUp(self):
+        self.async_client.force_login(User.objects.create_user("events@example.com", password="x"))
+
+    def _executor(self, respond):
+        from langchain.agents import AgentExecutor, create_openai_tools_agent
+        from .agents import career_agent_prompt
+
+        tools = [Tool(name="CareerGraph", func=lambda query: "Rust: Developer, back-end",
+                      description="Career graph")]
+        model = GatewayChatModel(inner=FakeChatModel(respond=respond), role="stream_events", tags=["agent_answer"])
+        return AgentExecutor(agent=create_openai_tools_agent(model, tools, career_agent_prompt), tools=tools,
+                             return_intermediate_steps=True)
+
+    def _events(self, text, respond):
+        async def consume(response):
+            return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+        with mock.patch("chatbot.agents.career_rag_agent_executor", self._executor(respond)), \
+                mock.patch("chatbot.agents.ROUTER_ENABLED", False):
+            response = async_to_sync(self.async_client.post)(self.url, {"text": text},
+                                                             content_type="application/json")
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            body = contextvars.copy_context().run(async_to_sync(consume), response)
+        events = []
+        for block in body.strip().split("\n\n"):
+            name, data = block.split("\n", 1)
+            events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+        return events
+
+    def test_tool_then_final_answer(self, _):
+        from langchain_core.messages import AIMessage, ToolMessage
+
+        def respond(messages):
+            if any(isinstance(message, ToolMessage) for message in messages):
+                return "Back-end developers use Rust."
+            return AIMessage(content="", tool_calls=[
+                {"name": "CareerGraph", "args": {"__arg1": "Which jobs use Rust?"}, "id": "call_0"}])
+
+        events = self._events("Which jobs stream Rust?", respond)
+        names = [name for name, _ in events]
+        self.assertEqual(names[:2], ["tool", "step"])
+        self.assertEqual(events[0][1], {"tool": "CareerGraph", "routed": False})
+        self.assertEqual(set(names[2:-1]), {"token"})
+        self.assertEqual("".join(data["text"] for name, data in events if name == "token"),
+                         "Back-end developers use Rust.")
+        self.assertEqual(names[-1], "final")
+        self.assertEqual(events[-1][1]["output"], "Back-end developers use Rust.")
+        self.assertTrue(events[-1][1]["success"])
+
+    def test_agent_failure_ends_with_an_error_event(self, _):
+        def respond(messages):
+            raise RuntimeError("model unavailable")
+
+        events = self._events("Which jobs fail Rust?", respond)
+        self.assertEqual(events[-1][0], "error")
+        self.assertFalse(events[-1][1]["success"])
+        self.assertIn("model unavailable", events[-1][1]["error"])
+        self.assertNotIn("final", [name for name, _ in events])
+
+
+class ParallelToolCallTests(SimpleTestCase):
+    """One agent turn asking for two slow tools (FakeChatModel emits both tool calls at once)."""
+
+    durations = {"SlowGraph": 0.2, "SlowCourses": 0.3}
+
+    def _executor(self, running):
+        from langchain.agents import AgentExecutor, create_openai_tools_agent
+        from langchain_core.messages import AIMessage, ToolMessage
+        from .agents import _bounded, career_agent_prompt
+
+        def slow_tool(name):
+            async def run(query):
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+                await asyncio.sleep(self.durations[name])
+                running["now"] -= 1
+                return f"{name} answer"
+            return Tool(name=name, func=None, coroutine=_bounded(None, run), description=name)
+
+        def respond(messages):
+            if any(isinstance(message, ToolMessage) for message in messages):
+                return "Both parts answered."
+            return AIMessage(content="", tool_calls=[
+                {"name": name, "args": {"__arg1": "question"}, "id": f"call_{i}"}
+                for i, name in enumerate(self.durations)
+            ])
+
+        tools = [slow_tool(name) for name in self.durations]
+        model = GatewayChatModel(inner=FakeChatModel(respond=respond), role="parallel_tools")
+        return AgentExecutor(agent=create_openai_tools_agent(model, tools, career_agent_prompt), tools=tools,
+                             return_intermediate_steps=True)
+
+    def _run(self, limit):
+        from .agents import arun_career_agent
+
+        running = {"now": 0, "peak": 0}
+        with mock.patch("chatbot.agents.career_rag_agent_executor", self._executor(running)), \
+                mock.patch("chatbot.agents.ROUTER_ENABLED", False), \
+                mock.patch("chatbot.agents.CHATBOT_TOOL_CONCURRENCY", limit):
+            started = time.perf_counter()
+            result = asyncio.run(arun_career_agent("Jobs similar to mine and courses for them"))
+            elapsed = time.perf_counter() - started
+        self.assertEqual(result["output"], "Both parts answered.")
+        self.assertEqual({action.tool for action, _ in result["intermediate_steps"]}, set(self.durations))
+        return elapsed, running["peak"]
+
+    def test_tool_calls_of_one_turn_overlap(self):
+        elapsed, peak = self._run(limit=3)
+        self.assertEqual(peak, 2)
+        self.assertGreaterEqual(elapsed, max(self.durations.values()))
+        self.assertLess(elapsed, sum(self.durations.values()) - 0.1)  # ~max(tool), not sum(tool)
+
+    def test_tool_concurrency_caps_the_overlap(self):
+        elapsed, peak = self._run(limit=1)
+        self.assertEqual(peak, 1)
+        self.assertGreaterEqual(elapsed, sum(self.durations.values()))
+
+
+def _topic_embedding(text: str) -> list:
+    """Embeds only the question's topic words: every job / technology variant collides."""
+    lowered = text.lower()
+    return [float(word in lowered) for word in ("skills", "courses", "salary", "jobs")] + [0.1]
+
+
+class AnswerCacheTests(SimpleTestCase):
+    def _cache(self):
+        cache = AnswerCache(embed_fn=_topic_embedding, threshold=0.92)
+        for question in ("What skills does a Data scientist need?", "Recommend courses for React"):
+            cache.store(question, f"answer: {question}", ["CareerGraph"], "v1", cache.embed(question))
+        return cache
+
+    def test_exact_tier(self):
+        entry, tier, _ = self._cache().lookup("what skills does a data scientist need", "v1")
+        self.assertEqual(tier, "exact")
+        self.assertEqual(entry["answer"], "answer: What skills does a Data scientist need?")
+
+    def test_semantic_tier_needs_the_same_jobs_and_technologies(self):
+        cache = self._cache()
+        cases = [
+            ("Which skills are needed for a data scientist?", "semantic"),
+            ("Which skills are needed for a data engineer?", None),
+            ("Which skills are needed for a ds?", "semantic"),
+            ("Good courses for React please", "semantic"),
+            ("Good courses for Angular please", None),
+            ("Good courses for React and Docker please", None),
+        ]
+        for question, tier in cases:
+            with self.subTest(question=question):
+                self.assertEqual(cache.lookup(question, "v1")[1], tier)
+
+    def test_new_data_version_invalidates(self):
+        cache = self._cache()
+        self.assertEqual(cache.lookup("What skills does a Data scientist need?", "v2")[:2], (None, None))
+        self.assertEqual(cache.lookup("Which skills are needed for a data scientist?", "v2")[:2], (None, None))
+        self.assertEqual(cache.stats()["entries"], 1)  # The exact-match entry was dropped
+
+    def test_personal_questions_bypass_the_cache(self):
+        cache = self._cache()
+        question = "What skills do I need for a Data scientist job?"
+        self.assertTrue(is_personal_query(question))
+        self.assertFalse(cache.store(question, "personal", ["CareerGraph"], "v1", cache.embed(question)))
+        self.assertFalse(cache.store("Generate a recommendation", "x", ["PersonalizedCareerRecommendation"], "v1"))
+        self.assertEqual(cache.stats()["stores"], 2)
+
+
+class DataVersionTests(SimpleTestCase):
+    def setUp(self):
+        # Fresh version state (no listeners, nothing read yet), restored after each test
+        patcher = mock.patch.multiple(data_version, _graph_version=None, _graph_checked_at=0.0,
+                                      _graph_refreshing=False, _local_bump=0, _course_bump=0, _listeners=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_versions_key_on_the_graph_stamp_and_bumps(self):
+        changes = []
+        data_version.on_graph_version_change(lambda: changes.append(True))
+        stamps = iter(["v1", "v2"])
+        with mock.patch.object(data_version, "_read_graph_version", lambda: next(stamps)), \
+                mock.patch.object(data_version, "GRAPH_VERSION_TTL", 60):
+            self.assertEqual(data_version.graph_data_version(), "v1:0")
+            self.assertEqual(data_version.graph_data_version(), "v1:0")  # Within the TTL: no re-read
+            self.assertEqual(changes, [])
+
+            self.assertEqual(data_version.bump_graph_version(), "v2:1")  # Bump forces a re-read
+            self.assertEqual(len(changes), 2)  # The bump, then the new Neo4j stamp
+
+        courses = data_version.course_data_version()
+        self.assertNotEqual(data_version.bump_course_version(), courses)
+        self.assertIn(f"courses={data_version.course_data_version()}", data_version.current_data_version())
+
+    def test_neo4j_is_read_outside_the_lock_by_one_caller(self):
+        reads = []
+
+        def slow_read():
+            self.assertTrue(data_version._lock.acquire(blocking=False))  # Not held during the round trip
+            data_version._lock.release()
+            reads.append(True)
+            time.sleep(0.1)
+            return "v1"
+
+        with mock.patch.object(data_version, "_read_graph_version", slow_read):
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                versions = list(pool.map(lambda _: data_version.graph_data_version(), range(4)))
+        self.assertEqual(len(reads), 1)
+        self.assertIn("v1:0", versions)
+        self.assertEqual(data_version.graph_data_version(), "v1:0")
+
+    def test_failed_read_keeps_the_last_version(self):
+        def unreachable():
+            raise ConnectionError("neo4j down")
+
+        with mock.patch.object(data_version, "_read_graph_version", lambda: "v1"):
+            data_version.graph_data_version()
+        with mock.patch.object(data_version, "_read_graph_version", unreachable), \
+                mock.patch.object(data_version, "GRAPH_VERSION_TTL", 0):
+            self.assertEqual(data_version.graph_data_version(), "v1:0")
+
+
+class FakeCourseStore:
+    """Vector store with only the public search API (no PGVector internals)."""
+
+    def __init__(self, documents):
+        self.embeddings = mock.Mock(wraps=KeywordEmbeddings())
+        self.documents = documents
+        self.vectors = KeywordEmbeddings().embed_documents([doc.page_content for doc in documents])
+        self.searches = 0
+
+    def similarity_search_with_score_by_vector(self, vector, k=4):
+        self.searches += 1
+        distances = [1 - float(np.dot(vector, v) / (np.linalg.norm(vector) * np.linalg.norm(v) or 1))
+                     for v in self.vectors]
+        return sorted(zip(self.documents, distances), key=lambda hit: hit[1])[:k]
+
+
+class CourseLookupTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(recommendation_helper._course_memo, {"version": None, "courses": {}})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = FakeCourseStore([_course("Cloud Basics", "cloud"), _course("Design 101", "design")])
+
+    def test_skills_are_deduplicated_and_batched(self):
+        with mock.patch.object(recommendation_helper, "_nearest_courses",
+                               wraps=recommendation_helper._nearest_courses) as lookup:
+            courses = recommendation_helper.find_courses_for_skills(
+                ["Cloud", "cloud ", "Design", "Python", "Knitting"], self.store)
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(lookup.call_args.args[0], ["cloud", "design", "knitting"])  # "python" is curated
+        self.assertEqual(self.store.embeddings.embed_documents.call_count, 1)
+        self.assertEqual(courses["cloud"]["url"], "https://courses.example/Cloud Basics")
+        self.assertEqual(courses["design"]["title"], "Design 101")
+        self.assertIn("coursera.org/search?query=Knitting", courses["knitting"]["url"])  # Too far: search link
+        self.assertEqual(courses["python"], recommendation_helper.SKILL_COURSE_MAPPING["python"])
+
+    def test_memo_serves_repeated_skills(self):
+        recommendation_helper.find_courses_for_skills(["Cloud", "Design"], self.store)
+        searches = self.store.searches
+        courses = recommendation_helper.find_courses_for_skills(["design", "CLOUD"], self.store)
+        self.assertEqual(self.store.searches, searches)
+        self.assertEqual(self.store.embeddings.embed_documents.call_count, 1)
+        self.assertEqual(courses["cloud"]["title"], "Cloud Basics")
+
+    def test_public_search_is_used_without_pgvector_internals(self):
+        store = recommendation_helper.CourseStore(self.store)
+        self.assertFalse(store.batched)
+        self.assertEqual(store.nearest(store.embed(["design"]))[0][0]["title"], "Design 101")
+
+
+class IntentRouterTests(SimpleTestCase):
+    def setUp(self):
+        embeddings = HashingEmbeddings()
+        self.routers = {
+            "rules": IntentRouter(log_path=None),
+            "embeddings": IntentRouter(embeddings.embed_query, embeddings.embed_documents, log_path=None),
+        }
+
+    def test_dispatch_table(self):
+        cases = [
+            # query, rules-only route, keywords + centroid route
+            ("Which jobs use Python?", CAREER_GRAPH, CAREER_GRAPH),
+            ("What is the salary of a data scientist?", CAREER_GRAPH, CAREER_GRAPH),
+            ("Show me courses for Python", COURSES, COURSES),
+            ("Recommend tutorials to learn React", COURSES, COURSES),
+            ("Courses on machine learning", COURSES, COURSES),
+            ("Generate my career recommendation", PERSONALIZED, PERSONALIZED),
+            # Personal phrasing wins the keyword vote; the blend is unsure, so the agent decides
+            ("Which jobs suit my profile?", PERSONALIZED, AGENT),
+            # Multi-part: jobs AND courses
+            ("Which jobs use Python and which courses teach those skills?", AGENT, AGENT),
+            # Non-tech course requests: the agent declines them
+            ("I want to learn cooking, any classes?", AGENT, AGENT),
+            ("Any painting courses?", AGENT, AGENT),
+            ("hello there", AGENT, AGENT),
+        ]
+        for query, by_rules, by_embeddings in cases:
+            for name, expected in (("rules", by_rules), ("embeddings", by_embeddings)):
+                with self.subTest(query=query, router=name):
+                    self.assertEqual(self.routers[name].classify(query)["tool"], expected)
+
+    def test_personal_phrasing_overrides_other_keywords(self):
+        for router in self.routers.values():
+            decision = router.classify("Which jobs suit my profile?")
+            self.assertEqual(decision["predicted_tool"], PERSONALIZED)
+            self.assertFalse(decision["multi_intent"])
+
+    def test_flags_explain_agent_fallbacks(self):
+        router = self.routers["rules"]
+        self.assertTrue(router.classify("Which jobs use Python and which courses teach those skills?")["multi_intent"])
+        cooking = router.classify("I want to learn cooking, any classes?")
+        self.assertEqual((cooking["predicted_tool"], cooking["off_topic"]), (COURSES, True))
+        self.assertFalse(router.classify("Courses for a data scientist")["off_topic"])
+
+
+class SkillMatcherTests(SimpleTestCase):
+    def test_aliases_resolve_to_the_canonical_skill(self):
+        matcher = get_skill_matcher()
+        cases = [
+            ("aws", "Amazon Web Services (AWS)"),
+            ("gcp", "Google Cloud"),
+            ("azure", "Microsoft Azure"),
+            ("postgres", "PostgreSQL"),
+            ("JS", "JavaScript"),
+            ("ts", "TypeScript"),
+            ("golang", "Go"),
+            ("k8s", "Kubernetes"),
+            ("reactjs", "React"),
+            ("node", "Node.js"),
+            ("mongo", "MongoDB"),
+            ("css", "HTML/CSS"),
+            ("bash", "Bash/Shell (all shells)"),
+            ("c sharp", "C#"),
+            ("sklearn", "scikit-learn"),
+            ("  Amazon   Web Services  ", "Amazon Web Services (AWS)"),
+        ]
+        for alias, canonical in cases:
+            with self.subTest(alias=alias):
+                self.assertIsNotNone(matcher.resolve(canonical))
+                self.assertEqual(matcher.resolve(alias), matcher.resolve(canonical))
+        self.assertNotEqual(matcher.resolve("Java"), matcher.resolve("JavaScript"))
+        self.assertIsNone(matcher.resolve("knitting"))
+
+    def test_find_missing_skills_compares_ids(self):
+        job = {
+            "top_language": "Python, Java",
+            "top_database": "PostgreSQL",
+            "top_platform": "Amazon Web Services (AWS), Microsoft Azure",
+            "top_webframe": "",
+        }
+        cases = [
+            (["python", "aws", "postgres"], ["Java", "Microsoft Azure"]),
+            (["JavaScript"], ["Python", "Java", "PostgreSQL", "Amazon Web Services (AWS)", "Microsoft Azure"]),
+            (["Python", "Java", "PostgreSQL", "AWS", "azure"], []),
+        ]
+        for user_skills, missing in cases:
+            with self.subTest(user_skills=user_skills):
+                self.assertEqual(recommendation_helper.find_missing_skills(user_skills, job), missing)
+
+    def test_split_known(self):
+        matcher = SkillMatcher(["Python", "Spring Boot", "Docker"], {"py": "python"})
+        cases = [
+            # (user skills, job skills, fallback, (have, missing))
+            (["py"], ["Python", "python", "Docker"], False, (["Python"], ["Docker"])),
+            (["spring"], ["Spring Boot"], False, ([], ["Spring Boot"])),
+            (["spring"], ["Spring Boot"], True, (["Spring Boot"], [])),
+            (["terraform"], ["Terraform cloud"], False, ([], ["Terraform cloud"])),
+            (["terraform"], ["Terraform cloud"], True, (["Terraform cloud"], [])),
+            (["Python"], ["", "  "], False, ([], [])),
+        ]
+        for user_skills, job_skills, fallback, expected in cases:
+            with self.subTest(user_skills=user_skills, job_skills=job_skills, fallback=fallback):
+                self.assertEqual(matcher.split_known(user_skills, job_skills, fallback), expected)
+
+    def test_skill_graph_edges_match_aliases(self):
+        from types import SimpleNamespace
+        from skillgraph.views import _edge_from_user_to_job
+
+        job = SimpleNamespace(job="Cloud engineer", top_language='["Python"]', top_database='["PostgreSQL"]',
+                              top_platform='["Amazon Web Services (AWS)"]', top_framework="[]")
+        edge = _edge_from_user_to_job({"aws", "postgres"}, job, "Data engineer")
+        self.assertEqual(edge["overlap"], ["amazon web services (aws)", "postgresql"])
+        self.assertEqual(edge["missing"], ["python"])
+        self.assertIsNone(_edge_from_user_to_job({"knitting"}, job, "Data engineer"))  # No overlap
+
+
+def _quarter_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class CypherPromptBuilderTests(SimpleTestCase):
+    schema = "Node properties: Job {name: STRING}"
+
+    def test_fuzzy_example_selection_without_embeddings(self):
+        builder = CypherPromptBuilder(count_tokens=_quarter_tokens)
+        cases = [
+            # (query, pattern of the best example, an example that must be in the prompt)
+            ("What is the median salary for a Developer, back-end?", 1,
+             "What is the median salary for a Data scientist?"),
+            ("Which jobs use Rust?", 3, "Which jobs use PostgreSQL?"),
+        ]
+        for query, pattern, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual(CYPHER_EXAMPLES[builder.rank_examples(query)[0]][0], pattern)
+                self.assertIn(expected, builder.build(query, self.schema)[1]["examples"])
+
+    def test_embedding_example_selection(self):
+        def embed(text):
+            text = text.lower()
+            return [float("similar" in text), float("salary" in text), float("use" in text), 0.01]
+
+        builder = CypherPromptBuilder(embed_fn=embed, count_tokens=_quarter_tokens)
+        _, info = builder.build("Roles similar to mine?", self.schema)
+        self.assertTrue(all("similar" in question.lower() for question in info["examples"][:1]))
+
+        broken = CypherPromptBuilder(embed_fn=embed, count_tokens=_quarter_tokens)
+        broken.embed_fn = mock.Mock(side_effect=RuntimeError("model unloaded"))
+        self.assertEqual(broken.rank_examples("Which jobs use Rust?"),
+                         CypherPromptBuilder(count_tokens=_quarter_tokens).rank_examples("Which jobs use Rust?"))
+
+    def test_prompt_stays_within_the_token_budget(self):
+        builder = CypherPromptBuilder(count_tokens=_quarter_tokens, skill_mentions=lambda query: ["Python", "Docker"])
+        for query in ("Which jobs use Python and Docker?", "Jobs similar to a Data scientist with higher salary",
+                      "<USER_PROFILE:Data scientist|Python, SQL> Recommend careers for me"):
+            with self.subTest(query=query):
+                prompt, info = builder.build(query, self.schema)
+                self.assertLessEqual(info["tokens"], 1200)
+                self.assertEqual(info["tokens"], _quarter_tokens(prompt))
+                self.assertIn("use this exact spelling with CONTAINS): Python, Docker", prompt)
+                self.assertLessEqual(len(info["examples"]), 4)
+                self.assertEqual(builder.stats()["budget"], 1200)
+
+    def test_budget_cuts_examples_but_keeps_one(self):
+        query = "What is the median salary for a Data scientist?"
+        full = CypherPromptBuilder(count_tokens=_quarter_tokens, token_budget=10_000)
+        self.assertEqual(len(full.build(query, self.schema)[1]["examples"]), 4)
+
+        fixed = _quarter_tokens(PROMPT_HEADER.format(schema=self.schema)) + _quarter_tokens(f"\nUser Query: {query}\n")
+        tight = CypherPromptBuilder(count_tokens=_quarter_tokens, token_budget=fixed + 40)
+        self.assertLess(len(tight.build(query, self.schema)[1]["examples"]), 4)
+        starved = CypherPromptBuilder(count_tokens=_quarter_tokens, token_budget=1)
+        self.assertEqual(starved.build(query, self.schema)[1]["examples"], [query])
+
+
+class AgentJobQueueTests(TestCase):
+    def _job(self, query="Skills for a Data scientist?", ttl=30):
+        return AgentJob.objects.create(query=query, expires_at=timezone.now() + timedelta(seconds=ttl))
+
+    def test_a_job_is_claimed_once_oldest_first(self):
+        first, second = self._job("first"), self._job("second")
+        self.assertEqual(claim_next_job("w1").pk, first.pk)
+        self.assertEqual(claim_next_job("w2").pk, second.pk)
+        self.assertIsNone(claim_next_job("w3"))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.worker), (AgentJob.RUNNING, "w1"))
+
+    def test_expired_jobs_are_never_run(self):
+        job = self._job(ttl=-1)
+        self.assertIsNone(claim_next_job("w1"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.EXPIRED)
+
+    def test_restarted_worker_fails_its_abandoned_jobs(self):
+        job = self._job()
+        claim_next_job("host:0")
+        self.assertEqual(recover_abandoned_jobs("host:0"), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AgentJob.FAILED)
+
+    def test_unanswered_job_times_out_and_expires(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            async_to_sync(run_via_queue)("Jobs using Python", timeout=0.05)
+        job = AgentJob.objects.get(query="Jobs using Python")
+        self.assertEqual(job.status, AgentJob.EXPIRED)
+
+
+class StageTimingsTests(SimpleTestCase):
+    def test_stages_in_executor_threads_add_to_the_request_totals(self):
+        slow_tool = timed("tool.CareerGraph", lambda query: time.sleep(0.02) or query)
+
+        async def main():
+            with stage_timings() as timings:
+                with timed_stage("route"):
+                    pass
+                await asyncio.gather(*[asyncio.to_thread(slow_tool, "q") for _ in range(3)])
+                return timings.as_dict()
+
+        result = asyncio.run(main())
+        self.assertIn("route", result)
+        self.assertGreaterEqual(result["tool.CareerGraph"], 60)
+
+    def test_no_collector_outside_a_request(self):
+        with timed_stage("neo4j"):
+            pass  # Nothing to record into, and no error
+
+
+class ChatHistoryWriterTests(SimpleTestCase):
+    def test_flushes_in_batches_off_the_request_path(self):
+        batches = []
+        writer = ChatHistoryWriter(batch_size=3, flush_interval=60, save_rows=batches.append)
+        for i in range(3):
+            writer.record(f"q{i}", "a", tools=["CareerGraph", "CareerGraph"], stage_timings={"neo4j": 1.0})
+        deadline = time.time() + 2
+        while not batches and time.time() < deadline:
+            time.sleep(0.01)
+        writer.shutdown()
+        self.assertEqual([len(batch) for batch in batches], [3])
+        self.assertEqual(batches[0][0]["tool_used"], "CareerGraph")
+
+    def test_flushes_on_the_time_threshold(self):
+        batches = []
+        writer = ChatHistoryWriter(batch_size=100, flush_interval=0.05, save_rows=batches.append)
+        writer.record("q", "a")
+        time.sleep(0.3)
+        self.assertEqual(len(batches), 1)
+        writer.shutdown()
+
+    def test_loss_is_bounded_while_the_database_is_down(self):
+        def down(rows):
+            raise ConnectionError("database unavailable")
+
+        writer = ChatHistoryWriter(batch_size=100, flush_interval=60, max_buffer=5, save_rows=down)
+        for i in range(8):
+            writer.record(f"q{i}", "a")
+        writer.flush()
+        stats = writer.stats()
+        self.assertEqual((stats["buffered"], stats["dropped"], stats["failed_flushes"]), (5, 3, 1))
+
+        saved = []
+        writer._save_rows = saved.extend
+        writer.shutdown()
+        self.assertEqual([row["query"] for row in saved], [f"q{i}" for i in range(3, 8)])
+
+    def test_a_rejected_row_does_not_block_its_batch(self):
+        saved = []
+
+        def save(rows):
+            if any(row["user_id"] == 404 for row in rows):  # User deleted before the flush
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            saved.extend(rows)
+
+        writer = ChatHistoryWriter(batch_size=100, flush_interval=60, save_rows=save)
+        for i in range(4):
+            writer.record(f"q{i}", "a", user_id=404 if i == 1 else 7)
+        self.assertEqual(writer.flush(), 3)
+        self.assertEqual([row["query"] for row in saved], ["q0", "q2", "q3"])
+        stats = writer.stats()
+        self.assertEqual((stats["buffered"], stats["written"], stats["rejected"]), (0, 3, 1))
+
+        writer.record("q4", "a", user_id=7)
+        self.assertEqual(writer.flush(), 1)
+        writer.shutdown()
+
+
+class ChatHistoryPersistenceTests(TestCase):
+    def test_rows_are_bulk_inserted(self):
+        writer = ChatHistoryWriter(flush_interval=60)
+        writer.record("Jobs using Python", "Backend developer", session_id="s1", tools=["CareerGraph"],
+                      response_time=0.4, stage_timings={"route": 1.2, "neo4j": 30.5})
+        writer.shutdown()
+        row = ChatHistory.objects.get()
+        self.assertEqual((row.session_id, row.tool_used), ("s1", "CareerGraph"))
+        self.assertEqual(row.stage_timings["neo4j"], 30.5)
+
+
+class SessionMemoryTests(SimpleTestCase):
+    def test_follow_up_references(self):
+        self.assertEqual(find_reference("what courses for #2?", 3), ("#2", 1))
+        self.assertEqual(find_reference("Salary of the second one", 3), ("the second one", 1))
+        self.assertEqual(find_reference("tell me about the last job", 3), ("the last job", 2))
+        self.assertIsNone(find_reference("what courses for #4?", 3))
+        self.assertIsNone(find_reference("what is the first step to become a data scientist", 3))
+
+    def test_entries_expire_and_are_bounded(self):
+        now = [0.0]
+        memory = SessionMemory(ttl=10, max_sessions=2, clock=lambda: now[0])
+        memory.update(1, "a", profile={"job_title": "Data scientist"})
+        self.assertEqual(memory.get(1, "a", "profile")["job_title"], "Data scientist")
+        self.assertIsNone(memory.get(1, "b", "profile"))  # Sessions are separate
+
+        now[0] = 11
+        self.assertIsNone(memory.get(1, "a", "profile"))
+
+        for session in ("a", "b", "c"):
+            memory.update(1, session, profile={})
+        self.assertEqual(memory.stats()["sessions"], 2)
+        self.assertIsNone(memory.get(1, "a", "profile"))  # Least recently used went first
+
+
+class SessionMemoryInvalidationTests(TestCase):
+    def test_profile_update_drops_the_users_sessions(self):
+        from django.contrib.auth.models import User
+        from accounts.models import Profile
+
+        user = User.objects.create_user("ada", "ada@example.com", "pw")
+        profile = Profile.objects.create(user=user, job_title="Data scientist", skills=["python"])
+        session_memory.update(user.id, "s1", profile={"job_title": "Data scientist", "skills": ["python"]})
+        session_memory.update(user.id + 1, "s1", profile={"job_title": "Other", "skills": []})
+
+        profile.skills = ["python", "sql"]
+        profile.save()
+        self.assertIsNone(session_memory.get(user.id, "s1", "profile"))
+        self.assertIsNotNone(session_memory.get(user.id + 1, "s1", "profile"))
+        session_memory.clear()
+
+
+class PersonalizedRecommendationTests(SimpleTestCase):
+    def test_profile_version_tracks_title_and_skills(self):
+        profile = {"job_title": "Data scientist", "skills": ["python", "sql"]}
+        self.assertEqual(profile_version(profile), profile_version({"job_title": "Data scientist",
+                                                                    "skills": ["sql", "python"]}))
+        self.assertNotEqual(profile_version(profile), profile_version({**profile, "skills": ["python"]}))
+        self.assertNotEqual(profile_version(profile), profile_version({**profile, "job_title": "Engineer, data"}))
+
+    def test_profile_problems(self):
+        self.assertIn("logged in", profile_problem(None, {"job_title": "Data scientist"}))
+        self.assertIn("couldn't find your profile", profile_problem(1, None))
+        self.assertIn("job title", profile_problem(1, {"job_title": "", "skills": ["python"]}))
+        self.assertIsNone(profile_problem(1, {"job_title": "Data scientist", "skills": []}))
+
+    def test_cache_is_bounded(self):
+        cache = RecommendationCache(max_size=2, ttl=60)
+        for version in ("a", "b", "c"):
+            cache.put((1, version), {"output": version})
+        self.assertIsNone(cache.get((1, "a")))
+        self.assertEqual(cache.get((1, "c")), {"output": "c"})
+        self.assertEqual(cache.stats()["entries"], 2)
+
+
+class TitleResolverTests(SimpleTestCase):
+    def test_profile_titles_are_only_rewritten_on_exact_or_synonym_matches(self):
+        cases = [
+            ("Student", "Student"),
+            ("Senior Developer", "Senior Developer"),
+            ("Data", "Data"),
+            ("Developer", "Developer"),
+            ("Manager", "Manager"),
+            ("Senior Data Scientist", "Senior Data Scientist"),
+            ("data scientst", "data scientst"),
+            ("  Data scientist ", "Data scientist"),
+            ("backend dev", "Developer, back-end"),
+            ("Back-End Developer", "Developer, back-end"),
+            ("DS", "Data scientist"),
+        ]
+        for typed, saved in cases:
+            with self.subTest(typed=typed):
+                self.assertEqual(canonical_job_title(typed), saved)
+
+    def test_abbreviations_never_fuzzy_match(self):
+        resolver = get_title_resolver()
+        for text in ("Student", "Senior Developer", "Data", "Developer", "Manager"):
+            with self.subTest(text=text):
+                self.assertIsNone(resolver.resolve_title(text)[0])
+
+    def test_typos_still_resolve_in_queries(self):
+        resolver = get_title_resolver()
+        self.assertEqual(resolver.resolve_title("data scientst")[0], "Data scientist")
+        self.assertEqual(resolver.normalize_query("salary of a data scientst")[1], ["Data scientist"])
@@ -0,0 +1,367 @@
+"""
+Job title resolver
+Maps user phrasing ("backend dev", "ML engineer", "data scientst") to the
+canonical job titles used in the career graph and the profile forms:
+1. Token trie over SYNONYMS + canonical titles (longest match, one pass)
+2. Fuzzy match (rapidfuzz) against the same phrases, minus abbreviations
+   ("ds", "be developer"), which only ever match exactly
+3. Optional embedding nearest neighbour against the canonical titles
+resolve_title() returns (title, confidence); normalize_job_titles() rewrites a
+whole query; canonical_job_title() (profile saves) only rewrites exact
+titles and synonyms. Steps 1-2 take microseconds; only step 3 runs a model.
+"""
+import os
+import re
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Resolver configuration (tunable from the environment)
+TITLE_FUZZY_THRESHOLD = float(os.getenv("TITLE_FUZZY_THRESHOLD", "85"))              # rapidfuzz score (0-100)
+TITLE_QUERY_FUZZY_THRESHOLD = float(os.getenv("TITLE_QUERY_FUZZY_THRESHOLD", "90"))  # Stricter inside free text
+TITLE_EMBEDDING_THRESHOLD = float(os.getenv("TITLE_EMBEDDING_THRESHOLD", "0.6"))     # Cosine similarity
+TITLE_FUZZY_MIN_TOKEN = int(os.getenv("TITLE_FUZZY_MIN_TOKEN", "3"))                 # Phrases with a shorter word are exact-only
+
+# --- Job title synonyms dictionary ---
+# Used to normalize user queries such as "backend dev" → "Developer, back-end"
+SYNONYMS = {
+    # Backend
+    "backend dev": "Developer, back-end",
+    "backend developer": "Developer, back-end",
+    "back-end dev": "Developer, back-end",
+    "back-end developer": "Developer, back-end",
+    "backend engineer": "Developer, back-end",
+    "be developer": "Developer, back-end",
+    
+    # Frontend
+    "frontend dev": "Developer, front-end",
+    "frontend developer": "Developer, front-end",
+    "front-end dev": "Developer, front-end",
+    "front-end developer": "Developer, front-end",
+    "frontend engineer": "Developer, front-end",
+    "fe developer": "Developer, front-end",
+    
+    # Full-stack
+    "fullstack": "Developer, full-stack",
+    "full stack": "Developer, full-stack",
+    "fullstack developer": "Developer, full-stack",
+    "full-stack dev": "Developer, full-stack",
+    "full stack developer": "Developer, full-stack",
+    "fs developer": "Developer, full-stack",
+    
+    # Data roles
+    "data analyst": "Data or business analyst",
+    "business analyst": "Data or business analyst",
+    "analyst": "Data or business analyst",
+    "ba": "Data or business analyst",
+    "data scientist": "Data scientist",
+    "ds": "Data scientist",
+    "scientist": "Data scientist",
+    "data engineer": "Data engineer",
+    "de": "Data engineer",
+    
+    # AI/ML roles
+    "ml engineer": "AI/ML engineer",
+    "machine learning engineer": "AI/ML engineer",
+    "ai engineer": "AI/ML engineer",
+    "artificial intelligence engineer": "AI/ML engineer",
+    "ai developer": "Developer, AI apps or physical AI",
+    "ai app developer": "Developer, AI apps or physical AI",
+    "physical ai developer": "Developer, AI apps or physical AI",
+    "applied scientist": "Applied scientist",
+    
+    # Cloud/Infrastructure
+    "cloud engineer": "Cloud infrastructure engineer",
+    "cloud infrastructure": "Cloud infrastructure engineer",
+    "infrastructure engineer": "Cloud infrastructure engineer",
+    "sysadmin": "System administrator",
+    "sys admin": "System administrator",
+    "system admin": "System administrator",
+    "devops": "DevOps engineer or professional",
+    "devops engineer": "DevOps engineer or professional",
+    "devops professional": "DevOps engineer or professional",
+    
+    # Database
+    "database admin": "Database administrator or engineer",
+    "dba": "Database administrator or engineer",
+    "db admin": "Database administrator or engineer",
+    "database administrator": "Database administrator or engineer",
+    "database engineer": "Database administrator or engineer",
+    
+    # QA/Testing
+    "qa": "Developer, QA or test",
+    "qa engineer": "Developer, QA or test",
+    "tester": "Developer, QA or test",
+    "test engineer": "Developer, QA or test",
+    "quality assurance": "Developer, QA or test",
+    "qa developer": "Developer, QA or test",
+    
+    # Management
+    "project manager": "Project manager",
+    "pm": "Product manager",
+    "product manager": "Product manager",
+    "engineering manager": "Engineering manager",
+    "eng manager": "Engineering manager",
+    "em": "Engineering manager",
+    
+    # Security
+    "security": "Cybersecurity or InfoSec professional",
+    "cybersecurity": "Cybersecurity or InfoSec professional",
+    "infosec": "Cybersecurity or InfoSec professional",
+    "security engineer": "Cybersecurity or InfoSec professional",
+    "security professional": "Cybersecurity or InfoSec professional",
+    
+    # Support
+    "support engineer": "Support engineer or analyst",
+    "support analyst": "Support engineer or analyst",
+    "customer support": "Support engineer or analyst",
+    
+    # Design
+    "ux": "UX, Research Ops or UI design professional",
+    "ui": "UX, Research Ops or UI design professional",
+    "ux designer": "UX, Research Ops or UI design professional",
+    "ui designer": "UX, Research Ops or UI design professional",
+    "designer": "UX, Research Ops or UI design professional",
+    "ux researcher": "UX, Research Ops or UI design professional",
+    
+    # Executive/Leadership
+    "cto": "Senior executive (C-suite, VP, etc.)",
+    "ceo": "Senior executive (C-suite, VP, etc.)",
+    "vp": "Senior executive (C-suite, VP, etc.)",
+    "executive": "Senior executive (C-suite, VP, etc.)",
+    "c-suite": "Senior executive (C-suite, VP, etc.)",
+    "founder": "Founder, technology or otherwise",
+    "co-founder": "Founder, technology or otherwise",
+    
+    # Specialized developers
+    "researcher": "Academic researcher",
+    "academic": "Academic researcher",
+    "academic researcher": "Academic researcher",
+    "mobile dev": "Developer, mobile",
+    "mobile developer": "Developer, mobile",
+    "mobile engineer": "Developer, mobile",
+    "ios developer": "Developer, mobile",
+    "android developer": "Developer, mobile",
+    "game dev": "Developer, game or graphics",
+    "game developer": "Developer, game or graphics",
+    "graphics developer": "Developer, game or graphics",
+    "desktop dev": "Developer, desktop or enterprise applications",
+    "desktop developer": "Developer, desktop or enterprise applications",
+    "enterprise developer": "Developer, desktop or enterprise applications",
+    "embedded developer": "Developer, embedded applications or devices",
+    "embedded engineer": "Developer, embedded applications or devices",
+    "iot developer": "Developer, embedded applications or devices",
+    
+    # Architecture
+    "architect": "Architect, software or solutions",
+    "software architect": "Architect, software or solutions",
+    "solutions architect": "Architect, software or solutions",
+    "solution architect": "Architect, software or solutions",
+    
+    # Finance
+    "financial analyst": "Financial analyst or engineer",
+    "financial engineer": "Financial analyst or engineer",
+    "quant": "Financial analyst or engineer",
+}
+
+_token = re.compile(r"[a-z0-9]+")
+_END = object()  # Trie key marking the end of a phrase
+
+
+def _tokens(text: str) -> List[Tuple[str, int, int]]:
+    """Alphanumeric tokens with their character spans (punctuation acts as a word boundary)."""
+    return [(m.group(), m.start(), m.end()) for m in _token.finditer(text.lower())]
+
+
+def _phrase_key(text: str) -> str:
+    return " ".join(token for token, _, _ in _tokens(text))
+
+
+def canonical_titles() -> List[str]:
+    """The authoritative job titles (JOB_TITLE_CHOICES), or the SYNONYMS targets outside Django."""
+    try:
+        from accounts.forms import JOB_TITLE_CHOICES
+        return list(JOB_TITLE_CHOICES)
+    except Exception:
+        return sorted(set(SYNONYMS.values()))
+
+
+class TitleResolver:
+    """Precompiled synonym trie + fuzzy/embedding fallback over the canonical job titles."""
+
+    def __init__(self, synonyms: dict, titles: List[str], embed_fn: Callable = None,
+                 embed_documents_fn: Callable = None):
+        self.titles = list(titles)
+        self._by_casefold = {title.casefold(): title for title in self.titles}
+
+        # Phrase → title, including every canonical title mapped to itself
+        self.phrases = {_phrase_key(title): title for title in self.titles}
+        self.phrases.update({_phrase_key(phrase): title for phrase, title in synonyms.items()})
+        # Abbreviations ("de", "ba", "fe developer") score high against any short word, so they never fuzzy-match
+        self._fuzzy_phrases = [p for p in self.phrases if min(map(len, p.split())) >= TITLE_FUZZY_MIN_TOKEN]
+        self._multi_word = [p for p in self._fuzzy_phrases if " " in p]  # For fuzzy windows in free text
+
+        self._trie = {}
+        for phrase, title in self.phrases.items():
+            node = self._trie
+            for token in phrase.split():
+                node = node.setdefault(token, {})
+            node[_END] = title
+
+        self.embed_fn = embed_fn
+        self._title_vectors = None
+        if embed_fn is not None:
+            vectors = embed_documents_fn(self.titles) if embed_documents_fn else [embed_fn(t) for t in self.titles]
+            vectors = np.asarray(vectors, dtype=np.float32)
+            self._title_vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _longest_matches(self, tokens):
+        """Scan tokens once, yielding (first_index, last_index, title) for each longest match."""
+        i = 0
+        while i < len(tokens):
+            node, best = self._trie, None
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j][0])
+                if node is None:
+                    break
+                if _END in node:
+                    best = (i, j, node[_END])
+            if best:
+                yield best
+                i = best[1] + 1
+            else:
+                i += 1
+
+    def find_titles(self, text: str) -> List[Tuple[int, int, str]]:
+        """Character spans + titles of every synonym/title mentioned in the text."""
+        tokens = _tokens(text)
+        return [(tokens[i][1], tokens[j][2], title) for i, j, title in self._longest_matches(tokens)]
+
+    def _fuzzy_windows(self, text: str, taken: List[Tuple[int, int, str]]):
+        """Fuzzy-match 2-4 token windows outside the exact matches (typos like 'data scientst')."""
+        tokens = _tokens(text)
+        covered = [(start, end) for start, end, _ in taken]
+        found, i = [], 0
+        while i < len(tokens):
+            match = None
+            for size in (4, 3, 2):
+                window = tokens[i:i + size]
+                if len(window) < size:
+                    continue
+                start, end = window[0][1], window[-1][2]
+                if any(start < c_end and end > c_start for c_start, c_end in covered):
+                    continue
+                hit = process.extractOne(" ".join(t for t, _, _ in window), self._multi_word,
+                                         scorer=fuzz.ratio, score_cutoff=TITLE_QUERY_FUZZY_THRESHOLD)
+                if hit:
+                    match = (start, end, self.phrases[hit[0]], size)
+                    break
+            if match:
+                found.append(match[:3])
+                i += match[3]
+            else:
+                i += 1
+        return found
+
+    def normalize_query(self, query: str, fuzzy: bool = True) -> Tuple[str, List[str]]:
+        """Replace every job title mention with its canonical title; returns (query, titles)."""
+        spans = self.find_titles(query)
+        if fuzzy:
+            spans += self._fuzzy_windows(query, spans)
+        result = query
+        for start, end, title in sorted(spans, reverse=True):  # Back to front so offsets stay valid
+            result = result[:start] + title + result[end:]
+        titles = list(dict.fromkeys(title for _, _, title in sorted(spans)))
+        return result, titles
+
+    def exact_title(self, text: str) -> Optional[str]:
+        """Canonical title when the whole string is a title or a known synonym (any case/punctuation)."""
+        text = (text or "").strip()
+        return self._by_casefold.get(text.casefold()) or self.phrases.get(_phrase_key(text))
+
+    def resolve_title(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Resolve a title-like string (profile field, short phrase) to one canonical title.
+        Returns (title, confidence in [0, 1]); title is None when nothing is close enough.
+        """
+        text = (text or "").strip()
+        if not text:
+            return None, 0.0
+
+        exact = self._by_casefold.get(text.casefold())
+        if exact:
+            return exact, 1.0
+
+        tokens = _tokens(text)
+        matches = list(self._longest_matches(tokens))
+        if len(matches) == 1:
+            i, j, title = matches[0]
+            # Whole string is a known phrase → certain; phrase inside extra words → likely
+            return title, 1.0 if (i, j) == (0, len(tokens) - 1) else 0.9
+
+        hit = process.extractOne(_phrase_key(text), self._fuzzy_phrases, scorer=fuzz.ratio)
+        best_title, best_score = (self.phrases[hit[0]], hit[1] / 100) if hit else (None, 0.0)
+        if best_score * 100 >= TITLE_FUZZY_THRESHOLD:
+            return best_title, round(best_score, 4)
+
+        if self._title_vectors is not None:
+            try:
+                vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+                sims = self._title_vectors @ (vector / np.linalg.norm(vector))
+                best = int(np.argmax(sims))
+                if sims[best] >= TITLE_EMBEDDING_THRESHOLD:
+                    return self.titles[best], round(float(sims[best]), 4)
+                best_score = max(best_score, float(sims[best]))
+            except Exception as e:
+                print(f"⚠️ Title embedding fallback failed: {e}")
+
+        return None, round(best_score, 4)
+
+
+_resolvers = {}
+_resolver_lock = threading.Lock()
+
+
+def get_title_resolver(with_embeddings: bool = False) -> TitleResolver:
+    """
+    Shared resolver. with_embeddings=True adds the embedding fallback using the
+    chatbot's sentence embeddings (only for the chatbot, which has them loaded).
+    """
+    resolver = _resolvers.get(with_embeddings)
+    if resolver is None:
+        with _resolver_lock:
+            resolver = _resolvers.get(with_embeddings)
+            if resolver is None:
+                embed_fn = embed_documents_fn = None
+                if with_embeddings:
+                    from .chains import embeddings
+                    if embeddings is not None:
+                        embed_fn, embed_documents_fn = embeddings.embed_query, embeddings.embed_documents
+                started = time.perf_counter()
+                resolver = TitleResolver(SYNONYMS, canonical_titles(), embed_fn, embed_documents_fn)
+                print(f"🏷️ Title resolver built in {(time.perf_counter() - started) * 1000:.1f} ms "
+                      f"({len(resolver.phrases)} phrases)")
+                _resolvers[with_embeddings] = resolver
+    return resolver
+
+
+def resolve_title(text: str, with_embeddings: bool = False) -> Tuple[Optional[str], float]:
+    """Module-level shortcut for get_title_resolver().resolve_title()."""
+    return get_title_resolver(with_embeddings).resolve_title(text)
+
+
+def normalize_job_titles(query: str) -> Tuple[str, List[str]]:
+    """Module-level shortcut for get_title_resolver().normalize_query()."""
+    return get_title_resolver().normalize_query(query)
+
+
+def canonical_job_title(text: str) -> str:
+    """
+    Canonical title for a free-form profile title when it is a title or a known
+    synonym ("backend dev" → "Developer, back-end"); otherwise the user's own
+    text. Never fuzzy: a saved title is only rewritten when there is no doubt.
+    """
+    return get_title_resolver().exact_title(text) or (text or "").strip()
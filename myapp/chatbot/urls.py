@@ -14,6 +14,27 @@ urlpatterns = [
     # Endpoint for handling chatbot queries (AJAX/REST requests from frontend)
     path('api/query/', views.query_chatbot_api, name='query'),  
     
-    # Simple health check route for monitoring service availability
+    # Streaming variant (Server-Sent Events: tool → step → token → final)
+    path('api/query/stream/', views.query_chatbot_stream, name='query_stream'),
+    
+    # Personalised recommendation straight from the profile (no agent, no LLM calls)
+    path('api/recommendation/', views.personalized_recommendation, name='recommendation'),
+    
+    # Health routes for monitoring (answered from the background prober's snapshot)
     path('api/health/', views.health_check, name='health'),
+    path('api/health/live/', views.liveness_check, name='health_live'),
+    path('api/health/ready/', views.readiness_check, name='health_ready'),
+    
+    # Admin-only cache statistics + manual invalidation
+    path('api/cache/', views.cache_stats, name='cache_stats'),
+    path('api/cache/invalidate/', views.cache_invalidate, name='cache_invalidate'),
+    
+    # Admin-only Neo4j latency metrics
+    path('api/neo4j/', views.neo4j_stats, name='neo4j_stats'),
+    
+    # Admin-only LLM gateway metrics (breakers, timeouts, latency per role)
+    path('api/llm/', views.llm_stats, name='llm_stats'),
+    
+    # Admin-only agent job queue depth (CHATBOT_AGENT_MODE=queue)
+    path('api/jobs/', views.agent_job_stats, name='agent_job_stats'),
 ]
\ No newline at end of file
@@ -3,21 +3,52 @@ Django Views for Career Chatbot
 This file contains:
 - The main chatbot UI view
 - API endpoint for handling chatbot queries (async + sync versions)
-- Health check endpoint for debugging system dependencies
+- Streaming (Server-Sent Events) variant of the query endpoint
+- Health endpoints (cached snapshot, liveness, readiness) for monitoring
+Answers are recorded in the chat history (with per-stage timings) by a background writer.
 """
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.cache import never_cache
+from django.contrib.admin.views.decorators import staff_member_required
+from asgiref.sync import async_to_sync
 import json
+import os
 import time
+import asyncio
 import logging
 
-# Import the agent executor that handles RAG queries
-from .agents import career_rag_agent_executor
+# The agent entry points (intent router → tool, or full RAG agent) live in agents.py and are
+# imported on first use: with CHATBOT_AGENT_MODE=queue the web tier never loads the agent stack
+from .job_queue import AGENT_QUEUE, run_via_queue
+
+# Exact + semantic answer cache for non-personalised questions
+from .answer_cache import answer_cache, is_personal_query, tools_used, ANSWER_CACHE_ENABLED
+from .data_version import current_data_version
+
+# Per-request time budget, propagated to every stage through context.py
+from .context import deadline_context, get_user_id, remaining_time, stage_timings, timed_stage
+
+# Non-blocking, batched chat history (tools used + where the time went)
+from .history import record_answer
+
+# Bounded concurrent agent runs + sharing of identical in-flight questions
+from .admission import Overloaded, admission, coalescer
 
 logger = logging.getLogger(__name__)
 
+# Overall budget for one chatbot answer; stages switch to cheaper paths as it runs out
+CHATBOT_REQUEST_DEADLINE = float(os.getenv("CHATBOT_REQUEST_DEADLINE", "8"))
+# Extra time the agent gets past the deadline to finish a fallback before the request is cut off
+CHATBOT_DEADLINE_GRACE = float(os.getenv("CHATBOT_DEADLINE_GRACE", "1"))
+
+TIMED_OUT_ANSWER = (
+    "Sorry, that took longer than expected and I had to stop before finishing. "
+    "Please try again, or ask a more specific question."
+)
+BUSY_ANSWER = 'The assistant is busy right now. Please try again in a few seconds.'
+
 
 @never_cache
 def chatbot_view(request):
@@ -32,6 +63,78 @@ def chatbot_view(request):
     })
 
 
+def _parse_query_request(request):
+    """Return (text, session_id) from a JSON or form-encoded chatbot request."""
+    # Parse incoming JSON or form-data depending on request type
+    if request.content_type == 'application/json':
+        data = json.loads(request.body)
+    else:
+        # Fallback for form submissions
+        data = {
+            'text': request.POST.get('text', ''),
+            'session_id': request.POST.get('session_id', 'default')
+        }
+    
+    logger.info(f"Received data: {data}")
+    return data.get('text', '').strip(), data.get('session_id', 'default')
+
+
+def _attach_user(request, session_id):
+    """
+    Attach user ID + chat session to the agent's per-request context for personalized
+    recommendations and follow-ups (session working memory).
+    Both are stored in contextvars, so they only apply to the current request.
+    """
+    from .context import set_session_id, set_user_id
+    
+    set_session_id(session_id)
+    if request.user.is_authenticated:
+        set_user_id(request.user.id)
+        logger.info(f"(ID: {request.user.id})")
+    else:
+        set_user_id(None)
+        logger.info("Anonymous user")
+
+
+async def _lookup_cached_answer(text):
+    """
+    Check the answer cache (skipped for questions about "me"/"my").
+    Returns (cached_entry, tier, cache_context); cache_context is None when
+    caching does not apply, else (data_version, embedding) for storing later.
+    """
+    if not ANSWER_CACHE_ENABLED or is_personal_query(text):
+        return None, None, None
+    
+    # Version lookup + embedding are blocking, keep them off the event loop
+    with timed_stage('answer_cache'):
+        data_version = await asyncio.to_thread(current_data_version)
+        cached, tier, embedding = await asyncio.to_thread(answer_cache.lookup, text, data_version)
+    return cached, tier, (data_version, embedding)
+
+
+def _store_answer(text, result, cache_context):
+    """Store answers from non-personalised tools for future paraphrases (never degraded ones)."""
+    if result.get('degraded'):
+        return
+    if 'degraded' not in result:  # Queued results already carry the worker's verdict
+        from .agents import is_degraded_output
+        if is_degraded_output(result.get('output', '')):
+            return
+    if cache_context is not None:
+        data_version, embedding = cache_context
+        answer_cache.store(text, result.get('output', ''), tools_used(result), data_version, embedding)
+
+
+def _record_history(text, session_id, output, tools, response_time, timings, result=None):
+    """Queue the chat history row (worker-side timings of queued runs are merged in)."""
+    if result and result.get('stage_timings'):
+        timings.merge(result['stage_timings'])
+    record_answer(
+        text, output, session_id=session_id, user_id=get_user_id(), tools=tools,
+        response_time=round(response_time, 3), stage_timings=timings.as_dict(),
+    )
+
+
 @require_http_methods(["POST"])
 async def query_chatbot_api(request):
     """
@@ -42,128 +145,454 @@ async def query_chatbot_api(request):
     
     async def allows Django to await the agent for improved performance
     when using async-capable LLM libraries.
+    
+    The whole request runs under CHATBOT_REQUEST_DEADLINE; if the agent is still
+    running after the grace period, a partial answer with a notice is returned.
+    Agent runs go through admission control (429 + Retry-After when overloaded),
+    and identical in-flight questions share one run.
     """
     start_time = time.time()  # Track response time for monitoring
     
     try:
-        # Delay importing set_user_id until needed (avoids circular imports)
-        from .agents import set_user_id
-        
-        # Parse incoming JSON or form-data depending on request type
-        if request.content_type == 'application/json':
-            data = json.loads(request.body)
-        else:
-            # Fallback for form submissions
-            data = {
-                'text': request.POST.get('text', ''),
-                'session_id': request.POST.get('session_id', 'default')
-            }
-        
-        text = data.get('text', '').strip()
-        session_id = data.get('session_id', 'default')
+        with deadline_context(CHATBOT_REQUEST_DEADLINE), stage_timings() as timings:
+            return await _answer_query(request, start_time, timings)
+    except Exception as e:
+        # Log traceback for debugging
+        logger.error(f"Error processing query: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'error': f'Error: {str(e)}'
+        }, status=500)
 
-        logger.info(f"Received data: {data}")
-        logger.info(f"Received query: {text}")
-        
-        # Validate that input text exists
-        if not text:
-            return JsonResponse({
-                'success': False,
-                'error': 'Text parameter is required'
-            }, status=400)
-        
-        # Attach user ID to agent context for personalized recommendations
-        if request.user.is_authenticated:
-            set_user_id(request.user.id)
-            logger.info(f"(ID: {request.user.id})")
-        else:
-            set_user_id(None)
-            logger.info("Anonymous user")
-        
-        logger.info(f"Processing query: {text[:50]}...")
-        
-        # Call the RAG agent asynchronously
-        result = await career_rag_agent_executor.ainvoke({"input": text})
-        
-        # Calculate response time
+
+async def _answer_query(request, start_time, timings):
+    """Body of query_chatbot_api (runs inside the request deadline)."""
+    text, session_id = _parse_query_request(request)
+    logger.info(f"Received query: {text}")
+    
+    # Validate that input text exists
+    if not text:
+        return JsonResponse({
+            'success': False,
+            'error': 'Text parameter is required'
+        }, status=400)
+    
+    _attach_user(request, session_id)
+    logger.info(f"Processing query: {text[:50]}...")
+    
+    # Check the answer cache first
+    cached, tier, cache_context = await _lookup_cached_answer(text)
+    if cached is not None:
         response_time = time.time() - start_time
+        logger.info(f"Answer cache hit ({tier}) in {response_time * 1000:.1f}ms")
+        _record_history(text, session_id, cached['answer'], cached.get('tools', []), response_time, timings)
+        return JsonResponse({
+            'success': True,
+            'input': text,
+            'output': cached['answer'],
+            'intermediate_steps': [],
+            'response_time': round(response_time, 2),
+            'cached': True,
+            'cache_tier': tier,
+        })
+    
+    async def run_agent():
+        # Only the leader of a coalesced group takes an agent slot
+        async with admission.slot():
+            budget = max(0, remaining_time()) + CHATBOT_DEADLINE_GRACE
+            try:
+                if AGENT_QUEUE:
+                    # An agent worker process answers; this worker only waits for the result
+                    return await run_via_queue(text, get_user_id(), session_id, timeout=budget)
+                # Route locally when confident, otherwise call the RAG agent asynchronously
+                from .agents import arun_career_agent
+                return await asyncio.wait_for(arun_career_agent(text), timeout=budget)
+            except asyncio.TimeoutError:
+                logger.warning(f"Query exceeded the {CHATBOT_REQUEST_DEADLINE:g}s deadline: {text[:50]}")
+                return {'output': TIMED_OUT_ANSWER, 'intermediate_steps': [], 'degraded': True}
+    
+    try:
+        with timed_stage('agent'):
+            result, coalesced = await coalescer.run(
+                coalescer.key(text, get_user_id(), personal=is_personal_query(text)), run_agent
+            )
+    except Overloaded as e:
+        logger.warning(f"Rejected query (overloaded: {e})")
+        return _overloaded_response(e.retry_after)
+    if coalesced:
+        logger.info("Answered by an identical in-flight query")
+    output = result.get('output', 'No response generated')
+    _store_answer(text, result, cache_context)
+    
+    # Calculate response time
+    response_time = time.time() - start_time
+    
+    logger.info(f"Query processed in {response_time:.2f}s")
+    _record_history(text, session_id, output, tools_used(result), response_time, timings, result)
+    
+    # Convert intermediate steps to strings for JSON serialization
+    intermediate_steps = []
+    if "intermediate_steps" in result:
+        intermediate_steps = [
+            str(step) for step in result["intermediate_steps"]
+        ]
+    
+    # Send output back to frontend
+    return JsonResponse({
+        'success': True,
+        'input': text,
+        'output': output,
+        'intermediate_steps': intermediate_steps,
+        'response_time': round(response_time, 2),
+        'cached': False,
+        'degraded': bool(result.get('degraded')),
+        'coalesced': coalesced,
+        'routed_tool': result.get('routing', {}).get('tool'),
+    })
+
+
+def _overloaded_response(retry_after):
+    """429 + Retry-After for a request that could not get an agent slot."""
+    response = JsonResponse({'success': False, 'error': BUSY_ANSWER, 'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+async def _queued_events(text, session_id):
+    """astream_career_agent-shaped events for a question answered through the agent job queue."""
+    try:
+        result = await run_via_queue(text, get_user_id(), session_id,
+                                     timeout=max(0, remaining_time()) + CHATBOT_DEADLINE_GRACE)
+    except asyncio.TimeoutError:
+        result = {'output': TIMED_OUT_ANSWER, 'intermediate_steps': [], 'degraded': True}
+    yield {'event': 'final', 'result': result}
+
+
+def _sse(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@require_http_methods(["POST"])
+async def query_chatbot_stream(request):
+    """
+    STREAMING API endpoint (Server-Sent Events):
+    - "tool"  → which tool was selected
+    - "step"  → short summary of each finished tool call
+    - "token" → final answer tokens as the LLM produces them
+    - "final" → complete answer (same fields as query_chatbot_api)
+    - "error" → something went wrong
+    
+    Tokens are only flushed incrementally when served over ASGI; under WSGI
+    Django buffers the async stream and sends it in one go.
+    
+    Only a question that starts an agent run takes an agent slot: cache hits
+    and identical in-flight questions (which share the leader's run) don't.
+    A new question gets a plain 429 + Retry-After when the controller is
+    already saturated, or an "error" event if the slot wait times out.
+    
+    POST /askai/api/query/stream/
+    """
+    start_time = time.time()
+    
+    try:
+        text, session_id = _parse_query_request(request)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'Error: {str(e)}'}, status=400)
+    
+    if not text:
+        return JsonResponse({
+            'success': False,
+            'error': 'Text parameter is required'
+        }, status=400)
+    
+    # Check capacity up front so an overloaded worker can still answer a new question with a plain 429
+    user_id = request.user.id if request.user.is_authenticated else None
+    key = coalescer.key(text, user_id, personal=is_personal_query(text))
+    prefetched = None
+    if admission.saturated() and not coalescer.in_flight(key):
+        prefetched = await _lookup_cached_answer(text)
+        if prefetched[0] is None:
+            logger.warning("Rejected streamed query (overloaded: every agent slot and queue place is taken)")
+            return _overloaded_response(admission.retry_after)
+    
+    async def event_stream():
+        # Set the user inside the generator: the response may be iterated in a
+        # different task/thread than the view, so the context must travel with it
+        _attach_user(request, session_id)
+        # Stages degrade as the budget runs out
+        with deadline_context(CHATBOT_REQUEST_DEADLINE), stage_timings() as timings:
+            try:
+                cached, tier, cache_context = prefetched or await _lookup_cached_answer(text)
+                if cached is not None:
+                    _record_history(text, session_id, cached['answer'], cached.get('tools', []),
+                                    time.time() - start_time, timings)
+                    yield _sse('final', {
+                        'success': True,
+                        'input': text,
+                        'output': cached['answer'],
+                        'response_time': round(time.time() - start_time, 2),
+                        'cached': True,
+                        'cache_tier': tier,
+                    })
+                    return
+            
+                async def agent_events():
+                    # Only the leader of a coalesced group takes an agent slot
+                    async with admission.slot():
+                        if AGENT_QUEUE:
+                            # Agent workers don't stream: wait for the job and send its result as the final event
+                            events = _queued_events(text, session_id)
+                        else:
+                            from .agents import astream_career_agent
+                            events = astream_career_agent(text)
+                        async for item in events:
+                            yield item
+                
+                # Identical in-flight questions (streamed or not) share the leader's final answer
+                async for item in coalescer.stream(key, agent_events):
+                    if item['event'] != 'final':
+                        yield _sse(item['event'], item['data'])
+                        continue
+                
+                    result = item['result']
+                    coalesced = item.get('coalesced', False)
+                    if coalesced:
+                        logger.info("Streamed answer shared with an identical in-flight query")
+                    else:
+                        _store_answer(text, result, cache_context)
+                    response_time = time.time() - start_time
+                    logger.info(f"Streamed query processed in {response_time:.2f}s")
+                    _record_history(text, session_id, result['output'], tools_used(result), response_time,
+                                    timings, result)
+                    yield _sse('final', {
+                        'success': True,
+                        'input': text,
+                        'output': result['output'],
+                        'response_time': round(response_time, 2),
+                        'cached': False,
+                        'degraded': bool(result.get('degraded')),
+                        'coalesced': coalesced,
+                        'routed_tool': result.get('routing', {}).get('tool'),
+                    })
+            
+            except Overloaded as e:
+                logger.warning(f"Rejected streamed query (overloaded: {e})")
+                yield _sse('error', {'success': False, 'error': BUSY_ANSWER, 'retry_after': e.retry_after})
+            except Exception as e:
+                logger.error(f"Error streaming query: {str(e)}", exc_info=True)
+                yield _sse('error', {'success': False, 'error': f'Error: {str(e)}'})
+    
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+@require_http_methods(["POST"])
+async def personalized_recommendation(request):
+    """
+    Direct personalised recommendation (the chat UI's recommendation button):
+    profile → related jobs → missing skills + courses, without the agent and
+    with zero LLM calls. Answers are cached per profile version, so repeated
+    requests skip Neo4j and the course lookup.
+    
+    POST /askai/api/recommendation/  {"session_id": "..."}
+    """
+    start_time = time.time()
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            'success': False,
+            'error': 'Please log in to get personalized recommendations.'
+        }, status=401)
+    
+    try:
+        from .personalized import arecommend, profile_problem, remember_recommendation
+        from .recommendation_helper import fetch_user_profile_async
+        from .session_memory import remember
         
-        logger.info(f"Query processed in {response_time:.2f}s")
-        
-        # Convert intermediate steps to strings for JSON serialization
-        intermediate_steps = []
-        if "intermediate_steps" in result:
-            intermediate_steps = [
-                str(step) for step in result["intermediate_steps"]
-            ]
+        _, session_id = _parse_query_request(request)
+        text = 'Generate my career navigation recommendation'
+        with deadline_context(CHATBOT_REQUEST_DEADLINE), stage_timings() as timings:
+            _attach_user(request, session_id)
+            profile = await fetch_user_profile_async(request.user.id)
+            if profile:
+                remember(profile=profile)
+            
+            cached, version = False, None
+            output = profile_problem(request.user.id, profile)
+            if output is None:
+                with timed_stage('recommendation'):
+                    recommendation = await arecommend(request.user.id, profile)
+                output = remember_recommendation(profile, recommendation)
+                cached, version = recommendation['cached'], recommendation['profile_version']
+            
+            response_time = time.time() - start_time
+            logger.info(f"Recommendation answered in {response_time * 1000:.1f}ms (cached: {cached})")
+            _record_history(text, session_id, output, ['PersonalizedCareerRecommendation'], response_time, timings)
         
-        # Send output back to frontend
         return JsonResponse({
             'success': True,
             'input': text,
-            'output': result.get('output', 'No response generated'),
-            'intermediate_steps': intermediate_steps,
-            'response_time': round(response_time, 2)
+            'output': output,
+            'response_time': round(response_time, 2),
+            'cached': cached,
+            'profile_version': version,
         })
-        
     except Exception as e:
-        # Log traceback for debugging
-        logger.error(f"Error processing query: {str(e)}", exc_info=True)
+        logger.error(f"Error generating recommendation: {str(e)}", exc_info=True)
         return JsonResponse({
             'success': False,
             'error': f'Error: {str(e)}'
         }, status=500)
 
 
+@never_cache
 @require_http_methods(["GET"])
 def health_check(request):
     """
     Health check endpoint:
-    - Verifies that the Django server is running
-    - Confirms Neo4j + Supabase vector store connectivity
-    - Useful for monitoring uptime and debugging failures
+    - Returns the cached snapshot from the background prober (no live queries)
+    - Per dependency (chains, Neo4j, course store): status, probe latency,
+      last success, last error and failure counts
+    - 200 when ready to serve (healthy / degraded), 503 otherwise
     
     GET /askai/api/health/
     """
-    try:
-        # Import chains to verify initialization
-        from .chains import career_cypher_chain, qa_chain
-        
-        # Basic system summary
-        health_status = {
-            'status': 'healthy',
-            'django': 'running',
-            'career_chain': 'initialized',
-            'course_chain': 'initialized',
-            'agent': 'initialized'
-        }
-        
-        # Test Neo4j connectivity
-        try:
-            from .chains import graph
-            graph.query("RETURN 1 as test")  # Simple test query
-            health_status['neo4j'] = 'connected'
-        except Exception as e:
-            health_status['neo4j'] = f'error: {str(e)}'
-        
-        # Test Supabase / PGVector connectivity
-        try:
-            from .chains import supabase_vector_store
-            # Simple test query
-            supabase_vector_store.similarity_search("test", k=1)
-            health_status['supabase'] = 'connected'
-        except Exception as e:
-            health_status['supabase'] = f'error: {str(e)}'
-        
-        return JsonResponse(health_status)
-        
-    except Exception as e:
-        # If anything fails, return unhealthy
-        return JsonResponse({
-            'status': 'unhealthy',
-            'django': 'running',
-            'error': str(e)
-        }, status=503)
+    from .health import get_health_prober
+    
+    snapshot = get_health_prober().snapshot()
+    return JsonResponse(snapshot, status=200 if snapshot['ready'] else 503)
+
+
+@never_cache
+@require_http_methods(["GET"])
+def liveness_check(request):
+    """
+    Liveness: the process is serving requests and the prober thread is running.
+    Dependency failures don't fail liveness (restarting wouldn't fix them).
+    
+    GET /askai/api/health/live/
+    """
+    from .health import get_health_prober
+    
+    live = get_health_prober().alive
+    return JsonResponse({'status': 'alive' if live else 'prober stopped'}, status=200 if live else 503)
+
+
+@never_cache
+@require_http_methods(["GET"])
+def readiness_check(request):
+    """
+    Readiness: required dependencies are up and the snapshot is fresh.
+    
+    GET /askai/api/health/ready/
+    """
+    from .health import get_health_prober
+    
+    snapshot = get_health_prober().snapshot()
+    return JsonResponse(
+        {'status': snapshot['status'], 'snapshot_age_s': snapshot['snapshot_age_s']},
+        status=200 if snapshot['ready'] else 503,
+    )
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def cache_stats(request):
+    """
+    Admin-only cache statistics:
+    - Cypher generation cache hit rate (LLM calls avoided)
+    - Neo4j result cache hit rate (graph round-trips avoided)
+    - Answer cache hit rate (full agent runs avoided)
+    - Cypher prompt size (tokens per generated query vs the static prompt)
+    - Admission control + in-flight coalescing counters
+    - Chat history writer (buffered / written / dropped rows)
+    - Session working memory (sessions held, hits, profile invalidations)
+    - Personalised recommendation cache (answers reused per profile version)
+    
+    GET /askai/api/cache/
+    """
+    from .cypher_cache import cypher_cache
+    from .cypher_prompt import get_cypher_prompt_builder
+    from .data_version import graph_data_version, course_data_version
+    from .history import get_history_writer
+    from .personalized import recommendation_cache
+    from .session_memory import session_memory
+    
+    return JsonResponse({
+        'graph_data_version': graph_data_version(),
+        'course_data_version': course_data_version(),
+        'cypher_cache': cypher_cache.stats(),
+        'answer_cache': answer_cache.stats(),
+        'cypher_prompt': get_cypher_prompt_builder().stats(),
+        'admission': admission.stats(),
+        'coalescing': coalescer.stats(),
+        'chat_history': get_history_writer().stats(),
+        'session_memory': session_memory.stats(),
+        'recommendation_cache': recommendation_cache.stats(),
+    })
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def neo4j_stats(request):
+    """
+    Admin-only Neo4j metrics: pool settings + p50/p95 latency per named query.
+    
+    GET /askai/api/neo4j/
+    """
+    from . import neo4j_client
+    
+    return JsonResponse(neo4j_client.stats())
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def llm_stats(request):
+    """
+    Admin-only LLM gateway metrics: circuit breaker state, timeouts, hedges
+    and p50/p95 latency per role.
+    
+    GET /askai/api/llm/
+    """
+    from . import llm_gateway
+    
+    return JsonResponse(llm_gateway.stats())
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def agent_job_stats(request):
+    """
+    Admin-only agent job queue metrics: jobs per status and the age of the
+    oldest pending job (a growing age means the worker pool is too small).
+    
+    GET /askai/api/jobs/
+    """
+    from . import job_queue
+    
+    return JsonResponse(job_queue.stats())
+
+
+@staff_member_required
+@require_http_methods(["POST"])
+def cache_invalidate(request):
+    """
+    Admin-only cache invalidation, e.g. right after reloading the career graph.
+    
+    POST /askai/api/cache/invalidate/
+    """
+    from .data_version import bump_graph_version, bump_course_version
+    
+    version = bump_graph_version()  # Listeners clear every cache keyed on the graph
+    course_version = bump_course_version()
+    logger.info(f"Chatbot caches invalidated (graph version {version}, courses {course_version})")
+    return JsonResponse({
+        'success': True,
+        'graph_data_version': version,
+        'course_data_version': course_version,
+    })
 
 
 @require_http_methods(["POST"])
@@ -198,8 +627,14 @@ def query_chatbot_sync(request):
         
         logger.info(f"Processing query (sync): {text[:50]}...")
         
-        # Call the RAG agent synchronously
-        result = career_rag_agent_executor.invoke({"input": text})
+        with deadline_context(CHATBOT_REQUEST_DEADLINE):
+            if AGENT_QUEUE:
+                # Wait for an agent worker process to answer
+                result = async_to_sync(run_via_queue)(text, None, session_id, timeout=remaining_time())
+            else:
+                # Route locally when confident, otherwise call the RAG agent synchronously
+                from .agents import run_career_agent
+                result = run_career_agent(text)
         
         # Compute execution time
         response_time = time.time() - start_time
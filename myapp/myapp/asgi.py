@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myapp.settings')
+# One long-lived event loop serves every request: give it its own async Neo4j driver
+os.environ.setdefault('NEO4J_ASYNC_DRIVER', '1')
 
 application = get_asgi_application()
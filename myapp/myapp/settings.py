@@ -83,16 +83,21 @@ TEMPLATES = [
     },
 ]
 
+# runserver and WSGI servers buffer async streaming responses, so the chatbot's
+# SSE endpoint (/askai/api/query/stream/) only streams tokens under the ASGI
+# entry point: uvicorn myapp.asgi:application
 WSGI_APPLICATION = 'myapp.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASE_URL = os.environ.get('SUPABASE_POOLER_URL')
+# CHATBOT_OFFLINE=1 runs on local stand-ins only (chatbot/offline.py), SQLite included
+CHATBOT_OFFLINE = os.getenv("CHATBOT_OFFLINE", "0").lower() in ("1", "true", "yes")
+DATABASE_URL = None if CHATBOT_OFFLINE else os.environ.get('SUPABASE_POOLER_URL')
 
 DATABASES = {
-    'default': dj_database_url.parse(DATABASE_URL)
+    'default': dj_database_url.parse(DATABASE_URL) if DATABASE_URL else {}
 }
 
 
@@ -7,9 +7,10 @@ from django.db.models import Min, Max
 
 from django.db.models import Q
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 from .models import CoursesWithEmbeddings  # NEW model import
+from chatbot.offline import CHATBOT_OFFLINE, get_offline_embeddings
+from chatbot.skill_matcher import get_skill_matcher
 
 # --- Helpers for "Top 3 Easiest Transitions" ---
 
@@ -49,8 +50,8 @@ def _edge_from_user_to_job(user_set, job, source_title):
     req = _job_skill_set(job)
     if not req:
         return None
-    overlap = user_set & req
-    missing = req - user_set
+    # Compare by canonical skill ID so aliases ("aws" vs "amazon web services (aws)") overlap
+    overlap, missing = get_skill_matcher().split_known(user_set, sorted(req))
     if not overlap:      # optional: skip jobs with zero overlap
         return None
     title = getattr(job, "job", None) or getattr(job, "job_title", None) or "Unknown"
@@ -386,9 +387,16 @@ _ST_MODEL = None
 def _get_st_model():
     global _ST_MODEL
     if _ST_MODEL is None:
+        from sentence_transformers import SentenceTransformer  # heavy import, only when first needed
         _ST_MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
     return _ST_MODEL
 
+def _embed_query(text):
+    """Query embedding (hashing embeddings in the offline profile, same as the seeded courses)."""
+    if CHATBOT_OFFLINE:
+        return get_offline_embeddings().embed_query(text)
+    return _get_st_model().encode(text).tolist()
+
 def _keyword_prefilter_q(needed_skills, exclude_skills=None):
     """Match ONLY missing skills; actively exclude overlap skills."""
     q = Q()
@@ -430,9 +438,8 @@ def recommend_courses_for_job(job_title: str,
     print(f"[DEBUG] Pulled {len(rows)} rows from Supabase")
 
     # 2) embed query text (job title + a few MISSING skills only)
-    model = _get_st_model()
     query_text = job_title if not needed_skills else f"{job_title}: " + ", ".join(needed_skills[:8])
-    qvec = model.encode(query_text).tolist()
+    qvec = _embed_query(query_text)
     print(f"[DEBUG] Query text: {query_text}")
     
     # 3) cosine similarity between query and course embeddings